@@ -0,0 +1,74 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .indicator_plan import DEFAULT_SPEC, IndicatorPlan
+from .instrumentation import span
+from .technical_analysis import (Candles, FAMILY_OF, INDICATOR_COLUMNS, INDICATOR_FAMILIES, find_support_resistance,
+                                 pattern_masks)
+
+
+class Analysis:
+    # indicators, patterns and levels of one price series, each computed the first time it is asked for
+    def __init__(self, df: pd.DataFrame, patterns=None, levels=None):
+        self.df = df
+        # precomputed columns (e.g. from a snapshot) are used as they are
+        self._columns = {name: df[name] for name in INDICATOR_COLUMNS if name in df}
+        self._patterns = patterns
+        self._levels = levels
+        # one plan per series, so later families reuse what earlier ones computed (e.g. the 20-bar mean)
+        self.plan = IndicatorPlan(df)
+        # shared between sessions through the result cache, so every family is computed once
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.df)
+
+    def _family(self, family):
+        names = INDICATOR_FAMILIES[family]
+        if all(name in self._columns for name in names):
+            return
+        with span("indicators", family=family, rows=len(self.df)):
+            self._columns.update(self.plan.evaluate({name: DEFAULT_SPEC[name] for name in names}))
+
+    def indicators(self, *names):
+        names = names or INDICATOR_COLUMNS
+        with self._lock:
+            for family in dict.fromkeys(FAMILY_OF[name] for name in names):
+                self._family(family)
+        return pd.DataFrame({name: self._columns[name] for name in names}, index=self.df.index)
+
+    def with_indicators(self, *names):
+        # the OHLCV bars plus the requested indicator columns, without touching self.df; columns the bars
+        # already carry (e.g. a snapshot's) are not added twice
+        missing = [name for name in names or INDICATOR_COLUMNS if name not in self.df]
+        if not missing:
+            return self.df.copy(deep=False)
+        return pd.concat([self.df, self.indicators(*missing)], axis=1)
+
+    @property
+    def patterns(self):
+        with self._lock:
+            if self._patterns is None:
+                with span("find_patterns", rows=len(self.df)):
+                    masks = pattern_masks(Candles.from_df(self.df))
+                self._patterns = {name: np.flatnonzero(mask).tolist() for name, mask in masks.items()}
+        return self._patterns
+
+    @property
+    def levels(self):
+        with self._lock:
+            if self._levels is None:
+                with span("find_support_resistance", rows=len(self.df)):
+                    self._levels = find_support_resistance(self.df)
+        return self._levels
+
+    def computed(self):
+        return [family for family, names in INDICATOR_FAMILIES.items() if all(name in self._columns for name in names)]
+
+    def __sizeof__(self):
+        # what the analysis holds once every family is computed, plus about as much again in the plan's
+        # shared intermediates, so the result cache budgets for it up front
+        bars = int(self.df.memory_usage(index=True, deep=True).sum())
+        return bars + 2 * 8 * len(self.df) * len(INDICATOR_COLUMNS)
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+
+LABELS = ["Very Positive", "Positive", "Neutral", "Negative", "Very Negative"]
+# daily aggregate column of each label
+LABEL_COLUMNS = dict(zip(LABELS, ["very_positive", "positive", "neutral", "negative", "very_negative"]))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    symbol TEXT NOT NULL,
+    published_at TEXT NOT NULL,
+    url_hash BLOB NOT NULL,
+    content_hash BLOB NOT NULL,
+    title TEXT, summary TEXT, source TEXT, url TEXT,
+    compound REAL, positive REAL, negative REAL, neutral REAL,
+    label TEXT
+);
+CREATE INDEX IF NOT EXISTS articles_published ON articles (symbol, published_at);
+CREATE UNIQUE INDEX IF NOT EXISTS articles_url ON articles (symbol, url_hash);
+CREATE UNIQUE INDEX IF NOT EXISTS articles_content ON articles (symbol, content_hash);
+CREATE TABLE IF NOT EXISTS daily_sentiment (
+    symbol TEXT NOT NULL,
+    day TEXT NOT NULL,
+    articles INTEGER NOT NULL DEFAULT 0,
+    compound_sum REAL NOT NULL DEFAULT 0,
+    very_positive INTEGER NOT NULL DEFAULT 0,
+    positive INTEGER NOT NULL DEFAULT 0,
+    neutral INTEGER NOT NULL DEFAULT 0,
+    negative INTEGER NOT NULL DEFAULT 0,
+    very_negative INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (symbol, day)
+);
+"""
+
+
+def _hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def format_published(published):
+    # NewsAPI timestamps are ISO 8601 ("2025-02-15T12:30:00Z"), so slicing is enough; anything else is parsed
+    if len(published) >= 19 and published[10] == "T":
+        return published[:10] + " " + published[11:19]
+    return pd.Timestamp(published).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ArticleStore:
+    # every article seen per symbol, scored once, with running per-day sentiment counts so any date window
+    # is summarised from a handful of aggregate rows
+    def __init__(self, path):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def latest(self, symbol):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(published_at) FROM articles WHERE symbol = ?", (symbol,)).fetchone()
+        return row[0]
+
+    def add(self, symbol, articles, score_batch, label):
+        # articles: validated NewsAPI articles; only those whose URL and content are both new are scored.
+        # A syndicated copy of a story under another URL has the same content and is skipped, and so is an
+        # article whose source or timestamp cannot be read, rather than failing the whole batch.
+        candidates = {}
+        seen_content = set()
+        for article in articles:
+            try:
+                published = format_published(article["publishedAt"])
+                source = article["source"]["name"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            content = f"{article['title']} {article['description']}"
+            url_hash = _hash(article.get("url") or content)
+            content_hash = _hash(content)
+            if url_hash in candidates or content_hash in seen_content:
+                continue
+            candidates[url_hash] = (content_hash, content, published, source, article)
+            seen_content.add(content_hash)
+        if not candidates:
+            return 0
+
+        with self._lock:
+            known = self._known(symbol, "url_hash", list(candidates))
+            known_content = self._known(symbol, "content_hash", [entry[0] for entry in candidates.values()])
+        new = [(url_hash, *entry) for url_hash, entry in candidates.items()
+               if url_hash not in known and entry[0] not in known_content]
+        if not new:
+            return 0
+
+        sentiments = score_batch([content for _, _, content, _, _, _ in new])
+        rows, daily = [], {}
+        for (url_hash, content_hash, _, published, source, article), sentiment in zip(new, sentiments):
+            article_label = label(sentiment["compound"])
+            rows.append((symbol, published, url_hash, content_hash, article["title"], article["description"],
+                         source, article.get("url"), sentiment["compound"], sentiment["positive"],
+                         sentiment["negative"], sentiment["neutral"], article_label))
+            day = daily.setdefault(published[:10], {"articles": 0, "compound_sum": 0.0, **dict.fromkeys(LABELS, 0)})
+            day["articles"] += 1
+            day["compound_sum"] += sentiment["compound"]
+            day[article_label] += 1
+
+        with self._lock, self._conn:
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows).rowcount
+            if inserted != len(rows):
+                # another process stored some of them first: rebuild the affected days from the articles
+                self._rebuild_days(symbol, list(daily))
+            else:
+                self._conn.executemany(
+                    f"""INSERT INTO daily_sentiment VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (symbol, day) DO UPDATE SET
+                        articles = articles + excluded.articles, compound_sum = compound_sum + excluded.compound_sum,
+                        {", ".join(f"{column} = {column} + excluded.{column}" for column in LABEL_COLUMNS.values())}""",
+                    [(symbol, day, counts["articles"], counts["compound_sum"], *(counts[label] for label in LABELS))
+                     for day, counts in daily.items()])
+        return inserted
+
+    def _known(self, symbol, column, hashes):
+        known = set()
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            known.update(row[0] for row in self._conn.execute(
+                f"SELECT {column} FROM articles WHERE symbol = ? AND {column} IN ({', '.join('?' * len(chunk))})",
+                (symbol, *chunk)))
+        return known
+
+    def _rebuild_days(self, symbol, days):
+        for day in days:
+            self._conn.execute("DELETE FROM daily_sentiment WHERE symbol = ? AND day = ?", (symbol, day))
+            self._conn.execute(
+                f"""INSERT INTO daily_sentiment
+                    SELECT symbol, substr(published_at, 1, 10), COUNT(*), TOTAL(compound),
+                    {", ".join(f"SUM(label = '{label}')" for label in LABELS)}
+                    FROM articles WHERE symbol = ? AND published_at >= ? AND published_at < ?
+                    GROUP BY symbol, substr(published_at, 1, 10)""",
+                (symbol, day, day + "~"))
+
+    def daily(self, symbol, start_day, end_day):
+        # per-day counts and average sentiment between two "YYYY-MM-DD" days, both included
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT day, articles, compound_sum, {", ".join(LABEL_COLUMNS.values())} FROM daily_sentiment
+                    WHERE symbol = ? AND day >= ? AND day <= ? ORDER BY day""", (symbol, start_day, end_day)).fetchall()
+        history = pd.DataFrame(rows, columns=["day", "articles", "compound_sum", *LABELS]).set_index("day")
+        history["average_sentiment"] = history["compound_sum"] / history["articles"]
+        return history.drop(columns="compound_sum")
+
+    def summary(self, symbol, start_day, end_day):
+        with self._lock:
+            row = self._conn.execute(
+                f"""SELECT TOTAL(articles), TOTAL(compound_sum), {", ".join(f"TOTAL({column})" for column in LABEL_COLUMNS.values())}
+                    FROM daily_sentiment WHERE symbol = ? AND day >= ? AND day <= ?""",
+                (symbol, start_day, end_day)).fetchone()
+        total, compound_sum = int(row[0]), row[1]
+        return {"articles": total, "compound_sum": compound_sum,
+                "distribution": {label: int(count) for label, count in zip(LABELS, row[2:])}}
+
+    def articles(self, symbol, start_day, end_day, limit=100):
+        # newest first, like NewsAPI's sortBy=publishedAt
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT title, summary, source, published_at, label, compound, positive, negative, neutral
+                   FROM articles WHERE symbol = ? AND published_at >= ? AND published_at < ?
+                   ORDER BY published_at DESC LIMIT ?""", (symbol, start_day, end_day + "~", limit)).fetchall()
+        return [{
+            "title": title,
+            "summary": summary,
+            "source": source,
+            "date": published,
+            "sentiment": label,
+            "sentiment_scores": {"compound": compound, "positive": positive, "negative": negative, "neutral": neutral},
+        } for title, summary, source, published, label, compound, positive, negative, neutral in rows]
+
+
+def default_store_path():
+    return os.getenv("FORTUNETELLER_NEWS_DB", os.path.join(os.path.expanduser("~"), ".cache", "fortuneteller", "news.sqlite"))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def article_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArticleStore(default_store_path())
+        return _store
@@ -0,0 +1,167 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .analysis import Analysis
+from .indicator_plan import INDICATORS
+from .technical_analysis import INDICATOR_COLUMNS, PATTERNS
+
+
+class Signals:
+    # full-history columns for rules: OHLCV, indicators, pattern masks, levels and parameterised indicators
+    def __init__(self, df: pd.DataFrame):
+        self.analysis = df if isinstance(df, Analysis) else Analysis(df)
+        self.df = self.analysis.df
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def _memo(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def __getitem__(self, name):
+        if not isinstance(name, str):
+            return np.asarray(name)
+        if name in PATTERNS:
+            return self._memo(name, lambda: np.isin(np.arange(len(self.df)), self.analysis.patterns[name]))
+        if name in INDICATOR_COLUMNS:
+            return self._memo(name, lambda: self.analysis.indicators(name)[name].to_numpy(dtype=float))
+        return self._memo(name, lambda: self.df[name].to_numpy(dtype=float))
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    # parameterised indicators share the analysis' plan, so every window of a sweep reuses one prefix sum
+    def ma(self, window):
+        return self.analysis.plan.sma("Close", window)
+
+    def ema(self, span):
+        return self.analysis.plan.ewm("Close", span)
+
+    def rsi(self, period=14):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._memo(("rsi", period), lambda: INDICATORS["rsi"](self.analysis.plan, period=period))
+
+    def crossed_above(self, fast, slow):
+        fast, slow = self[fast], self[slow]
+        crossed = np.zeros(len(fast), dtype=bool)
+        crossed[1:] = (fast[:-1] <= slow[:-1]) & (fast[1:] > slow[1:])
+        return crossed
+
+    def crossed_below(self, fast, slow):
+        return self.crossed_above(slow, fast)
+
+    def near_level(self, kind, tolerance=0.01):
+        # levels come from the whole series, so rules using them look ahead
+        levels = np.asarray(self.analysis.levels[kind], dtype=float)
+        close = self["Close"]
+        if not len(levels):
+            return np.zeros(len(close), dtype=bool)
+        return (np.abs(close[:, None] - levels[None, :]) / close[:, None] <= tolerance).any(axis=1)
+
+
+def positions(entry, exit=None, short=False):
+    # entry alone: long while it holds; entry and exit: long from an entry until the next exit (flat or short)
+    entry = np.asarray(entry, dtype=bool)
+    if exit is None:
+        return entry.astype(float)
+    exit = np.asarray(exit, dtype=bool)
+    events = entry | exit
+    # index of the latest event at or before each bar, -1 before the first one
+    last = np.maximum.accumulate(np.where(events, np.arange(len(events)), -1))
+    idle = -1.0 if short else 0.0
+    # an exit on the same bar as an entry wins
+    state = np.where(exit, idle, 1.0)
+    return np.where(last >= 0, state[np.maximum(last, 0)], 0.0)
+
+
+def run_backtest(close, position, cost=0.0, periods_per_year=252):
+    # a position decided on a bar's close is held over the next bar; cost is a fraction of the traded value
+    close = np.asarray(close, dtype=float)
+    held = np.zeros(len(close))
+    held[1:] = np.nan_to_num(np.asarray(position, dtype=float)[:-1])
+    returns = np.zeros(len(close))
+    returns[1:] = close[1:] / close[:-1] - 1
+    changes = np.diff(held, prepend=0.0)
+    strategy = np.nan_to_num(held * returns) - cost * np.abs(changes)
+
+    equity = np.cumprod(1 + strategy)
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+
+    # a trade is a run of bars with the same non-zero position; its return compounds the bars' returns
+    # (the exit cost falls on the first bar after the run)
+    starts = np.flatnonzero(changes != 0)
+    trade_returns = np.expm1(np.add.reduceat(np.log1p(strategy), starts)) if len(starts) else np.empty(0)
+    trade_returns = trade_returns[held[starts] != 0]
+
+    std = strategy.std()
+    return {
+        "total_return": float(equity[-1] - 1) if len(equity) else 0.0,
+        "max_drawdown": float(drawdown.min()) if len(drawdown) else 0.0,
+        "sharpe": float(strategy.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0,
+        "trades": len(trade_returns),
+        "hit_rate": float((trade_returns > 0).mean()) if len(trade_returns) else 0.0,
+        "exposure": float((held != 0).mean()) if len(held) else 0.0,
+        "equity": equity,
+    }
+
+
+def backtest(df, strategy, cost=0.0, periods_per_year=252, **params):
+    # strategy(signals, **params) returns a position array or an (entry, exit) pair of masks
+    signals = df if isinstance(df, Signals) else Signals(df)
+    position = strategy(signals, **params)
+    if isinstance(position, tuple):
+        position = positions(*position)
+    return run_backtest(signals["Close"], position, cost, periods_per_year)
+
+
+_signals = None
+
+
+def _init_worker(df):
+    # each worker builds its Signals once, so indicators shared by many combinations are computed once
+    global _signals
+    _signals = Signals(df)
+
+
+def _evaluate(signals, strategy, params, cost, periods_per_year):
+    result = backtest(signals, strategy, cost, periods_per_year, **params)
+    del result["equity"]
+    return {**params, **result}
+
+
+def _run_combination(strategy, params, cost, periods_per_year):
+    return _evaluate(_signals, strategy, params, cost, periods_per_year)
+
+
+def sweep(df, strategy, grid, cost=0.0, periods_per_year=252, max_workers=None):
+    # grid: {"fast": [5, 10, ...], "slow": [50, 100, ...]}; strategy must be a module-level function
+    combinations = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    if max_workers == 1:
+        signals = Signals(df)
+        rows = [_evaluate(signals, strategy, params, cost, periods_per_year) for params in combinations]
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(df,)) as executor:
+            chunksize = max(len(combinations) // (4 * workers), 1)
+            rows = list(executor.map(_run_combination, itertools.repeat(strategy), combinations,
+                                     itertools.repeat(cost), itertools.repeat(periods_per_year), chunksize=chunksize))
+    return pd.DataFrame(rows)
+
+
+def ma_crossover(signals, fast=20, slow=50):
+    return signals.ma(fast) > signals.ma(slow)
+
+
+def rsi_reversion(signals, period=14, oversold=30, overbought=70):
+    rsi_values = signals.rsi(period)
+    return rsi_values < oversold, rsi_values > overbought
@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+
+from .instrumentation import span
+from .resample import base_interval, resample_bars
+
+
+# seconds after a fetch before the newest bars are considered stale
+INTERVAL_TTL = {
+    "1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "90m": 5400, "1h": 3600,
+    "1d": 3600, "5d": 6 * 3600, "1wk": 6 * 3600, "1mo": 24 * 3600, "3mo": 24 * 3600,
+}
+DEFAULT_TTL = 3600
+# a frame served from memory only has its access time written back this often
+ACCESS_WRITE_SECONDS = 60
+
+PERIOD_OFFSETS = {"mo": "months", "y": "years"}
+
+
+class YFinanceProvider:
+    def fetch(self, symbol, interval, period=None, start=None):
+        import yfinance as yf
+        stock = yf.Ticker(symbol)
+        if start is not None:
+            return stock.history(start=start, interval=interval)
+        return stock.history(period=period, interval=interval)
+
+
+def period_span(period, now: pd.Timestamp):
+    if period == "max":
+        return None
+    if period == "ytd":
+        return now - now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0, nanosecond=0)
+    for suffix, unit in PERIOD_OFFSETS.items():
+        if period.endswith(suffix):
+            return now - (now - pd.DateOffset(**{unit: int(period[:-len(suffix)])}))
+    if period.endswith("d"):
+        return pd.Timedelta(days=int(period[:-1]))
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def slice_period(df: pd.DataFrame, period, now: pd.Timestamp):
+    if period == "max" or df.empty:
+        return df
+    now = now.tz_convert(df.index.tz) if df.index.tz is not None else now.tz_localize(None)
+    if period.endswith("d") and period != "ytd":
+        # yahoo counts "1d"/"5d" in trading sessions, not calendar days
+        sessions = df.index.normalize().unique()[-int(period[:-1]):]
+        return df[df.index >= sessions[0]]
+    return df[df.index >= now - period_span(period, now)]
+
+
+class BarCache:
+    def __init__(self, root, provider=None, max_bytes=512 * 1024 ** 2, ttl=None, clock=time.time, memory_entries=64):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.provider = provider or YFinanceProvider()
+        self.max_bytes = max_bytes
+        self.ttl = {**INTERVAL_TTL, **(ttl or {})}
+        self.clock = clock
+        self.stats = {"hits": 0, "misses": 0, "topups": 0, "evictions": 0, "derived_hits": 0, "derived_misses": 0}
+        # self._lock only guards the in-memory state; a download or file access holds the lock of its own
+        # symbol and interval, so different series are fetched in parallel and one series is fetched once
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._evict_lock = threading.Lock()
+        # the newest frames read or written, by data path, with their metadata, and the bars derived from them
+        self.memory_entries = memory_entries
+        self._frames = OrderedDict()
+        self._derived = OrderedDict()
+
+    def _paths(self, symbol, interval):
+        key = f"{quote(symbol, safe='')}__{quote(interval, safe='')}"
+        return self.root / f"{key}.parquet", self.root / f"{key}.json"
+
+    def _read_meta(self, meta_path):
+        try:
+            return json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, write):
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        write(tmp)
+        os.replace(tmp, path)
+
+    def _key_lock(self, symbol, interval):
+        with self._lock:
+            return self._key_locks.setdefault((symbol, interval), threading.Lock())
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _remember(self, cache, key, value):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.memory_entries:
+                cache.popitem(last=False)
+
+    def _recall(self, cache, key):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def get(self, symbol, period, interval):
+        with span("bar_cache", symbol=symbol, period=period, interval=interval) as s, self._key_lock(symbol, interval):
+            df, outcome = self._get(symbol, period, interval)
+            s.set(cache=outcome, rows=0 if df is None else len(df))
+            return df
+
+    def get_resampled(self, symbol, period, interval):
+        # bars that can be built from a finer interval yahoo serves for the period are derived from it, so
+        # switching between intervals of one symbol downloads once; the freshness is the requested interval's
+        base = base_interval(period, interval)
+        if base == interval:
+            return self.get(symbol, period, interval)
+        with span("bar_cache", symbol=symbol, period=period, interval=interval, derived_from=base) as s, \
+                self._key_lock(symbol, base):
+            df, outcome = self._get(symbol, period, base, ttl_interval=interval)
+            s.set(cache=outcome)
+            if df is None:
+                return None
+            # the base bars' extent and last close identify them, so a top-up or revision rebuilds the derived bars
+            key = (symbol, period, interval)
+            marker = (base, len(df), df.index[0], df.index[-1], float(df["Close"].iloc[-1])) if len(df) else (base, 0)
+            cached = self._recall(self._derived, key)
+            if cached is not None and cached[0] == marker:
+                self._count("derived_hits")
+                derived = cached[1]
+                s.set(resampled="hit")
+            else:
+                self._count("derived_misses")
+                derived = resample_bars(df, interval)
+                self._remember(self._derived, key, (marker, derived))
+                s.set(resampled="miss")
+            s.set(rows=len(derived))
+            # a new object, so a caller adding columns leaves the cached frame alone
+            return derived.copy(deep=False)
+
+    def _get(self, symbol, period, interval, ttl_interval=None):
+        data_path, meta_path = self._paths(symbol, interval)
+        now_ts = self.clock()
+        now = pd.Timestamp(now_ts, unit="s", tz="UTC")
+        length = period_span(period, now)
+        needed_since = float("-inf") if length is None else now_ts - length.total_seconds()
+
+        remembered = self._recall(self._frames, data_path)
+        if remembered is not None:
+            df, meta = remembered[0], dict(remembered[1])
+        else:
+            meta = self._read_meta(meta_path) if data_path.exists() else None
+            df = None
+            if meta is not None:
+                try:
+                    df = pd.read_parquet(data_path)
+                except (OSError, ValueError):
+                    meta = None
+
+        if meta is not None and meta["covered_since"] <= needed_since:
+            if now_ts - meta["fetched_at"] < self.ttl.get(ttl_interval or interval, DEFAULT_TTL):
+                outcome = "hit"
+                self._count("hits")
+            else:
+                # only the bars after the last cached timestamp are downloaded
+                outcome = "topup"
+                self._count("topups")
+                new = self.provider.fetch(symbol, interval, start=df.index[-1])
+                df = self._merge(df, new)
+                meta["fetched_at"] = now_ts
+                self._write(data_path, df.to_parquet)
+        else:
+            outcome = "miss"
+            self._count("misses")
+            new = self.provider.fetch(symbol, interval, period=period)
+            if new is None or new.empty:
+                return None, outcome
+            df = self._merge(df, new)
+            covered_since = needed_since if meta is None else min(meta["covered_since"], needed_since)
+            meta = {"covered_since": covered_since, "fetched_at": now_ts}
+            self._write(data_path, df.to_parquet)
+
+        written = remembered is not None and outcome == "hit" and \
+            now_ts - meta.get("last_access", 0) < ACCESS_WRITE_SECONDS
+        if not written:
+            meta["last_access"] = now_ts
+            self._write(meta_path, lambda tmp: tmp.write_text(json.dumps(meta)))
+            self._evict(keep=data_path)
+        self._remember(self._frames, data_path, (df, meta))
+        return slice_period(df, period, now).copy(deep=False), outcome
+
+    def _merge(self, cached, new):
+        if cached is None or cached.empty:
+            return new
+        if new is None or new.empty:
+            return cached
+        # the last cached bar may have been partial, so the refetched copy wins
+        merged = pd.concat([cached, new])
+        return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+    def size(self):
+        return sum(_file_size(path) for path in self.root.glob("*.parquet"))
+
+    def _evict(self, keep):
+        # other series may be written or evicted meanwhile, so a file can vanish under us
+        with self._evict_lock:
+            if self.size() <= self.max_bytes:
+                return
+            entries = []
+            for data_path in self.root.glob("*.parquet"):
+                meta = self._read_meta(data_path.with_suffix(".json")) or {}
+                entries.append((meta.get("last_access", 0), data_path, _file_size(data_path)))
+            total = sum(size for _, _, size in entries)
+
+            for _, data_path, size in sorted(entries, key=lambda entry: entry[0]):
+                if total <= self.max_bytes:
+                    break
+                if data_path == keep:
+                    continue
+                total -= size
+                data_path.unlink(missing_ok=True)
+                data_path.with_suffix(".json").unlink(missing_ok=True)
+                with self._lock:
+                    self._frames.pop(data_path, None)
+                self._count("evictions")
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["topups"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+
+def _file_size(path):
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
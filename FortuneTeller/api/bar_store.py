@@ -0,0 +1,158 @@
+import json
+import os
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from .technical_analysis import INDICATOR_COLUMNS, indicator_columns
+
+
+# fixed-width column files: int64 epoch nanoseconds, float32 prices, int64 volume
+COLUMNS = {"ts": np.int64, "Open": np.float32, "High": np.float32, "Low": np.float32, "Close": np.float32, "Volume": np.int64}
+
+
+class Bars:
+    # a time range of one series as read-only views into the memory-mapped column files; indicators are
+    # taken from it through BarStore.indicators / indicator_columns, calculate_indicators needs to_frame()'s copy
+    def __init__(self, ts, columns, tz):
+        self.ts = ts
+        self.columns = columns
+        self.tz = tz
+        self._index = None
+
+    def __len__(self):
+        return len(self.ts)
+
+    @property
+    def index(self):
+        if self._index is None:
+            index = pd.DatetimeIndex(self.ts.view("datetime64[ns]"), copy=False)
+            self._index = index.tz_localize("UTC").tz_convert(self.tz) if self.tz else index
+        return self._index
+
+    def __getitem__(self, name):
+        # Series wrap the mapped prices without copying them
+        return pd.Series(self.columns[name], index=self.index, name=name, copy=False)
+
+    def to_frame(self):
+        return pd.DataFrame({name: self[name] for name in self.columns}, index=self.index)
+
+
+class BarStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, symbol, interval):
+        return self.root / f"{quote(symbol, safe='')}__{quote(interval, safe='')}"
+
+    def _meta(self, path):
+        try:
+            return json.loads((path / "meta.json").read_text())
+        except (OSError, ValueError):
+            return {"tz": None}
+
+    def _write_meta(self, path, meta):
+        tmp = path / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, path / "meta.json")
+
+    def _rows(self, path, meta):
+        # the rows every column file is known to hold: an append writes all columns before it commits the new
+        # count in meta.json, so bars past it are the remains of an interrupted one. Stores from before the
+        # count was kept go by their shortest column.
+        if "rows" in meta:
+            return meta["rows"]
+        sizes = [(path / f"{name}.bin").stat().st_size // np.dtype(dtype).itemsize if (path / f"{name}.bin").exists() else 0
+                 for name, dtype in COLUMNS.items()]
+        return min(sizes)
+
+    def _map(self, path, name, mode="r"):
+        file = path / f"{name}.bin"
+        if not file.exists() or file.stat().st_size == 0:
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.memmap(file, dtype=COLUMNS[name], mode=mode)
+
+    def count(self, symbol, interval):
+        path = self._dir(symbol, interval)
+        return self._rows(path, self._meta(path))
+
+    def append(self, symbol, interval, df: pd.DataFrame):
+        path = self._dir(symbol, interval)
+        path.mkdir(parents=True, exist_ok=True)
+        if df.empty:
+            return 0
+        # reads binary-search the timestamps, so they are kept sorted; a repeated bar's last copy wins
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index(kind="stable")
+        if df.index.has_duplicates:
+            df = df[~df.index.duplicated(keep="last")]
+        meta = self._meta(path)
+        if meta["tz"] is None and df.index.tz is not None:
+            meta["tz"] = str(df.index.tz)
+        rows = self._rows(path, meta)
+
+        index = df.index if df.index.tz is None else df.index.tz_convert("UTC").tz_localize(None)
+        ts = index.as_unit("ns").asi8
+        values = {"ts": ts, **{name: df[name].to_numpy() for name in COLUMNS if name not in ("ts", "Volume")}}
+        # yahoo leaves the volume of a forming bar, and of indices, NaN; it is stored as 0 rather than cast to
+        # a garbage integer
+        values["Volume"] = np.nan_to_num(df["Volume"].to_numpy(dtype=float), nan=0.0)
+
+        stored = self._map(path, "ts")[:rows]
+        last = stored[-1] if len(stored) else None
+        del stored
+        if last is not None:
+            # the stored last bar may have been partial, so a newer copy of it is written in place
+            same = ts == last
+            if same.any():
+                position = rows - 1
+                for name, column in values.items():
+                    mapped = self._map(path, name, mode="r+")
+                    mapped[position] = column[same][-1]
+                    mapped.flush()
+                    del mapped
+            keep = ts > last
+            values = {name: column[keep] for name, column in values.items()}
+
+        for name, column in values.items():
+            with open(path / f"{name}.bin", "ab") as f:
+                # drops what an interrupted append left past the committed rows
+                f.truncate(rows * np.dtype(COLUMNS[name]).itemsize)
+                np.ascontiguousarray(column, dtype=COLUMNS[name]).tofile(f)
+        meta["rows"] = rows + len(values["ts"])
+        self._write_meta(path, meta)
+        return len(values["ts"])
+
+    def read(self, symbol, interval, start=None, end=None):
+        path = self._dir(symbol, interval)
+        meta = self._meta(path)
+        ts = self._map(path, "ts")[:self._rows(path, meta)]
+
+        # binary search over the mapped timestamps touches only a few pages
+        lo = 0 if start is None else int(np.searchsorted(ts, _epoch_ns(start), side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, _epoch_ns(end), side="right"))
+        columns = {name: self._map(path, name)[lo:hi] for name in COLUMNS if name != "ts"}
+        return Bars(ts[lo:hi], columns, meta["tz"])
+
+    def indicators(self, symbol, interval, start=None, end=None, warmup=200):
+        # warmup bars before start fill the rolling windows; MACD's EWM is exact only from the first stored bar
+        bars = self.read(symbol, interval, end=end)
+        first = 0 if start is None else int(np.searchsorted(bars.ts, _epoch_ns(start), side="left"))
+        lo = max(first - warmup, 0)
+        window = Bars(bars.ts[lo:], {name: column[lo:] for name, column in bars.columns.items()}, bars.tz)
+        columns, _ = indicator_columns(window)
+        return pd.DataFrame({name: columns[name] for name in INDICATOR_COLUMNS}).iloc[first - lo:]
+
+
+def _epoch_ns(value):
+    timestamp = pd.Timestamp(value)
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp.as_unit("ns").value
+
+
+def default_store_dir():
+    return os.getenv("FORTUNETELLER_BAR_STORE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "fortuneteller", "store"))
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+
+# horizontal pixels per candlestick and points per pixel for indicator lines
+PX_PER_CANDLE = 3
+POINTS_PER_PX = 2
+
+
+def bucket_starts(n, buckets):
+    return np.unique(np.arange(buckets) * n // buckets)
+
+
+def ohlc_buckets(df: pd.DataFrame, max_bars):
+    # merges consecutive bars so every bucket keeps its true open, high, low and close
+    if len(df) <= max_bars:
+        return df
+    starts = bucket_starts(len(df), max_bars)
+    ends = np.append(starts[1:], len(df)) - 1
+    data = {
+        "Open": df["Open"].to_numpy()[starts],
+        "High": np.fmax.reduceat(df["High"].to_numpy(dtype=float), starts),
+        "Low": np.fmin.reduceat(df["Low"].to_numpy(dtype=float), starts),
+        "Close": df["Close"].to_numpy()[ends],
+    }
+    if "Volume" in df:
+        data["Volume"] = np.add.reduceat(df["Volume"].to_numpy(), starts)
+    return pd.DataFrame(data, index=df.index[starts])
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: indices of the points that best preserve the line's shape
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    # bucket averages up front; the next bucket's average stands in for the third vertex
+    counts = np.diff(np.append(edges, n))
+    avg_x = np.add.reduceat(x, edges) / counts
+    avg_y = np.add.reduceat(y, edges) / counts
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        areas = np.abs((x[a] - avg_x[i + 1]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y[i + 1] - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def _x(index):
+    return index.asi8 if isinstance(index, pd.DatetimeIndex) else np.arange(len(index))
+
+
+def lttb_series(series: pd.Series, threshold):
+    # indicator warm-up NaNs would poison the bucket averages, so they are dropped first
+    valid = series.dropna()
+    if len(valid) <= threshold:
+        return valid
+    return valid.iloc[lttb(_x(valid.index), valid.to_numpy(), threshold)]
+
+
+def lttb_frame(df: pd.DataFrame, threshold):
+    # one shared x axis for multi-line charts: the union of the points each line keeps
+    if len(df) <= threshold:
+        return df
+    x = _x(df.index)
+    keep = set()
+    for column in df.columns:
+        values = df[column].to_numpy(dtype=float)
+        rows = np.flatnonzero(~np.isnan(values))
+        if len(rows):
+            keep.update(rows[lttb(x[rows], values[rows], threshold)].tolist())
+    return df.iloc[sorted(keep)]
+
+
+def chart_budget(width_px):
+    return max(int(width_px / PX_PER_CANDLE), 10), max(int(width_px * POINTS_PER_PX), 10)
@@ -0,0 +1,342 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+
+INDICATORS = {}
+
+
+def register_indicator(kind):
+    def decorator(func):
+        INDICATORS[kind] = func
+        return func
+    return decorator
+
+
+# column name -> (indicator kind, parameters); parameters left out take the indicator's defaults
+DEFAULT_SPEC = {
+    "MA20": ("sma", {"window": 20}),
+    "MA50": ("sma", {"window": 50}),
+    "MA200": ("sma", {"window": 200}),
+    "RSI": ("rsi", {"period": 14}),
+    "MACD": ("macd", {"fast": 12, "slow": 26}),
+    "MACD_signal": ("macd_signal", {"fast": 12, "slow": 26, "signal": 9}),
+    "MACD_hist": ("macd_hist", {"fast": 12, "slow": 26, "signal": 9}),
+    "BB_upper": ("bb_upper", {"window": 20, "width": 2}),
+    "BB_middle": ("bb_middle", {"window": 20}),
+    "BB_lower": ("bb_lower", {"window": 20, "width": 2}),
+    "%K": ("stoch_k", {"period": 14}),
+    "%D": ("stoch_d", {"period": 14, "smooth": 3}),
+    "ATR": ("atr", {"period": 14}),
+}
+
+
+def variants(kind, name=None, **params):
+    # variants("sma", window=[10, 20]) -> {"sma_10": ("sma", {"window": 10}), "sma_20": ("sma", {"window": 20})}
+    values = [value if isinstance(value, (list, tuple, range)) else [value] for value in params.values()]
+    return {"_".join([name or kind, *map(str, combination)]): (kind, dict(zip(params, combination)))
+            for combination in itertools.product(*values)}
+
+
+class IndicatorPlan:
+    # evaluates indicator specs over one frame; every intermediate is computed once and shared
+    def __init__(self, frame, warmup=0, ewm_seeds=None):
+        # frame: anything with OHLC columns: a DataFrame, a dict of time x symbol DataFrames (a panel), Bars
+        self.frame = frame
+        self.warmup = warmup
+        self.ewm_seeds = ewm_seeds or {}
+        self.nodes = {}
+        self._requests = 0
+        self._last_use = {}
+        self._ewm_last = {}
+        close = frame["Close"]
+        self.index = close.index
+        self.columns = close.columns if isinstance(close, pd.DataFrame) else None
+        self.length = len(close)
+
+    def node(self, key, compute):
+        position = self._requests
+        self._requests += 1
+        value = self.nodes.get(key)
+        if value is None:
+            value = self.nodes[key] = compute()
+        if self._last_use.get(key) == position:
+            # no later request needs it: the caller gets the last reference
+            del self.nodes[key]
+        return value
+
+    def source(self, source):
+        # a column name or another node's key, e.g. ("stoch_k", 14)
+        if isinstance(source, tuple):
+            return getattr(self, source[0])(*source[1:])
+        return self.column(source)
+
+    def column(self, name):
+        return self.node(name, lambda: self.frame[name].to_numpy(dtype=float))
+
+    def previous(self, source):
+        def compute():
+            values = self.source(source)
+            shifted = np.empty_like(values)
+            shifted[:1] = np.nan
+            shifted[1:] = values[:-1]
+            return shifted
+        return self.node(("previous", source), compute)
+
+    def delta(self, source):
+        return self.node(("delta", source), lambda: self.source(source) - self.previous(source))
+
+    def gain(self, source):
+        # the first bar has no delta and counts as no change, like delta.where(delta > 0, 0)
+        return self.node(("gain", source), lambda: np.where(self.delta(source) > 0, self.delta(source), 0.0))
+
+    def loss(self, source):
+        return self.node(("loss", source), lambda: np.where(self.delta(source) < 0, -self.delta(source), 0.0))
+
+    def true_range(self):
+        def compute():
+            high, low, previous_close = self.column("High"), self.column("Low"), self.previous("Close")
+            # fmax skips NaN like a row-wise max, so the first bar is High - Low
+            return np.fmax(np.fmax(high - low, np.abs(high - previous_close)), np.abs(low - previous_close))
+        return self.node(("true_range",), compute)
+
+    def prefix_sums(self, source):
+        # running sums of the values, centred to keep window differences precise, of the missing values and,
+        # for sources with zeros such as gains and losses, of the non-zero ones
+        def compute():
+            values = self.source(source)
+            valid = np.isfinite(values)
+            complete = valid.all()
+            counts = valid.sum(axis=0)
+            centred = values if complete else np.where(valid, values, 0.0)
+            reference = np.where(counts > 0, centred.sum(axis=0) / np.maximum(counts, 1), 0.0)
+            sums = np.zeros((len(values) + 1,) + values.shape[1:])
+            np.cumsum(centred - reference if complete else np.where(valid, centred - reference, 0.0), axis=0, out=sums[1:])
+            missing = None
+            if not complete:
+                missing = np.zeros(sums.shape, dtype=np.int64)
+                np.cumsum(~valid, axis=0, out=missing[1:])
+            nonzero = None
+            if (values == 0).any():
+                nonzero = np.zeros(sums.shape, dtype=np.int64)
+                np.cumsum(valid & (values != 0), axis=0, out=nonzero[1:])
+            return sums, missing, reference, nonzero, bool((values[valid] >= 0).all())
+        return self.node(("prefix_sums", source), compute)
+
+    def sma(self, source, window):
+        # any number of windows over one source cost one subtraction each on the shared prefix sums
+        def compute():
+            sums, missing, reference, nonzero, non_negative = self.prefix_sums(source)
+            result = np.full((len(sums) - 1,) + sums.shape[1:], np.nan)
+            if window <= len(result):
+                means = result[window - 1:]
+                np.subtract(sums[window:], sums[:-window], out=means)
+                means /= window
+                means += reference
+                # the difference leaves rounding residue where the window holds nothing, which a ratio such as
+                # RSI's turns into garbage; pandas' rolling mean is exactly 0 there and never negative for
+                # non-negative values
+                if nonzero is not None:
+                    means[nonzero[window:] - nonzero[:-window] == 0] = 0.0
+                if non_negative:
+                    np.maximum(means, 0.0, out=means)
+                if missing is not None:
+                    # like pandas' rolling mean, a window with a missing value has no mean
+                    means[missing[window:] - missing[:-window] > 0] = np.nan
+            return result
+        return self.node(("sma", source, window), compute)
+
+    def rolling_std(self, source, window):
+        # sample standard deviation in two passes around the shared mean; one vectorized pass per window offset
+        def compute():
+            values = self.source(source)
+            mean = self.sma(source, window)[window - 1:]
+            result = np.full(values.shape, np.nan)
+            if 1 < window <= len(values):
+                total = np.zeros_like(mean)
+                deviation = np.empty_like(mean)
+                for offset in range(window):
+                    np.subtract(values[offset:len(values) - window + 1 + offset], mean, out=deviation)
+                    deviation *= deviation
+                    total += deviation
+                result[window - 1:] = np.sqrt(total / (window - 1))
+            return result
+        return self.node(("rolling_std", source, window), compute)
+
+    def _extreme(self, source, window, func):
+        # sparse table: extremes over 1, 2, 4, ... bars, then two overlapping spans cover any window
+        values = self.source(source)
+        result = np.full(values.shape, np.nan)
+        if window > len(values):
+            return result
+        extremes, span = values, 1
+        while span * 2 <= window:
+            extremes = func(extremes[:-span], extremes[span:])
+            span *= 2
+        # np.minimum/np.maximum propagate NaN, so a window with a missing value has no extreme, as in pandas
+        result[window - 1:] = func(extremes[:len(values) - window + 1], extremes[window - span:])
+        return result
+
+    def rolling_min(self, source, window):
+        return self.node(("rolling_min", source, window), lambda: self._extreme(source, window, np.minimum))
+
+    def rolling_max(self, source, window):
+        return self.node(("rolling_max", source, window), lambda: self._extreme(source, window, np.maximum))
+
+    def ewm(self, source, span):
+        def compute():
+            values = self.source(source)
+            # with a warm-up, EWMs only run over the new rows and continue from the carried seed
+            if self.warmup and len(values) == self.length:
+                values = values[self.warmup:]
+            seed = self.ewm_seeds.get(("ewm", source, span))
+            if seed is not None:
+                values = np.concatenate([np.asarray(seed, dtype=float)[None], values])
+            if values.ndim == 1:
+                result = pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+            else:
+                result = _ewm_rows(values, span)
+            if seed is not None:
+                result = result[1:]
+            if len(result):
+                self._ewm_last[("ewm", source, span)] = result[-1]
+            return result
+        return self.node(("ewm", source, span), compute)
+
+    def macd(self, fast, slow):
+        return self.node(("macd", fast, slow), lambda: self.ewm("Close", fast) - self.ewm("Close", slow))
+
+    def stoch_k(self, period):
+        def compute():
+            low_min = self.rolling_min("Low", period)
+            high_max = self.rolling_max("High", period)
+            return (self.column("Close") - low_min) / (high_max - low_min) * 100
+        return self.node(("stoch_k", period), compute)
+
+    def _compute(self, spec):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {name: INDICATORS[kind](self, **params) for name, (kind, params) in spec.items()}
+
+    def evaluate(self, spec, keep=True):
+        # {name: Series}, or time x symbol DataFrames for a panel; warm-up rows are dropped.
+        # keep=False frees each intermediate after its last use, for one-shot evaluations of large frames
+        if not keep:
+            trace = _Trace(self)
+            trace._compute(spec)
+            self._requests = 0
+            self._last_use = {key: position for position, key in enumerate(trace.requests)}
+        try:
+            values = self._compute(spec)
+        finally:
+            self._last_use = {}
+        return {name: self._wrap(column) for name, column in values.items()}
+
+    def _wrap(self, values):
+        index = self.index[self.warmup:] if self.warmup else self.index
+        if len(values) == self.length and self.warmup:
+            values = values[self.warmup:]
+        if values.ndim == 1:
+            return pd.Series(values, index=index, copy=False)
+        return pd.DataFrame(values, index=index, columns=self.columns, copy=False)
+
+    def ewm_state(self):
+        # the last value of every EWM, to seed the plan for the next chunk of the same series
+        return {**self.ewm_seeds, **self._ewm_last}
+
+
+def _ewm_rows(values, span):
+    # pandas' adjust=False recursion, one row at a time across all symbols instead of one symbol at a time
+    alpha = 2 / (span + 1)
+    result = np.empty_like(values)
+    weighted = np.full(values.shape[1:], np.nan)
+    old_weight = np.ones(values.shape[1:])
+    for row, current in enumerate(values):
+        observed = ~np.isnan(current)
+        started = ~np.isnan(weighted)
+        # a missing value still decays the weight of the running average
+        old_weight[started] *= 1 - alpha
+        update = started & observed & (weighted != current)
+        weighted[update] = (old_weight[update] * weighted[update] + alpha * current[update]) / (old_weight[update] + alpha)
+        old_weight[started & observed] = 1.0
+        first = ~started & observed
+        weighted[first] = current[first]
+        result[row] = weighted
+    return result
+
+
+class _Trace(IndicatorPlan):
+    # replays a spec over zero rows to record the order in which nodes are requested
+    def __init__(self, plan):
+        super().__init__(plan.frame, plan.warmup, plan.ewm_seeds)
+        self.length = 0
+        self.requests = []
+        self._shape = np.shape(plan.frame["Close"])[1:]
+
+    def node(self, key, compute):
+        self.requests.append(key)
+        return super().node(key, compute)
+
+    def column(self, name):
+        return self.node(name, lambda: np.empty((0,) + self._shape))
+
+
+@register_indicator("sma")
+def sma(plan, window=20, source="Close"):
+    return plan.sma(source, window)
+
+
+@register_indicator("ema")
+def ema(plan, span=20, source="Close"):
+    return plan.ewm(source, span)
+
+
+@register_indicator("rsi")
+def rsi(plan, period=14, source="Close"):
+    rs = plan.sma(("gain", source), period) / plan.sma(("loss", source), period)
+    return 100 - (100 / (1 + rs))
+
+
+@register_indicator("macd")
+def macd(plan, fast=12, slow=26):
+    return plan.macd(fast, slow)
+
+
+@register_indicator("macd_signal")
+def macd_signal(plan, fast=12, slow=26, signal=9):
+    return plan.ewm(("macd", fast, slow), signal)
+
+
+@register_indicator("macd_hist")
+def macd_hist(plan, fast=12, slow=26, signal=9):
+    return plan.macd(fast, slow) - plan.ewm(("macd", fast, slow), signal)
+
+
+@register_indicator("bb_middle")
+def bb_middle(plan, window=20):
+    return plan.sma("Close", window)
+
+
+@register_indicator("bb_upper")
+def bb_upper(plan, window=20, width=2):
+    return plan.sma("Close", window) + plan.rolling_std("Close", window) * width
+
+
+@register_indicator("bb_lower")
+def bb_lower(plan, window=20, width=2):
+    return plan.sma("Close", window) - plan.rolling_std("Close", window) * width
+
+
+@register_indicator("stoch_k")
+def stoch_k(plan, period=14):
+    return plan.stoch_k(period)
+
+
+@register_indicator("stoch_d")
+def stoch_d(plan, period=14, smooth=3):
+    return plan.sma(("stoch_k", period), smooth)
+
+
+@register_indicator("atr")
+def atr(plan, period=14):
+    return plan.sma(("true_range",), period)
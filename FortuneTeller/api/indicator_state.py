@@ -0,0 +1,186 @@
+import copy
+import math
+from collections import deque
+
+import pandas as pd
+
+from .technical_analysis import INDICATOR_COLUMNS
+
+
+def _divide(numerator, denominator):
+    # same results as float64 division in pandas, without raising on zero
+    if math.isnan(numerator) or math.isnan(denominator):
+        return math.nan
+    if denominator == 0:
+        return math.nan if numerator == 0 else math.copysign(math.inf, numerator) * math.copysign(1, denominator)
+    return numerator / denominator
+
+
+class RollingWindow:
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.nans = 0
+        self._pushes = 0
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            self._remove(self.values.popleft())
+        self.values.append(value)
+        if math.isnan(value):
+            self.nans += 1
+        else:
+            self.total += value
+            self.total_sq += value * value
+
+        # re-sum from the window now and then so add/subtract rounding cannot drift
+        self._pushes += 1
+        if self._pushes >= self.size:
+            self._pushes = 0
+            valid = [v for v in self.values if not math.isnan(v)]
+            self.total = math.fsum(valid)
+            self.total_sq = math.fsum(v * v for v in valid)
+
+    def copy(self):
+        window = copy.copy(self)
+        window.values = self.values.copy()
+        return window
+
+    def _remove(self, value):
+        if math.isnan(value):
+            self.nans -= 1
+        else:
+            self.total -= value
+            self.total_sq -= value * value
+
+    @property
+    def ready(self):
+        return len(self.values) == self.size and self.nans == 0
+
+    def mean(self):
+        return self.total / self.size if self.ready else math.nan
+
+    def std(self):
+        if not self.ready or self.size < 2:
+            return math.nan
+        variance = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class RollingExtreme:
+    def __init__(self, size, highest=False):
+        self.size = size
+        self.highest = highest
+        self.candidates = deque()
+        self.count = 0
+        self.last_nan = -math.inf
+
+    def push(self, value):
+        if math.isnan(value):
+            self.last_nan = self.count
+        else:
+            # monotonic deque: drop values that can never be the extreme again
+            while self.candidates and (self.candidates[-1][1] <= value if self.highest else self.candidates[-1][1] >= value):
+                self.candidates.pop()
+            self.candidates.append((self.count, value))
+        self.count += 1
+        while self.candidates and self.candidates[0][0] <= self.count - 1 - self.size:
+            self.candidates.popleft()
+
+    def copy(self):
+        extreme = copy.copy(self)
+        extreme.candidates = self.candidates.copy()
+        return extreme
+
+    def value(self):
+        if self.count < self.size or self.last_nan > self.count - 1 - self.size:
+            return math.nan
+        return self.candidates[0][1]
+
+
+class Ewm:
+    def __init__(self, span):
+        self.alpha = 2 / (span + 1)
+        self.mean = None
+
+    def push(self, value):
+        if self.mean is None:
+            self.mean = value
+        else:
+            self.mean = (1 - self.alpha) * self.mean + self.alpha * value
+        return self.mean
+
+
+class IndicatorState:
+    def __init__(self):
+        self.ma = {20: RollingWindow(20), 50: RollingWindow(50), 200: RollingWindow(200)}
+        self.gain = RollingWindow(14)
+        self.loss = RollingWindow(14)
+        self.ema_fast = Ewm(12)
+        self.ema_slow = Ewm(26)
+        self.macd_signal = Ewm(9)
+        self.low_min = RollingExtreme(14)
+        self.high_max = RollingExtreme(14, highest=True)
+        self.stoch_k = RollingWindow(3)
+        self.true_range = RollingWindow(14)
+        self.prev_close = math.nan
+        self.bars = 0
+
+    def copy(self):
+        # cheap enough to take on every bar, e.g. to recompute a bar that is still forming
+        state = copy.copy(self)
+        state.ma = {size: window.copy() for size, window in self.ma.items()}
+        for name in ("gain", "loss", "low_min", "high_max", "stoch_k", "true_range"):
+            setattr(state, name, getattr(self, name).copy())
+        for name in ("ema_fast", "ema_slow", "macd_signal"):
+            setattr(state, name, copy.copy(getattr(self, name)))
+        return state
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame):
+        state = cls()
+        for high, low, close in zip(df["High"].to_numpy(float), df["Low"].to_numpy(float), df["Close"].to_numpy(float)):
+            state._push(high, low, close)
+        return state
+
+    def update(self, bar):
+        return self._push(float(bar["High"]), float(bar["Low"]), float(bar["Close"]))
+
+    def _push(self, high, low, close):
+        for window in self.ma.values():
+            window.push(close)
+        # RSI
+        delta = close - self.prev_close
+        self.gain.push(delta if delta > 0 else 0.0)
+        self.loss.push(-delta if delta < 0 else 0.0)
+        rs = _divide(self.gain.mean(), self.loss.mean())
+        rsi = 100 - _divide(100, 1 + rs)
+        # MACD
+        macd = self.ema_fast.push(close) - self.ema_slow.push(close)
+        signal = self.macd_signal.push(macd)
+        # Bollinger Bands
+        middle = self.ma[20].mean()
+        std_dev = self.ma[20].std()
+        # Stochastic Oscillator
+        self.low_min.push(low)
+        self.high_max.push(high)
+        low_min = self.low_min.value()
+        stoch_k = _divide(close - low_min, self.high_max.value() - low_min) * 100
+        self.stoch_k.push(stoch_k)
+        # Average True Range, NaN terms are skipped like DataFrame.max(axis=1)
+        ranges = [r for r in (high - low, abs(high - self.prev_close), abs(low - self.prev_close)) if not math.isnan(r)]
+        self.true_range.push(max(ranges) if ranges else math.nan)
+
+        self.prev_close = close
+        self.bars += 1
+
+        return dict(zip(INDICATOR_COLUMNS, (
+            self.ma[20].mean(), self.ma[50].mean(), self.ma[200].mean(),
+            rsi,
+            macd, signal, macd - signal,
+            middle + std_dev * 2, middle, middle - std_dev * 2,
+            stoch_k, self.stoch_k.mean(),
+            self.true_range.mean(),
+        )))
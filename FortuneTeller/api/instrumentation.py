@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+# upper bounds of the histogram buckets, in milliseconds
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1_000, 2_000, 5_000, 10_000, float("inf")]
+
+enabled = os.getenv("FORTUNETELLER_TRACE", "").lower() not in ("", "0", "false", "no")
+
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, recorder, name, attrs):
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.recorder.record(self.name, self.start, end - self.start, self.attrs)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Recorder:
+    def __init__(self, window=1_000, max_events=20_000):
+        self.window = window
+        self.durations = defaultdict(lambda: deque(maxlen=window))
+        self.last_attrs = {}
+        self.counts = defaultdict(int)
+        self.cache_hits = defaultdict(int)
+        self.events = deque(maxlen=max_events)
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, name, start, duration, attrs):
+        with self._lock:
+            self.durations[name].append(duration)
+            self.counts[name] += 1
+            if attrs.get("cache") == "hit":
+                self.cache_hits[name] += 1
+            self.last_attrs[name] = dict(attrs)
+            self.events.append((name, start, duration, threading.get_ident(), dict(attrs)))
+
+    def reset(self):
+        with self._lock:
+            self.durations.clear()
+            self.last_attrs.clear()
+            self.counts.clear()
+            self.cache_hits.clear()
+            self.events.clear()
+
+    def summary(self):
+        with self._lock:
+            durations = {name: np.array(values) * 1000 for name, values in self.durations.items()}
+            counts = dict(self.counts)
+            cache_hits = dict(self.cache_hits)
+            last_attrs = dict(self.last_attrs)
+
+        summary = {}
+        for name, ms in durations.items():
+            histogram = np.histogram(ms, bins=[0] + BUCKETS_MS)[0]
+            summary[name] = {
+                "count": counts[name],
+                "cache_hits": cache_hits.get(name, 0),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p90_ms": float(np.percentile(ms, 90)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "max_ms": float(ms.max()),
+                "histogram": {f"<={bound}ms": int(count) for bound, count in zip(BUCKETS_MS, histogram)},
+                "last": last_attrs.get(name, {}),
+            }
+        return summary
+
+    def to_json(self):
+        return json.dumps(self.summary(), default=str)
+
+    def chrome_trace(self):
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        return {"traceEvents": [
+            {"name": name, "ph": "X", "pid": pid, "tid": tid, "ts": (start - self.origin) * 1e6, "dur": duration * 1e6,
+             "args": attrs}
+            for name, start, duration, tid, attrs in events
+        ]}
+
+    def dump_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f, default=str)
+
+
+recorder = Recorder()
+
+
+def enable(value=True):
+    global enabled
+    enabled = value
+
+
+def span(name, **attrs):
+    # a single flag check and a shared no-op object when tracing is off
+    if not enabled:
+        return NULL_SPAN
+    return Span(recorder, name, attrs)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") in ("", "/metrics"):
+            body = recorder.to_json()
+        elif self.path.rstrip("/") == "/trace":
+            body = json.dumps(recorder.chrome_trace(), default=str)
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_lock = threading.Lock()
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    global _metrics_server
+    with _metrics_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+    return _metrics_server
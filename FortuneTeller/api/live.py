@@ -0,0 +1,251 @@
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .bar_cache import YFinanceProvider
+from .indicator_state import IndicatorState
+from .technical_analysis import INDICATOR_COLUMNS, Candles, LevelIndex, indicator_columns, pattern_masks
+
+
+# intervals short enough for the live mode to be worth it
+LIVE_INTERVALS = ["1m", "2m"]
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class BarBuffer:
+    # column arrays with spare capacity at the end, doubled when full, so appends are amortized O(1)
+    def __init__(self, names, capacity=1024):
+        self.names = list(names)
+        self.ts = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty((capacity, len(self.names)))
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def _grow(self, needed):
+        capacity = max(2 * len(self.ts), needed)
+        ts = np.empty(capacity, dtype=np.int64)
+        ts[:self.length] = self.ts[:self.length]
+        values = np.empty((capacity, len(self.names)))
+        values[:self.length] = self.values[:self.length]
+        self.ts, self.values = ts, values
+
+    def extend(self, ts, values):
+        end = self.length + len(ts)
+        if end > len(self.ts):
+            self._grow(end)
+        self.ts[self.length:end] = ts
+        self.values[self.length:end] = values
+        self.length = end
+
+    def append(self, ts, row):
+        self.extend([ts], [row])
+
+    def column(self, name):
+        return self.values[:self.length, self.names.index(name)]
+
+
+class LiveSeries:
+    # one intraday series kept up to date bar by bar: indicators through IndicatorState, patterns on the
+    # newest candles and support/resistance levels as their windows complete
+    def __init__(self, history: pd.DataFrame, window=20, threshold=0.02):
+        # a recording may repeat a forming bar; its last copy wins, as in the bar cache
+        history = history[~history.index.duplicated(keep="last")].dropna(subset=["Close"])
+        self.tz = history.index.tz
+        self.unit = getattr(history.index, "unit", "ns")
+        self.window = window
+        self.bars = BarBuffer(FIELDS, capacity=max(2 * len(history), 1024))
+        self.indicators = BarBuffer(INDICATOR_COLUMNS, capacity=max(2 * len(history), 1024))
+        ts = _epoch_ns(history.index)
+        self.bars.extend(ts, _field_values(history))
+        columns, _ = indicator_columns(history)
+        self.indicators.extend(ts, np.column_stack([columns[name].to_numpy(dtype=float) for name in INDICATOR_COLUMNS]))
+
+        # the newest bar may still be forming: the state before it is kept so a revised copy can replace it
+        self._state = IndicatorState.from_history(history.iloc[:-1])
+        self._current = None
+        if len(history):
+            self._current = self._state.copy()
+            self._current.update(history.iloc[-1])
+
+        self.patterns = {name: np.flatnonzero(mask).tolist()
+                         for name, mask in pattern_masks(Candles.from_df(history)).items()}
+        self.support = LevelIndex(threshold)
+        self.resistance = LevelIndex(threshold)
+        self._next_candidate = window
+        self._update_levels()
+        self.updates = 0
+
+    def __len__(self):
+        return len(self.bars)
+
+    @property
+    def last_timestamp(self):
+        if not len(self.bars):
+            return None
+        ts = pd.Timestamp(int(self.bars.ts[len(self.bars) - 1]))
+        return ts.tz_localize("UTC").tz_convert(self.tz) if self.tz is not None else ts
+
+    @property
+    def index(self):
+        index = pd.DatetimeIndex(self.bars.ts[:len(self.bars)].view("datetime64[ns]")).as_unit(self.unit)
+        return index.tz_localize("UTC").tz_convert(self.tz) if self.tz is not None else index
+
+    @property
+    def levels(self):
+        return {"support": self.support.levels, "resistance": self.resistance.levels}
+
+    def update(self, new: pd.DataFrame):
+        # bars at the newest timestamp replace it (a forming bar), later ones are appended, older ones ignored;
+        # returns the number of bars appended
+        appended = 0
+        if new is None or new.empty:
+            return appended
+        values = _field_values(new)
+        stamps = _epoch_ns(new.index)
+        for i, (ts, row) in enumerate(zip(stamps, values)):
+            last = len(self.bars) - 1
+            if np.isnan(row[3]) or (last >= 0 and ts < self.bars.ts[last]):
+                continue
+            # a bar followed by a later one in the same batch is complete; only the newest may still change
+            forming = i + 1 == len(stamps) or stamps[i + 1] <= ts
+            if last >= 0 and ts == self.bars.ts[last]:
+                self._revise(row, forming)
+            else:
+                self._append(ts, row, forming)
+                appended += 1
+        self.updates += 1
+        return appended
+
+    def _indicator_row(self, state, row):
+        values = state.update(dict(zip(FIELDS, row)))
+        return [values[name] for name in INDICATOR_COLUMNS]
+
+    def _advance(self, row, forming):
+        # self._state covers the complete bars; a forming bar goes into a copy that a revision throws away
+        if forming:
+            self._current = self._state.copy()
+            return self._indicator_row(self._current, row)
+        self._current = None
+        return self._indicator_row(self._state, row)
+
+    def _append(self, ts, row, forming=True):
+        if self._current is not None:
+            # the previous bar is complete now that a later one arrived
+            self._state = self._current
+        self.bars.append(ts, row)
+        self.indicators.append(ts, self._advance(row, forming))
+        self._update_patterns()
+        self._update_levels()
+
+    def _revise(self, row, forming=True):
+        last = len(self.bars) - 1
+        self.bars.values[last] = row
+        self.indicators.values[last] = self._advance(row, forming)
+        for indices in self.patterns.values():
+            if indices and indices[-1] == last:
+                indices.pop()
+        self._update_patterns()
+
+    def _update_patterns(self):
+        # patterns only look at a candle and the one before it
+        last = len(self.bars) - 1
+        if last < 1:
+            return
+        rows = self.bars.values[last - 1:last + 1]
+        candles = Candles(rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3])
+        for name, mask in pattern_masks(candles).items():
+            if mask[-1]:
+                self.patterns[name].append(last)
+
+    def _update_levels(self):
+        # a bar is a level candidate once the window after it is complete; candidates are taken in order, as
+        # find_support_resistance does, so the levels match a full recomputation. The forming bar is never
+        # part of a complete window, so revising it leaves the levels alone.
+        close = self.bars.column("Close")
+        for i in range(self._next_candidate, len(close) - self.window):
+            around = close[i - self.window:i + self.window]
+            if close[i] <= around.min():
+                self.support.add(close[i])
+            if close[i] >= around.max():
+                self.resistance.add(close[i])
+            self._next_candidate = i + 1
+
+    def frame(self):
+        # OHLCV and indicators as one DataFrame, e.g. for main_chart
+        data = {name: self.bars.column(name) for name in FIELDS}
+        data.update({name: self.indicators.column(name) for name in INDICATOR_COLUMNS})
+        return pd.DataFrame(data, index=self.index)
+
+    def poll(self, feed):
+        return self.update(feed.poll(self.last_timestamp))
+
+
+def _field_values(df):
+    # column by column: selecting a column list costs more than the rest of an update for one new bar
+    missing = np.full(len(df), np.nan)
+    return np.column_stack([df[name].to_numpy(dtype=float) if name in df else missing for name in FIELDS])
+
+
+def _epoch_ns(index):
+    # asi8 counts from the UTC epoch whatever the timezone
+    if not isinstance(index, pd.DatetimeIndex):
+        index = pd.DatetimeIndex(index)
+    return index.as_unit("ns").asi8
+
+
+class PollingFeed:
+    # asks the provider only for the bars since the newest one it has, at most once per min_interval seconds
+    def __init__(self, symbol, interval, period="1d", provider=None, cache=None, min_interval=None, clock=time.time):
+        self.symbol = symbol
+        self.interval = interval
+        self.period = period
+        self.provider = provider or YFinanceProvider()
+        # the history comes from the bar cache when there is one, where the page's analysis already put it
+        self.cache = cache
+        self.min_interval = 0 if min_interval is None else min_interval
+        self.clock = clock
+        self._last_poll = None
+
+    def history(self):
+        if self.cache is not None:
+            return self.cache.get(self.symbol, self.period, self.interval)
+        return self.provider.fetch(self.symbol, self.interval, period=self.period)
+
+    def poll(self, since):
+        now = self.clock()
+        if self._last_poll is not None and now - self._last_poll < self.min_interval:
+            return None
+        self._last_poll = now
+        if since is None:
+            return self.history()
+        return self.provider.fetch(self.symbol, self.interval, start=since)
+
+
+class ReplayFeed:
+    # replays a recorded bar file (parquet or csv, e.g. one of the bar cache's files): the first `start` rows are the history, then every poll
+    # hands out the next `batch` rows. Rows repeating a timestamp replay a forming bar being revised.
+    def __init__(self, path, start=None, batch=1):
+        path = Path(path)
+        if path.suffix == ".parquet":
+            self.bars = pd.read_parquet(path)
+        else:
+            self.bars = pd.read_csv(path, index_col=0, parse_dates=True)
+        self.start = len(self.bars) // 2 if start is None else start
+        self.batch = batch
+        self.position = self.start
+
+    def history(self):
+        return self.bars.iloc[:self.start]
+
+    def poll(self, since):
+        rows = self.bars.iloc[self.position:self.position + self.batch]
+        self.position += len(rows)
+        return rows
+
+    @property
+    def finished(self):
+        return self.position >= len(self.bars)
@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from .instrumentation import span
+
+
+NEWSAPI_URL = "https://newsapi.org/v2/everything"
+
+
+class NewsApiError(Exception):
+    pass
+
+
+def symbol_query(symbol):
+    return f"'{symbol}' AND (stock OR market OR trading OR finance)"
+
+
+def date_range(days=7, now=None):
+    # in UTC, like NewsAPI's publishedAt and the article store's days
+    end_date = now or datetime.now(timezone.utc)
+    start_date = end_date - timedelta(days=days)
+    return start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+
+
+class NewsFetcher:
+    def __init__(self, api_key=None, url=NEWSAPI_URL, cache_dir=None, ttl=15 * 60, max_connections=10, timeout=10):
+        self.api_key = api_key if api_key is not None else os.getenv("NEWS_API_KEY")
+        self.url = url
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.ttl = ttl
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.requests = 0
+        self.cache_hits = 0
+        self._session = None
+        self._inflight = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        # one pooled session per fetcher, created inside the running loop
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"X-Api-Key": self.api_key or ""},
+            )
+        return self._session
+
+    def _cache_path(self, key):
+        digest = hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{digest}.json"
+
+    def _read_cache(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            entry = json.loads(self._cache_path(key).read_text())
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["fetched_at"] > self.ttl:
+            return None
+        return entry["payload"]
+
+    def _write_cache(self, key, payload):
+        if self.cache_dir is None:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._cache_path(key)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"fetched_at": time.time(), "payload": payload}))
+        os.replace(tmp, path)
+
+    async def fetch(self, query, from_date, to_date):
+        with span("newsapi", query=query) as s:
+            key = [query, from_date, to_date]
+            payload = self._read_cache(key)
+            if payload is not None:
+                self.cache_hits += 1
+                s.set(cache="hit", articles=len(payload.get("articles", [])))
+                return payload
+
+            # identical queries already on the wire share the same request
+            inflight_key = tuple(key)
+            task = self._inflight.get(inflight_key)
+            s.set(cache="miss" if task is None else "coalesced")
+            if task is None:
+                task = asyncio.ensure_future(self._request(key))
+                self._inflight[inflight_key] = task
+                task.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+            payload = await asyncio.shield(task)
+            s.set(articles=len(payload.get("articles", [])))
+            return payload
+
+    async def _request(self, key):
+        query, from_date, to_date = key
+        params = {"q": query, "language": "en", "sortBy": "publishedAt", "from": from_date, "to": to_date}
+        self.requests += 1
+        async with self._get_session().get(self.url, params=params) as response:
+            payload = await response.json(content_type=None)
+        if payload.get("status") == "error":
+            raise NewsApiError(f"{payload.get('code')}: {payload.get('message')}")
+        self._write_cache(key, payload)
+        return payload
+
+    async def fetch_symbols(self, symbols, days=7):
+        from_date, to_date = date_range(days)
+        symbols = list(dict.fromkeys(symbols))
+        results = await asyncio.gather(*(self.fetch(symbol_query(symbol), from_date, to_date) for symbol in symbols),
+                                       return_exceptions=True)
+        return dict(zip(symbols, results))
+
+
+def default_cache_dir():
+    return os.getenv("FORTUNETELLER_NEWS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "fortuneteller", "news"))
+
+
+class BackgroundFetcher:
+    # one NewsFetcher on an event loop thread of its own, shared by every thread of the process (Streamlit
+    # sessions, the scheduler, the API workers), so the connection pool is reused and identical queries
+    # share one request
+    def __init__(self, fetcher=None):
+        self.fetcher = fetcher
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _running_loop(self):
+        with self._lock:
+            if self._loop is None:
+                if self.fetcher is None:
+                    self.fetcher = NewsFetcher(cache_dir=default_cache_dir())
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="fortuneteller-news", daemon=True).start()
+            return self._loop
+
+    def fetch(self, query, from_date, to_date):
+        loop = self._running_loop()
+        return asyncio.run_coroutine_threadsafe(self.fetcher.fetch(query, from_date, to_date), loop).result()
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self.fetcher.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+
+_background = None
+_background_lock = threading.Lock()
+
+
+def background_fetcher():
+    global _background
+    with _background_lock:
+        if _background is None:
+            _background = BackgroundFetcher()
+        return _background
+
+
+def fetch_news(symbol, days=7, since=None, now=None):
+    # since ("YYYY-MM-DD HH:MM:SS") narrows the request to articles published after the newest one already stored
+    from_date, to_date = date_range(days, now)
+    if since is not None:
+        from_date = since.replace(" ", "T")
+    return background_fetcher().fetch(symbol_query(symbol), from_date, to_date)
@@ -1,27 +1,122 @@
-from newsapi import NewsApiClient
-from nltk.sentiment import SentimentIntensityAnalyzer
-import nltk
-import pandas as pd
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import threading
 
 import os
-newsapi = NewsApiClient(api_key=os.getenv("NEWS_API_KEY"))
 
-try:
-    nltk.data.find("vader_lexicon")
-except LookupError:
-    nltk.download("vader_lexicon")
+from .article_store import LABELS, article_store
+from .instrumentation import span
+from .news_fetcher import date_range, fetch_news
+
+# the newest articles listed with a summary; the summary itself counts every article of the window
+NEWS_ITEMS_LIMIT = int(os.getenv("FORTUNETELLER_NEWS_ITEMS", "100"))
+
+_lexicon_lock = threading.Lock()
+_lexicon_ready = False
+
+
+def ensure_vader_lexicon():
+    # checked once per process on first use; the resource path includes the zip, a bare name never matches
+    global _lexicon_ready
+    with _lexicon_lock:
+        if not _lexicon_ready:
+            import nltk
+            try:
+                nltk.data.find("sentiment/vader_lexicon.zip")
+            except LookupError:
+                nltk.download("vader_lexicon", quiet=True)
+            _lexicon_ready = True
+
+
+class SentimentScorer:
+    def __init__(self, maxsize=10_000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._analyzer = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def analyzer(self):
+        # the VADER lexicon is loaded once per scorer instead of once per article
+        if self._analyzer is None:
+            ensure_vader_lexicon()
+            from nltk.sentiment import SentimentIntensityAnalyzer
+            self._analyzer = SentimentIntensityAnalyzer()
+        return self._analyzer
+
+    @staticmethod
+    def _key(text):
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _polarity(self, text):
+        sentiment = self.analyzer.polarity_scores(text)
+        return {
+            "compound": sentiment["compound"],
+            "positive": sentiment["pos"],
+            "negative": sentiment["neg"],
+            "neutral": sentiment["neu"]
+        }
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+            return None
+
+    def _store(self, key, sentiment):
+        with self._lock:
+            self._cache[key] = sentiment
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def score(self, text):
+        key = self._key(text)
+        sentiment = self._lookup(key)
+        if sentiment is None:
+            sentiment = self._polarity(text)
+            self._store(key, sentiment)
+        return dict(sentiment)
+
+    def score_batch(self, texts, max_workers=None, parallel_threshold=5_000):
+        keys = [self._key(text) for text in texts]
+        results = [self._lookup(key) for key in keys]
+        # syndicated headlines repeat, so each distinct missing text is scored once
+        missing = {key: text for key, text, result in zip(keys, texts, results) if result is None}
+
+        if len(missing) >= parallel_threshold and max_workers != 1:
+            workers = max_workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(len(missing) // (4 * workers), 1)
+                scored = dict(zip(missing, executor.map(_score_text, missing.values(), chunksize=chunksize)))
+        else:
+            scored = {key: self._polarity(text) for key, text in missing.items()}
+
+        for key, sentiment in scored.items():
+            self._store(key, sentiment)
+        return [dict(result if result is not None else scored[key]) for key, result in zip(keys, results)]
+
+
+scorer = SentimentScorer()
+
+
+def _score_text(text):
+    return scorer._polarity(text)
+
+
+def prewarm():
+    # loads NLTK and the lexicon ahead of the first article, e.g. from a background thread at startup
+    return scorer.analyzer
 
-def get_sentiment_score(text):
-    sia = SentimentIntensityAnalyzer()
-    sentiment = sia.polarity_scores(text)
 
-    return {
-        "compound": sentiment["compound"],
-        "positive": sentiment["pos"],
-        "negative": sentiment["neg"],
-        "neutral": sentiment["neu"]
-    }
+def get_sentiment_score(text):
+    return scorer.score(text)
 
 def get_sentiment_label(compound_score):
     if compound_score >= 0.5:
@@ -39,61 +134,54 @@ def validate_news_article(article):
     required_fields = ["title", "description", "source", "publishedAt"]
     return all(field in article and article[field] is not None for field in required_fields)
 
-def get_news_sentiment(symbol):
-    newsapi = NewsApiClient(api_key)
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=7)
-
-    news = newsapi.get_everything(q=f"'{symbol}' AND (stock OR market OR trading OR finance)", language="en", sort_by="publishedAt", 
-                                  from_param=start_date.strftime("%Y-%m-%d"), to=end_date.strftime("%Y-%m-%d"))
-
-    if not news or news["totalResults"] == 0:
-        return {"news_items": [], "sentiment_summary": {"average_sentiment": 0, "sentiment_distribution": {"Very Positive": 0, "Positive": 0,
-                                                                                                           "Neutral": 0, "Negative": 0, "Very Negative": 0},
-                                                        "total_articles": 0, "sentiment_trend": "Neutral"}}
-
-    news_data = []
-    sentiment_scores = {"Very Positive": 0, "Positive": 0, "Neutral": 0, "Negative": 0, "Very Negative": 0}
-    total_sentiment = 0
-    valid_articles = 0
-
-    for article in news["articles"]:
-        if not validate_news_article(article):
-            continue
-
-        try:
-            text = f"{article['title']} {article['description']}"
-            sentiment = get_sentiment_score(text)
-            label = get_sentiment_label(sentiment["compound"])
-
-            sentiment_scores[label] += 1
-            total_sentiment += sentiment["compound"]
-            valid_articles += 1
-
-            news_item = {
-                "title": article["title"],
-                "summary": article["description"],
-                "source": article["source"]["name"],
-                "date": pd.Timestamp(article["publishedAt"]).strftime("%Y-%m-%d %H:%M:%S"),
-                "sentiment": label,
-                "sentiment_scores": sentiment
-            }
-            news_data.append(news_item)
-
-        except Exception as e:
-            continue
-
-    if valid_articles == 0:
-        raise ValueError("No valid news articles found")
+def empty_news_sentiment():
+    return {"news_items": [], "news_items_truncated": False, "sentiment_summary": {"average_sentiment": 0, "sentiment_distribution": dict.fromkeys(LABELS, 0),
+                                                    "total_articles": 0, "sentiment_trend": "Neutral"}}
+
+
+def news_window(days, now=None):
+    # the days both the request and the summary cover, so they agree around midnight
+    return date_range(days, now)
 
+
+def get_news_sentiment(symbol, days=7, store=None, now=None, limit=None):
+    # articles are kept in the article store: only those published since the newest stored one are fetched and
+    # scored, and the summary for the window comes from the store's per-day aggregates. news_items holds the newest
+    # `limit` of them; news_items_truncated tells when the window has more than are listed.
+    store = store or article_store()
+    start_day, end_day = news_window(days, now)
+    latest = store.latest(symbol)
+    since = latest if latest is not None and latest[:10] >= start_day else None
+    news = fetch_news(symbol, days, now=now) if since is None else fetch_news(symbol, days, since=since, now=now)
+
+    articles = [article for article in news["articles"] if validate_news_article(article)] if news else []
+    with span("vader", articles=len(articles)) as s:
+        hits = scorer.hits
+        added = store.add(symbol, articles, scorer.score_batch, get_sentiment_label)
+        s.set(cache_hits=scorer.hits - hits, new_articles=added)
+
+    summary = store.summary(symbol, start_day, end_day)
+    if summary["articles"] == 0:
+        if news and news["totalResults"] and not articles:
+            raise ValueError("No valid news articles found")
+        return empty_news_sentiment()
+
+    average = summary["compound_sum"] / summary["articles"]
     sentiment_summary = {
-        "average_sentiment": total_sentiment / valid_articles,
-        "sentiment_distribution": sentiment_scores,
-        "total_articles": valid_articles,
-        "sentiment_trend": get_sentiment_label(total_sentiment / valid_articles)
+        "average_sentiment": average,
+        "sentiment_distribution": summary["distribution"],
+        "total_articles": summary["articles"],
+        "sentiment_trend": get_sentiment_label(average)
     }
 
+    news_items = store.articles(symbol, start_day, end_day, limit=limit or NEWS_ITEMS_LIMIT)
     return {
-        "news_items": news_data,
+        "news_items": news_items,
+        "news_items_truncated": len(news_items) < summary["articles"],
         "sentiment_summary": sentiment_summary
     }
+
+
+def sentiment_history(symbol, days=90, store=None, now=None):
+    # per-day article counts and average sentiment for as far back as the store reaches; nothing is fetched
+    return (store or article_store()).daily(symbol, *news_window(days, now))
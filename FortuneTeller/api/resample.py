@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+
+VALID_TIMEFRAMES = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"]
+# the intervals yahoo serves for each timeframe
+VALID_INTERVALS = {
+    "1d": ["1m", "2m", "5m", "15m", "30m", "1h"],
+    "5d": ["1m", "2m", "5m", "15m", "30m", "1h", "1d"],
+    "1mo": ["2m", "5m", "15m", "30m", "1h", "1d", "5d", "1wk"],
+    "3mo": ["1h", "1d", "5d", "1wk", "1mo"],
+    "6mo": ["1h", "1d", "5d", "1wk", "1mo", "3mo"],
+    "1y": ["1h", "1d", "5d", "1wk", "1mo", "3mo"],
+    "2y": ["1h", "1d", "5d", "1wk", "1mo", "3mo"],
+    "5y": ["1d", "5d", "1wk", "1mo", "3mo"],
+    "10y": ["1d", "5d", "1wk", "1mo", "3mo"],
+    "ytd": ["1d", "5d", "1wk", "1mo", "3mo"],
+    "max": ["1d", "5d", "1wk", "1mo", "3mo"],
+}
+
+INTRADAY_MINUTES = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60}
+# calendar bars built from daily ones; "5d" bars follow yahoo's own grid and are still downloaded
+CALENDAR_INTERVALS = ["1wk", "1mo", "3mo"]
+
+MINUTE_NS = 60 * 10 ** 9
+DAY_NS = 24 * 60 * MINUTE_NS
+
+
+def base_interval(timeframe, interval):
+    # the finest interval yahoo serves for the timeframe that the requested bars can be built from
+    available = VALID_INTERVALS.get(timeframe, [])
+    if interval in INTRADAY_MINUTES:
+        bases = [base for base in available if base in INTRADAY_MINUTES
+                 and INTRADAY_MINUTES[interval] % INTRADAY_MINUTES[base] == 0]
+        return min(bases, key=INTRADAY_MINUTES.get, default=interval)
+    if interval in CALENDAR_INTERVALS and "1d" in available:
+        return "1d"
+    return interval
+
+
+def _wall_ns(index):
+    # nanoseconds of local wall time, so sessions and calendar periods line up with the exchange's clock
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.as_unit("ns").asi8
+
+
+def session_open(wall):
+    # the most common time of day of each day's first bar, e.g. 9:30 on US exchanges
+    days = wall // DAY_NS
+    firsts = wall[np.r_[True, days[1:] != days[:-1]]] % DAY_NS
+    values, counts = np.unique(firsts, return_counts=True)
+    return values[np.argmax(counts)]
+
+
+def bucket_labels(index: pd.DatetimeIndex, interval):
+    # wall-clock start of the bar each row belongs to: intraday bars are counted from the session open like
+    # yahoo's (an hourly bar starts at 9:30, 10:30, ...), weeks start on Monday, quarters in January
+    wall = _wall_ns(index)
+    day = wall - wall % DAY_NS
+    if interval in INTRADAY_MINUTES:
+        period = INTRADAY_MINUTES[interval] * MINUTE_NS
+        opening = session_open(wall)
+        return day + opening + (wall - day - opening) // period * period
+    if interval == "1d":
+        return day
+    if interval == "1wk":
+        # 1970-01-01 was a Thursday
+        return day - (day // DAY_NS + 3) % 7 * DAY_NS
+    months = wall.view("datetime64[ns]").astype("datetime64[M]").astype(np.int64)
+    if interval == "3mo":
+        months -= months % 3
+    elif interval != "1mo":
+        raise ValueError(f"Cannot resample to {interval}")
+    return months.astype("datetime64[M]").astype("datetime64[ns]").astype(np.int64)
+
+
+def resample_bars(df: pd.DataFrame, interval):
+    # consecutive rows sharing a bar are merged: first open, highest high, lowest low, last close, summed volume
+    # and dividends, compounded splits
+    df = df[df["Close"].notna()]
+    if df.empty:
+        return df
+    labels = bucket_labels(df.index, interval)
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(df)] - 1
+
+    data = {}
+    for name in df.columns:
+        values = df[name].to_numpy()
+        if name == "Open":
+            data[name] = values[starts]
+        elif name == "High":
+            data[name] = np.fmax.reduceat(values.astype(float), starts)
+        elif name == "Low":
+            data[name] = np.fmin.reduceat(values.astype(float), starts)
+        elif name == "Close":
+            data[name] = values[ends]
+        elif name == "Stock Splits":
+            # 0 means no split on that bar
+            ratios = np.multiply.reduceat(np.where(values == 0, 1.0, values), starts)
+            data[name] = np.where(ratios == 1.0, 0.0, ratios)
+        else:
+            data[name] = np.add.reduceat(np.nan_to_num(values) if values.dtype.kind == "f" else values, starts)
+
+    index = pd.DatetimeIndex(labels[starts].view("datetime64[ns]")).as_unit(df.index.unit)
+    if df.index.tz is not None:
+        index = index.tz_localize(df.index.tz, ambiguous=np.ones(len(index), dtype=bool), nonexistent="shift_forward")
+    # a first bar that started before the data did is kept, as yahoo returns it for the same period
+    return pd.DataFrame(data, index=index)
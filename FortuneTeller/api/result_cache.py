@@ -0,0 +1,149 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from .analysis import Analysis
+from .instrumentation import span
+from .news_sentiment import get_news_sentiment
+from .stock_data import analyze_df, get_df
+
+
+def estimate_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        # concurrent callers for the same key wait on the first caller's computation
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as error:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(error)
+            raise
+
+        size = estimate_size(value)
+        with self._lock:
+            del self._pending[key]
+            if size <= self.max_bytes:
+                self._entries[key] = (value, size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self.bytes -= evicted_size
+                    self.evictions += 1
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+result_cache = ResultCache(int(os.getenv("FORTUNETELLER_RESULT_CACHE_MB", "256")) * 1024 ** 2)
+
+
+def last_bar(df):
+    # the close is part of the key because a daily bar keeps its timestamp while it is still forming
+    return df.index[-1], float(df["Close"].iloc[-1])
+
+
+def _cached(name, key, compute, **attrs):
+    with span(name, **attrs) as s:
+        computed = []
+
+        def run():
+            computed.append(True)
+            return compute()
+
+        value = result_cache.get_or_compute(key, run)
+        s.set(cache="miss" if computed else "hit")
+        return value
+
+
+def cached_analyze(symbol, timeframe, interval):
+    df = get_df(symbol, timeframe, interval)
+    if df is None:
+        return None, None, None
+    # results are shared between sessions, so callers must treat them as read-only
+    return _cached("analyze", ("analyze", symbol, timeframe, interval, *last_bar(df)), lambda: analyze_df(df.copy()),
+                   symbol=symbol, rows=len(df))
+
+
+def cached_analysis(symbol, timeframe, interval):
+    # indicator families are filled in on first use, so a page only pays for what it shows
+    df = get_df(symbol, timeframe, interval)
+    if df is None:
+        return None
+    return _cached("analysis", ("analysis", symbol, timeframe, interval, *last_bar(df)), lambda: Analysis(df),
+                   symbol=symbol, rows=len(df))
+
+
+def _ticker_info(symbol):
+    import yfinance as yf
+    return yf.Ticker(symbol).info
+
+
+def cached_ticker_info(symbol, timeframe, interval, df):
+    return _cached("ticker_info", ("info", symbol, timeframe, interval, *last_bar(df)), lambda: _ticker_info(symbol),
+                   symbol=symbol)
+
+
+def cached_news_sentiment(symbol, timeframe, interval, df):
+    return _cached("news_sentiment", ("news", symbol, timeframe, interval, *last_bar(df)),
+                   lambda: get_news_sentiment(symbol), symbol=symbol)
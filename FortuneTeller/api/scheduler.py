@@ -0,0 +1,205 @@
+import argparse
+import heapq
+import json
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+
+from .instrumentation import span
+from .stock_data import analyze_df, get_df
+
+
+INTRADAY_SECONDS = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "90m": 5400, "1h": 3600}
+MARKET_TZ = "America/New_York"
+# daily and longer bars are refreshed once the session has closed and the final bar is published
+CLOSE_REFRESH = pd.Timedelta(hours=16, minutes=15)
+
+
+def next_refresh(interval, now):
+    now = pd.Timestamp(now, unit="s", tz="UTC")
+    if interval in INTRADAY_SECONDS:
+        period = INTRADAY_SECONDS[interval]
+        # a few seconds after the next bar boundary, so the bar is complete
+        return (now.floor(f"{period}s") + pd.Timedelta(seconds=period + 5)).timestamp()
+
+    local = now.tz_convert(MARKET_TZ)
+    due = local.normalize() + CLOSE_REFRESH
+    while due <= local or due.weekday() >= 5:
+        due = (due + pd.Timedelta(days=1)).normalize() + CLOSE_REFRESH
+    return due.timestamp()
+
+
+class SnapshotStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, symbol, timeframe, interval):
+        key = "__".join(quote(part, safe="") for part in (symbol, timeframe, interval))
+        return self.root / f"{key}.parquet", self.root / f"{key}.json"
+
+    def write(self, symbol, timeframe, interval, df, patterns, levels, expires_at):
+        data_path, meta_path = self._paths(symbol, timeframe, interval)
+        meta = {
+            "symbol": symbol, "timeframe": timeframe, "interval": interval,
+            "created_at": time.time(), "expires_at": expires_at, "last_bar": str(df.index[-1]),
+            "patterns": patterns,
+            "levels": {kind: [float(level) for level in values] for kind, values in levels.items()},
+        }
+        for path, write in ((data_path, df.to_parquet), (meta_path, lambda tmp: tmp.write_text(json.dumps(meta)))):
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            write(tmp)
+            os.replace(tmp, path)
+
+    def read(self, symbol, timeframe, interval, now=None, allow_stale=False):
+        data_path, meta_path = self._paths(symbol, timeframe, interval)
+        try:
+            meta = json.loads(meta_path.read_text())
+            if not allow_stale and (now or time.time()) > meta["expires_at"]:
+                return None
+            df = pd.read_parquet(data_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return df, meta["patterns"], meta["levels"], meta
+
+
+def analyze_job(symbol, timeframe, interval):
+    df = get_df(symbol, timeframe, interval)
+    if df is None:
+        raise ValueError(f"No data found for {symbol}")
+    return analyze_df(df)
+
+
+class RefreshScheduler:
+    def __init__(self, jobs, store, max_concurrent_fetches=4, queue_size=64, jitter=0.1, analyze=analyze_job,
+                 clock=time.time):
+        self.store = store
+        self.analyze = analyze
+        self.clock = clock
+        self.jitter = jitter
+        self.max_concurrent_fetches = max_concurrent_fetches
+        self.stats = {"refreshed": 0, "failed": 0, "deferred": 0}
+        self.errors = {}
+        # the bounded queue is the backpressure point: when workers fall behind, due jobs wait in the heap
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._due = [(self.clock(), job) for job in dict.fromkeys(tuple(job) for job in jobs)]
+        heapq.heapify(self._due)
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._workers = []
+
+    def _next_due(self, job, now):
+        due = next_refresh(job[2], now)
+        # spread refreshes of many symbols so they do not all hit the provider at once
+        return due + random.uniform(0, self.jitter * max(due - now, 0))
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            symbol, timeframe, interval = job
+            try:
+                with span("snapshot_refresh", symbol=symbol, interval=interval):
+                    df, patterns, levels = self.analyze(symbol, timeframe, interval)
+                now = self.clock()
+                due = self._next_due(job, now)
+                self.store.write(symbol, timeframe, interval, df, patterns, levels, expires_at=due + 60)
+                outcome, error = "refreshed", None
+            except Exception as exc:
+                now = self.clock()
+                # retry failed symbols on the next bar, but never sooner than a minute
+                due = now + max(60, min(next_refresh(interval, now) - now, 900))
+                outcome, error = "failed", exc
+            with self._lock:
+                self.stats[outcome] += 1
+                if error is None:
+                    self.errors.pop(job, None)
+                else:
+                    self.errors[job] = error
+                self._active.discard(job)
+                heapq.heappush(self._due, (due, job))
+            self._queue.task_done()
+
+    def start(self):
+        for _ in range(self.max_concurrent_fetches):
+            worker = threading.Thread(target=self._worker, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def dispatch(self):
+        now = self.clock()
+        with self._lock:
+            while self._due and self._due[0][0] <= now:
+                due, job = self._due[0]
+                if job in self._active:
+                    heapq.heappop(self._due)
+                    continue
+                try:
+                    self._queue.put_nowait(job)
+                except queue.Full:
+                    self.stats["deferred"] += 1
+                    break
+                heapq.heappop(self._due)
+                self._active.add(job)
+            return self._due[0][0] if self._due else None
+
+    def run_once(self):
+        self.dispatch()
+        self._queue.join()
+
+    def run_forever(self, poll=1.0):
+        while not self._stop.is_set():
+            next_due = self.dispatch()
+            wait = poll if next_due is None else min(max(next_due - self.clock(), 0.05), poll)
+            self._stop.wait(wait)
+
+    def stop(self):
+        self._stop.set()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+
+def default_snapshot_dir():
+    return os.getenv("FORTUNETELLER_SNAPSHOT_DIR", os.path.join(os.path.expanduser("~"), ".cache", "fortuneteller", "snapshots"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh FortuneTeller analysis snapshots in the background")
+    parser.add_argument("--symbols", nargs="*", default=[], help="symbols to refresh, e.g. favorites")
+    parser.add_argument("--universe", help="file with one symbol per line")
+    parser.add_argument("--series", nargs="+", default=["3mo:1d"], help="timeframe:interval pairs to refresh")
+    parser.add_argument("--max-concurrent-fetches", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--snapshot-dir", default=default_snapshot_dir())
+    args = parser.parse_args(argv)
+
+    symbols = [symbol.upper() for symbol in args.symbols]
+    if args.universe:
+        symbols += [line.strip().upper() for line in Path(args.universe).read_text().splitlines() if line.strip()]
+    jobs = [(symbol, *series.split(":", 1)) for symbol in dict.fromkeys(symbols) for series in args.series]
+
+    scheduler = RefreshScheduler(jobs, SnapshotStore(args.snapshot_dir), args.max_concurrent_fetches, args.queue_size, args.jitter)
+    scheduler.start()
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from .indicator_plan import DEFAULT_SPEC
+from .instrumentation import span
+from .stock_data import download_many
+from .technical_analysis import Candles, indicator_columns, pattern_masks
+
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class Snapshot:
+    # one row of the panel (a bar per symbol) plus the row before it, for cross-over checks
+    def __init__(self, screener, row):
+        self.screener = screener
+        self.row = row
+
+    def __getitem__(self, name):
+        if name in self.screener.patterns:
+            return self.screener.patterns[name][self.row]
+        return self.screener.values(name)[self.row]
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def previous(self, name):
+        if self.row == 0 or self.row == -len(self.screener.index):
+            return np.full(len(self.screener.symbols), np.nan)
+        return self.screener.values(name)[self.row - 1]
+
+    def crossed_above(self, fast, slow):
+        return (self.previous(fast) <= self.previous(slow)) & (self[fast] > self[slow])
+
+    def crossed_below(self, fast, slow):
+        return (self.previous(fast) >= self.previous(slow)) & (self[fast] < self[slow])
+
+
+class _Packing:
+    # moves every symbol's bars to the top of its column, in order and without the gaps where only other
+    # symbols have bars; indicators only look back, so the NaN rows after a shorter symbol's bars change nothing
+    def __init__(self, present):
+        self.shape = present.shape
+        self.length = int(present.sum(axis=0).max()) if present.size else 0
+        self.rows, self.columns = np.nonzero(present)
+        self.targets = (np.cumsum(present, axis=0) - 1)[self.rows, self.columns]
+
+    def pack(self, values):
+        packed = np.full((self.length,) + values.shape[1:], np.nan)
+        packed[self.targets, self.columns] = values[self.rows, self.columns]
+        return packed
+
+    def unpack(self, values, fill):
+        unpacked = np.full(self.shape, fill, dtype=values.dtype)
+        unpacked[self.rows, self.columns] = values[self.targets, self.columns]
+        return unpacked
+
+
+class Screener:
+    def __init__(self, fields, spec=DEFAULT_SPEC, present=None):
+        # fields: {"Open": DataFrame(time x symbol), ...} on one shared index; spec adds custom indicator variants.
+        # present: time x symbol mask of the bars each symbol has, when they do not all share the index
+        self.fields = fields
+        self.index = fields["Close"].index
+        self.symbols = list(fields["Close"].columns)
+        self._arrays = {name: frame.to_numpy(dtype=float) for name, frame in fields.items()}
+        packing = None if present is None or present.all() else _Packing(present)
+        if packing is not None:
+            # every symbol is evaluated over its own bars only, so a bar another symbol has does not break its
+            # windows, then the results are put back on the shared index
+            fields = {name: pd.DataFrame(packing.pack(self._arrays[name]), columns=self.symbols) for name in FIELDS}
+        with span("screener_indicators", rows=len(self.index), symbols=len(self.symbols)):
+            columns, _ = indicator_columns(fields, spec=spec)
+            for name in spec:
+                values = columns[name].to_numpy(dtype=float)
+                self._arrays[name] = values if packing is None else packing.unpack(values, np.nan)
+        with span("screener_patterns", rows=len(self.index), symbols=len(self.symbols)):
+            ohlc = [fields[name].to_numpy(dtype=float) for name in ["Open", "High", "Low", "Close"]]
+            self.patterns = pattern_masks(Candles(*ohlc))
+            if packing is not None:
+                self.patterns = {name: packing.unpack(mask, False) for name, mask in self.patterns.items()}
+
+    @classmethod
+    def from_frames(cls, frames, spec=DEFAULT_SPEC):
+        # bars are aligned on the union of timestamps; a symbol without a bar at a timestamp gets NaN there,
+        # while its indicators are those of its own bars
+        symbols = list(frames)
+        index = frames[symbols[0]].index
+        for symbol in symbols[1:]:
+            if not frames[symbol].index.equals(index):
+                index = index.union(frames[symbol].index)
+
+        # one 2-D block per field keeps pandas operations vectorized across symbols
+        panel = np.full((len(FIELDS), len(index), len(symbols)), np.nan)
+        present = np.ones((len(index), len(symbols)), dtype=bool)
+        for column, symbol in enumerate(symbols):
+            df = frames[symbol]
+            rows = slice(None)
+            if not df.index.equals(index):
+                rows = index.get_indexer(df.index)
+                present[:, column] = False
+                present[rows, column] = True
+            # one conversion of the whole frame is far cheaper than selecting columns through pandas
+            names = list(df.columns)
+            panel[:, rows, column] = df.to_numpy(dtype=float)[:, [names.index(field) for field in FIELDS]].T
+        fields = {field: pd.DataFrame(panel[i], index=index, columns=symbols) for i, field in enumerate(FIELDS)}
+        return cls(fields, spec, present=present)
+
+    @classmethod
+    def load(cls, symbols, timeframe, interval, download=download_many, spec=DEFAULT_SPEC):
+        return cls.from_frames(download(list(symbols), timeframe, interval), spec)
+
+    def values(self, name):
+        return self._arrays[name]
+
+    def frame(self, name):
+        return pd.DataFrame(self._arrays[name], index=self.index, columns=self.symbols)
+
+    def symbol_frame(self, symbol):
+        column = self.symbols.index(symbol)
+        return pd.DataFrame({name: values[:, column] for name, values in self._arrays.items()}, index=self.index)
+
+    def screen(self, condition, row=-1):
+        # condition receives a Snapshot and returns a boolean mask over symbols
+        mask = np.asarray(condition(Snapshot(self, row)), dtype=bool)
+        return [symbol for symbol, selected in zip(self.symbols, mask) if selected]
@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pandas as pd
+from aiohttp import web
+
+from . import instrumentation
+from .instrumentation import span
+from .news_sentiment import get_news_sentiment
+from .result_cache import _ticker_info, cached_analysis, last_bar, result_cache
+from .technical_analysis import INDICATOR_COLUMNS
+
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+# ticker info has no bar to key on, so it is cached for a fixed time
+INFO_TTL = 15 * 60
+
+
+def wants_arrow(request):
+    requested = request.query.get("format")
+    if requested is not None:
+        return requested == "arrow"
+    return ARROW_MIME in request.headers.get("Accept", "")
+
+
+def etag_for(*parts):
+    return '"' + hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def arrow_body(df: pd.DataFrame):
+    # pyarrow is only loaded by the first client that asks for it
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def json_body(value):
+    return json.dumps(value, default=str).encode("utf-8")
+
+
+def frame_json_body(df: pd.DataFrame):
+    # pandas' own encoder is several times faster than json.dumps on columns of floats; NaN becomes null
+    return df.to_json(orient="split", date_format="iso", date_unit="s").encode("utf-8")
+
+
+def patterns_frame(analysis):
+    index = analysis.df.index
+    rows = [(name, index[i]) for name, indices in analysis.patterns.items() for i in indices]
+    return pd.DataFrame(rows, columns=["pattern", "timestamp"]).sort_values("timestamp", kind="stable", ignore_index=True)
+
+
+def levels_frame(levels):
+    return pd.DataFrame([(kind, float(price)) for kind, prices in levels.items() for price in prices], columns=["kind", "price"])
+
+
+def news_frame(news):
+    return pd.DataFrame([{key: value for key, value in item.items() if key != "sentiment_scores"} | item["sentiment_scores"]
+                         for item in news["news_items"]])
+
+
+class Service:
+    # the api package behind an aiohttp application: computations run on a thread pool, at most max_concurrency
+    # at a time; requests beyond max_concurrency + max_queue in progress are turned away with 503
+    def __init__(self, analysis=cached_analysis, news=get_news_sentiment, info=_ticker_info, max_concurrency=None,
+                 max_queue=None, clock=time.time):
+        self.analysis = analysis
+        self.news = news
+        self.info = info
+        self.max_concurrency = max_concurrency or int(os.getenv("FORTUNETELLER_API_CONCURRENCY", "8"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("FORTUNETELLER_API_QUEUE", "64"))
+        self.clock = clock
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="fortuneteller-api")
+        self.requests = 0
+        self.queued = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.not_modified = 0
+        self._semaphore = None
+
+    async def run(self, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args))
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def application(self):
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get("/analyze/{symbol}", self.analyze)
+        app.router.add_get("/patterns/{symbol}", self.patterns)
+        app.router.add_get("/levels/{symbol}", self.levels)
+        app.router.add_get("/news/{symbol}", self.news_sentiment)
+        app.router.add_get("/info/{symbol}", self.ticker_info)
+        app.router.add_get("/debug", self.debug)
+        app.on_cleanup.append(self._shutdown)
+        return app
+
+    async def _shutdown(self, app):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        with span("service", path=request.path) as s:
+            response = await self.handle(request, handler)
+            s.set(status=response.status)
+            return response
+
+    async def handle(self, request, handler):
+        # admission is decided once per request, so an admitted request is never turned away halfway;
+        # the debug endpoint is always answered
+        counted = request.path != "/debug"
+        if counted and self.requests >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            return web.json_response({"error": "too many requests in progress"}, status=503, headers={"Retry-After": "1"})
+        self.requests += counted
+        try:
+            return await handler(request)
+        except web.HTTPException as error:
+            return web.json_response({"error": error.reason}, status=error.status)
+        except ValueError as error:
+            return web.json_response({"error": str(error)}, status=400)
+        finally:
+            self.requests -= counted
+
+    async def respond(self, request, etag, build):
+        # build() -> (body, content type); a matching If-None-Match skips it, and encoded bodies are kept in the
+        # result cache by tag so repeated and concurrent identical requests encode once
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+        if etag_matches(request, etag):
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+        body, content_type = await self.run(result_cache.get_or_compute, ("service", etag), build)
+        return web.Response(body=body, content_type=content_type, headers=headers)
+
+    async def load_analysis(self, request):
+        symbol = request.match_info["symbol"].upper()
+        timeframe = request.query.get("timeframe", "3mo")
+        interval = request.query.get("interval", "1d")
+        analysis = await self.run(self.analysis, symbol, timeframe, interval)
+        if analysis is None:
+            raise web.HTTPNotFound(reason=f"No price data found for {symbol}")
+        return analysis, (symbol, timeframe, interval, *last_bar(analysis.df))
+
+    async def analyze(self, request):
+        analysis, version = await self.load_analysis(request)
+        names = [name for name in request.query.get("indicators", "").split(",") if name] or INDICATOR_COLUMNS
+        unknown = set(names) - set(INDICATOR_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown indicators: {', '.join(sorted(unknown))}")
+        arrow = wants_arrow(request)
+
+        def build():
+            frame = analysis.with_indicators(*names)
+            return (arrow_body(frame), ARROW_MIME) if arrow else (frame_json_body(frame), "application/json")
+        return await self.respond(request, etag_for("analyze", *version, tuple(names), arrow), build)
+
+    async def patterns(self, request):
+        analysis, version = await self.load_analysis(request)
+        arrow = wants_arrow(request)
+
+        def build():
+            if arrow:
+                return arrow_body(patterns_frame(analysis)), ARROW_MIME
+            index = analysis.df.index
+            return json_body({name: [index[i].isoformat() for i in indices] for name, indices in analysis.patterns.items()}), \
+                "application/json"
+        return await self.respond(request, etag_for("patterns", *version, arrow), build)
+
+    async def levels(self, request):
+        analysis, version = await self.load_analysis(request)
+        arrow = wants_arrow(request)
+
+        def build():
+            levels = analysis.levels
+            if arrow:
+                return arrow_body(levels_frame(levels)), ARROW_MIME
+            return json_body({kind: [float(price) for price in prices] for kind, prices in levels.items()}), "application/json"
+        return await self.respond(request, etag_for("levels", *version, arrow), build)
+
+    async def news_sentiment(self, request):
+        symbol = request.match_info["symbol"].upper()
+        days = int(request.query.get("days", "7"))
+        news = await self.run(self.news, symbol, days)
+        arrow = wants_arrow(request)
+        content = json_body(news)
+        # news has no version of its own: the tag is a digest of the content
+        etag = etag_for("news", symbol, days, arrow, hashlib.blake2b(content, digest_size=16).hexdigest())
+        return await self.respond(request, etag, lambda: (arrow_body(news_frame(news)), ARROW_MIME) if arrow
+                                  else (content, "application/json"))
+
+    async def ticker_info(self, request):
+        symbol = request.match_info["symbol"].upper()
+        bucket = int(self.clock() // INFO_TTL)
+        info = await self.run(result_cache.get_or_compute, ("service_info", symbol, bucket), partial(self.info, symbol))
+        if not info:
+            raise web.HTTPNotFound(reason=f"No ticker info found for {symbol}")
+        return await self.respond(request, etag_for("info", symbol, bucket), lambda: (json_body(info), "application/json"))
+
+    async def debug(self, request):
+        return web.json_response({
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "not_modified": self.not_modified,
+            "max_concurrency": self.max_concurrency,
+            "result_cache": result_cache.stats(),
+            "spans": instrumentation.recorder.summary() if instrumentation.enabled else {},
+        }, dumps=lambda value: json.dumps(value, default=str))
+
+
+def main():
+    host = os.getenv("FORTUNETELLER_API_HOST", "127.0.0.1")
+    port = int(os.getenv("FORTUNETELLER_API_PORT", "8080"))
+    web.run_app(Service().application(), host=host, port=port)
+
+
+if __name__ == "__main__":
+    main()
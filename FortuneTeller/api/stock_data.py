@@ -1,21 +1,90 @@
-import yfinance as yf
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from .bar_cache import BarCache
+from .instrumentation import span
 from .technical_analysis import calculate_indicators, find_patterns, find_support_resistance
 
 
+_bar_cache = None
+
+
+def get_bar_cache():
+    global _bar_cache
+    if _bar_cache is None:
+        root = os.getenv("FORTUNETELLER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "fortuneteller", "bars"))
+        _bar_cache = BarCache(root)
+    return _bar_cache
+
+
 def get_df(symbol, timeframe, interval):
-    stock = yf.Ticker(symbol)
-    df = stock.history(period=timeframe, interval=interval)
+    with span("get_df", symbol=symbol, timeframe=timeframe, interval=interval) as s:
+        df = get_bar_cache().get_resampled(symbol, timeframe, interval)
+        s.set(rows=0 if df is None else len(df))
 
-    if df.empty:
+    if df is None or df.empty:
         return None
     return df
 
 
-def analyze(symbol, timeframe, interval):
-    df = get_df(symbol, timeframe, interval)
-    if df is not None and not df.empty:
+def analyze_df(df):
+    with span("calculate_indicators", rows=len(df)):
         df = calculate_indicators(df)
+    with span("find_patterns", rows=len(df)):
         patterns = find_patterns(df)
+    with span("find_support_resistance", rows=len(df)):
         levels = find_support_resistance(df)
+    return df, patterns, levels
+
+
+def analyze(symbol, timeframe, interval):
+    df = get_df(symbol, timeframe, interval)
+    if df is not None and not df.empty:
+        df, patterns, levels = analyze_df(df)
+
+    return df, patterns, levels
+
+
+def download_many(symbols, timeframe, interval):
+    # yfinance takes ~0.5s to import, so it is only loaded once data is actually fetched
+    import yfinance as yf
+    data = yf.download(list(symbols), period=timeframe, interval=interval, group_by="ticker",
+                       actions=True, progress=False, multi_level_index=True)
+    frames = {}
+    if data is None or data.empty:
+        return frames
+    for symbol in symbols:
+        if symbol in data.columns.get_level_values(0):
+            df = data[symbol].dropna(how="all")
+            if not df.empty:
+                frames[symbol] = df
+    return frames
+
+
+def analyze_many(symbols, timeframe, interval, max_workers=None, download=download_many):
+    # yields (symbol, (df, patterns, levels), None) or (symbol, None, error) as each symbol finishes
+    symbols = list(dict.fromkeys(symbols))
+    frames = download(symbols, timeframe, interval)
+
+    for symbol in symbols:
+        if symbol not in frames:
+            yield symbol, None, ValueError(f"No data found for {symbol}")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(analyze_df, df): symbol for symbol, df in frames.items()}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], (None if error else future.result()), error
+
+
+def get_ticker_infos(symbols, max_workers=8):
+    import yfinance as yf
+
+    def info(symbol):
+        try:
+            with span("ticker_info", symbol=symbol):
+                return yf.Ticker(symbol).info
+        except Exception:
+            return {}
 
-    return df, patterns, levels
\ No newline at end of file
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(symbols, executor.map(info, symbols)))
@@ -1,97 +1,186 @@
+import bisect
 import pandas as pd
 import numpy as np
 
+from .indicator_plan import DEFAULT_SPEC, IndicatorPlan
+
+
+INDICATOR_COLUMNS = list(DEFAULT_SPEC)
+
+
+# bars of history the longest rolling window (MA200) needs before a new bar
+WARMUP_BARS = 200
+
+
+# family -> the columns of DEFAULT_SPEC it draws, for computing only what a view shows
+INDICATOR_FAMILIES = {
+    "moving_averages": ["MA20", "MA50", "MA200"],
+    "rsi": ["RSI"],
+    "macd": ["MACD", "MACD_signal", "MACD_hist"],
+    "bollinger_bands": ["BB_upper", "BB_middle", "BB_lower"],
+    "stochastic": ["%K", "%D"],
+    "atr": ["ATR"],
+}
+FAMILY_OF = {column: family for family, columns in INDICATOR_FAMILIES.items() for column in columns}
+
+
+def indicator_columns(df: pd.DataFrame, warmup=0, ewm_seed=None, spec=DEFAULT_SPEC):
+    # MACD runs only over the bars after the warm-up rows when continuing from ewm_seed
+    plan = IndicatorPlan(df, warmup=warmup, ewm_seeds=ewm_seed)
+    columns = plan.evaluate(spec, keep=False)
+    return columns, plan.ewm_state()
+
+
+def calculate_indicators(df: pd.DataFrame, spec=DEFAULT_SPEC):
+    # adds the columns to df in place; read-only inputs such as the bar store's Bars go to indicator_columns
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError(f"calculate_indicators adds columns to a DataFrame, not {type(df).__name__}; "
+                        "use indicator_columns for the columns alone")
+    columns, _ = indicator_columns(df, spec=spec)
+    for name in spec:
+        df[name] = columns[name]
 
-def calculate_indicators(df: pd.DataFrame):
-    # Basic Moving Averages
-    df["MA20"] = df["Close"].rolling(window=20).mean()
-    df["MA50"] = df["Close"].rolling(window=50).mean()
-    df["MA200"] = df["Close"].rolling(window=200).mean()
-    # RSI
-    delta = df["Close"].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df["RSI"] = 100 - (100 / (1 + rs))
-    # MACD
-    exp1 = df["Close"].ewm(span=12, adjust=False).mean()
-    exp2 = df["Close"].ewm(span=26, adjust=False).mean()
-    df["MACD"] = exp1 - exp2
-    df["MACD_signal"] = df["MACD"].ewm(span=9, adjust=False).mean()
-    df["MACD_hist"] = df["MACD"] - df["MACD_signal"]
-    # Bollinger Bands
-    middle_band = df["Close"].rolling(window=20).mean()
-    std_dev = df["Close"].rolling(window=20).std()
-    df["BB_upper"] = middle_band + (std_dev * 2)
-    df["BB_middle"] = middle_band
-    df["BB_lower"] = middle_band - (std_dev * 2)
-    # Stochastic Oscillator
-    period = 14
-    low_min = df["Low"].rolling(window=period).min()
-    high_max = df["High"].rolling(window=period).max()
-    df["%K"] = ((df["Close"] - low_min) / (high_max - low_min)) * 100
-    df["%D"] = df["%K"].rolling(window=3).mean()
-    # Average True Range
-    high_low = df["High"] - df["Low"]
-    high_close = np.abs(df["High"] - df["Close"].shift())
-    low_close = np.abs(df["Low"] - df["Close"].shift())
-    ranges = pd.concat([high_low, high_close, low_close], axis=1)
-    true_range = np.max(ranges, axis=1)
-    df["ATR"] = true_range.rolling(window=14).mean()
-    
     return df
 
 
+def iter_indicators(chunks, chunk_size=100_000, dtype=np.float64):
+    # accepts a DataFrame or an iterable of consecutive OHLC chunks, yields each chunk with its indicators
+    if isinstance(chunks, pd.DataFrame):
+        frame = chunks
+        chunks = (frame.iloc[start:start + chunk_size] for start in range(0, len(frame), chunk_size))
+
+    tail = None
+    ewm_state = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        work = chunk if tail is None else pd.concat([tail, chunk[tail.columns]])
+        warmup = len(work) - len(chunk)
+        columns, ewm_state = indicator_columns(work, warmup=warmup, ewm_seed=ewm_state)
+
+        result = chunk.copy()
+        for name in INDICATOR_COLUMNS:
+            result[name] = columns[name].to_numpy(dtype=dtype)
+        yield result
+
+        # only the rows the rolling windows still need are carried over
+        tail = work[["High", "Low", "Close"]].iloc[-WARMUP_BARS:]
+
+
+PATTERNS = {}
+
+
+def register_pattern(name):
+    def decorator(func):
+        PATTERNS[name] = func
+        return func
+    return decorator
+
+
+def _shift(values):
+    shifted = np.empty_like(values)
+    shifted[:1] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+class Candles:
+    def __init__(self, open_, high, low, close):
+        self.open = np.asarray(open_, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+        self.low = np.asarray(low, dtype=float)
+        self.close = np.asarray(close, dtype=float)
+        # fmax/fmin skip NaN the same way DataFrame.max(axis=1) does
+        self.body = self.close - self.open
+        self.upper_shadow = self.high - np.fmax(self.open, self.close)
+        self.lower_shadow = np.fmin(self.open, self.close) - self.low
+        self.body_size = np.abs(self.body)
+        self.prev_body = _shift(self.body)
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame):
+        return cls(df["Open"].to_numpy(), df["High"].to_numpy(), df["Low"].to_numpy(), df["Close"].to_numpy())
+
+
+@register_pattern("Doji")
+def doji(c: Candles):
+    return c.body_size < 0.1 * ((c.upper_shadow + c.lower_shadow) / 2)
+
+
+@register_pattern("Hammer")
+def hammer(c: Candles):
+    return (c.lower_shadow > 2 * c.body_size) & (c.upper_shadow < 0.1 * c.lower_shadow)
+
+
+@register_pattern("Shooting Star")
+def shooting_star(c: Candles):
+    return (c.upper_shadow > 2 * c.body_size) & (c.lower_shadow < 0.1 * c.upper_shadow)
+
+
+@register_pattern("Engulfing Bullish")
+def engulfing_bullish(c: Candles):
+    return (c.prev_body < 0) & (c.body > 0) & (c.body_size > np.abs(c.prev_body))
+
+
+@register_pattern("Engulfing Bearish")
+def engulfing_bearish(c: Candles):
+    return (c.prev_body > 0) & (c.body < 0) & (c.body_size > np.abs(c.prev_body))
+
+
+def pattern_masks(candles: Candles, names=None):
+    masks = {}
+    for name in names or PATTERNS:
+        mask = np.asarray(PATTERNS[name](candles), dtype=bool)
+        # the first bar has no previous candle and is never reported
+        mask[:1] = False
+        masks[name] = mask
+    return masks
+
+
 def find_patterns(df: pd.DataFrame):
-    patterns = {"Doji": [], "Hammer": [], "Shooting Star": [], "Engulfing Bullish": [], "Engulfing Bearish": []}
-    df["Body"] = df["Close"] - df["Open"]
-    df["Upper_Shadow"] = df["High"] - df[["Open", "Close"]].max(axis=1)
-    df["Lower_Shadow"] = df[["Open", "Close"]].min(axis=1) - df["Low"]
-
-    for i in range(1, len(df)):
-        # Doji
-        body_size = abs(df["Body"].iloc[i])
-        avg_shadow = (df["Upper_Shadow"].iloc[i] + df["Lower_Shadow"].iloc[i]) / 2
-        if body_size < 0.1 * avg_shadow:
-            patterns["Doji"].append(i)
-        # Hammer
-        if (df["Lower_Shadow"].iloc[i] > 2 * body_size and 
-            df["Upper_Shadow"].iloc[i] < 0.1 * df["Lower_Shadow"].iloc[i]):
-            patterns["Hammer"].append(i)
-        # Shooting star
-        if (df["Upper_Shadow"].iloc[i] > 2 * body_size and 
-            df["Lower_Shadow"].iloc[i] < 0.1 * df["Upper_Shadow"].iloc[i]):
-            patterns["Shooting Star"].append(i)
-        # Engulfing
-        if i > 0:
-            prev_body = df["Body"].iloc[i-1]
-            curr_body = df["Body"].iloc[i]
-            # Bullish
-            if (prev_body < 0 and curr_body > 0 and 
-                abs(curr_body) > abs(prev_body)):
-                patterns["Engulfing Bullish"].append(i)
-            # Bearish
-            if (prev_body > 0 and curr_body < 0 and 
-                abs(curr_body) > abs(prev_body)):
-                patterns["Engulfing Bearish"].append(i)
-
-    return patterns
+    candles = Candles.from_df(df)
+    df["Body"] = candles.body
+    df["Upper_Shadow"] = candles.upper_shadow
+    df["Lower_Shadow"] = candles.lower_shadow
+
+    return {name: np.flatnonzero(mask).tolist() for name, mask in pattern_masks(candles).items()}
 
-def find_support_resistance(df: pd.DataFrame, window=20, threshold=0.02):
-    levels = {"support": [], "resistance": []}
 
-    for i in range(window, len(df) - window):
-        window_prices = df["Close"].iloc[i-window:i+window]
-        current_price = df["Close"].iloc[i]
+class LevelIndex:
+    def __init__(self, threshold=0.02):
+        self.threshold = threshold
+        self.levels = []
+        self._sorted = []
+
+    def is_near(self, price):
+        # only the closest accepted levels on either side can be within the threshold
+        pos = bisect.bisect_left(self._sorted, price)
+        neighbours = self._sorted[max(pos - 1, 0):pos + 1]
+        return any(abs(level - price) / price < self.threshold for level in neighbours)
+
+    def add(self, price):
+        if self.is_near(price):
+            return False
+        self.levels.append(price)
+        bisect.insort(self._sorted, price)
+        return True
+
+
+def find_support_resistance(df: pd.DataFrame, window=20, threshold=0.02):
+    close = df["Close"]
+    # rolling min/max over Close[i-window:i+window], stored at the window's last bar
+    window_min = close.rolling(window=2 * window).min().to_numpy()
+    window_max = close.rolling(window=2 * window).max().to_numpy()
+    prices = close.to_numpy()
+    candidates = np.arange(window, max(len(df) - window, window))
+    window_end = candidates + window - 1
 
-        if all(current_price <= price for price in window_prices):
-            if not any(abs(level - current_price) / current_price < threshold 
-                      for level in levels["support"]):
-                levels["support"].append(current_price)
+    support = LevelIndex(threshold)
+    for i in candidates[prices[candidates] <= window_min[window_end]]:
+        support.add(prices[i])
 
-        if all(current_price >= price for price in window_prices):
-            if not any(abs(level - current_price) / current_price < threshold 
-                      for level in levels["resistance"]):
-                levels["resistance"].append(current_price)
+    resistance = LevelIndex(threshold)
+    for i in candidates[prices[candidates] >= window_max[window_end]]:
+        resistance.add(prices[i])
 
-    return levels
+    return {"support": support.levels, "resistance": resistance.levels}
@@ -1,5 +1,5 @@
 import streamlit as st
-from ui_config import setup_ui, stock_search, analyze_page, favorites_page
+from ui_config import setup_ui, stock_search, analyze_page, favorites_page, debug_panel
 
 
 setup_ui()
@@ -11,3 +11,5 @@ if selected_page == "Stock Analysis":
     
 elif selected_page == "Favorites":
     favorites_page()
+
+debug_panel()
@@ -0,0 +1,572 @@
+import argparse
+import asyncio
+import json
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+
+from api.analysis import Analysis
+from api.article_store import ArticleStore
+from api.backtest import ma_crossover, sweep
+from api.indicator_plan import IndicatorPlan, variants
+from api.live import LiveSeries
+from api.bar_store import BarStore
+from api.bar_cache import BarCache
+from api.resample import VALID_INTERVALS
+from api.decimate import chart_budget, lttb_frame, ohlc_buckets
+from api.news_sentiment import SentimentScorer, get_news_sentiment
+from api.screener import Screener
+from api.stock_data import analyze_df, analyze_many
+from api.technical_analysis import calculate_indicators, find_patterns, find_support_resistance, iter_indicators
+
+
+def make_ohlcv(n, seed=0, start="2000-01-03", freq="min"):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.empty(n)
+    open_[0] = close[0]
+    open_[1:] = close[:-1] * (1 + rng.normal(0, 0.0005, n - 1))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.001, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.001, n)))
+    volume = rng.integers(1_000, 1_000_000, n)
+    index = pd.date_range(start, periods=n, freq=freq)
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index)
+
+
+def make_session_bars(days, start="2024-03-04", seed=0, tz="America/New_York"):
+    # minute bars over regular 9:30-16:00 sessions on business days, like yahoo's intraday history
+    sessions = pd.bdate_range(start, periods=days)
+    index = pd.DatetimeIndex(np.concatenate([pd.date_range(day + pd.Timedelta(hours=9, minutes=30), periods=390, freq="min")
+                                             for day in sessions])).tz_localize(tz)
+    df = make_ohlcv(len(index), seed=seed)
+    df.index = index
+    return df
+
+
+HEADLINE_WORDS = {
+    "subject": ["Shares", "Stock", "The company", "Investors", "Analysts", "The CEO", "Revenue", "Quarterly profit"],
+    "verb": ["soar", "plunge", "beat expectations", "miss estimates", "stall", "rally", "collapse", "hold steady"],
+    "context": ["after earnings", "amid lawsuit", "on merger talk", "despite weak guidance", "after upgrade",
+                "as CEO goes to jail", "on record demand", "ahead of the Fed meeting"],
+}
+
+
+# make_articles publishes over the 30 days before this
+ARTICLES_END = pd.Timestamp("2025-02-01", tz="UTC").to_pydatetime()
+
+
+def make_articles(n, seed=0, duplicate_ratio=0.3):
+    rng = np.random.default_rng(seed)
+    articles = []
+    for i in range(n):
+        if articles and rng.random() < duplicate_ratio:
+            # syndicated copies of an earlier story
+            articles.append(dict(articles[rng.integers(len(articles))], url=f"https://example.com/{i}"))
+            continue
+        words = [rng.choice(HEADLINE_WORDS[part]) for part in ("subject", "verb", "context")]
+        published = pd.Timestamp("2025-01-01", tz="UTC") + pd.Timedelta(minutes=int(rng.integers(0, 60 * 24 * 30)))
+        articles.append({
+            "title": " ".join(words),
+            "description": f"{words[0]} {words[1]} {words[2]}, story {i} reports.",
+            "source": {"name": f"Source {rng.integers(20)}"},
+            "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "url": f"https://example.com/{i}",
+        })
+    return articles
+
+
+# Row-by-row implementation kept as the reference for correctness checks and timings
+def find_patterns_reference(df: pd.DataFrame):
+    patterns = {"Doji": [], "Hammer": [], "Shooting Star": [], "Engulfing Bullish": [], "Engulfing Bearish": []}
+    df["Body"] = df["Close"] - df["Open"]
+    df["Upper_Shadow"] = df["High"] - df[["Open", "Close"]].max(axis=1)
+    df["Lower_Shadow"] = df[["Open", "Close"]].min(axis=1) - df["Low"]
+
+    for i in range(1, len(df)):
+        body_size = abs(df["Body"].iloc[i])
+        avg_shadow = (df["Upper_Shadow"].iloc[i] + df["Lower_Shadow"].iloc[i]) / 2
+        if body_size < 0.1 * avg_shadow:
+            patterns["Doji"].append(i)
+        if (df["Lower_Shadow"].iloc[i] > 2 * body_size and
+            df["Upper_Shadow"].iloc[i] < 0.1 * df["Lower_Shadow"].iloc[i]):
+            patterns["Hammer"].append(i)
+        if (df["Upper_Shadow"].iloc[i] > 2 * body_size and
+            df["Lower_Shadow"].iloc[i] < 0.1 * df["Upper_Shadow"].iloc[i]):
+            patterns["Shooting Star"].append(i)
+        prev_body = df["Body"].iloc[i-1]
+        curr_body = df["Body"].iloc[i]
+        if prev_body < 0 and curr_body > 0 and abs(curr_body) > abs(prev_body):
+            patterns["Engulfing Bullish"].append(i)
+        if prev_body > 0 and curr_body < 0 and abs(curr_body) > abs(prev_body):
+            patterns["Engulfing Bearish"].append(i)
+
+    return patterns
+
+
+def find_support_resistance_reference(df: pd.DataFrame, window=20, threshold=0.02):
+    levels = {"support": [], "resistance": []}
+
+    for i in range(window, len(df) - window):
+        window_prices = df["Close"].iloc[i-window:i+window]
+        current_price = df["Close"].iloc[i]
+
+        if all(current_price <= price for price in window_prices):
+            if not any(abs(level - current_price) / current_price < threshold
+                      for level in levels["support"]):
+                levels["support"].append(current_price)
+
+        if all(current_price >= price for price in window_prices):
+            if not any(abs(level - current_price) / current_price < threshold
+                      for level in levels["resistance"]):
+                levels["resistance"].append(current_price)
+
+    return levels
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_patterns(n=100_000):
+    df = make_ohlcv(n)
+    expected, reference_time = timed(find_patterns_reference, df.copy())
+    result, vectorized_time = timed(find_patterns, df.copy())
+    assert result == expected, "vectorized patterns differ from the reference loop"
+    print(f"find_patterns on {n:,} bars: loop {reference_time:.2f}s, vectorized {vectorized_time * 1000:.1f}ms "
+          f"({reference_time / vectorized_time:,.0f}x)")
+
+
+def bench_support_resistance(n=100_000):
+    df = make_ohlcv(n)
+    expected, reference_time = timed(find_support_resistance_reference, df)
+    result, fast_time = timed(find_support_resistance, df)
+    assert result == expected, "fast support/resistance differs from the reference loop"
+    print(f"find_support_resistance on {n:,} bars: loop {reference_time:.2f}s, fast {fast_time * 1000:.1f}ms "
+          f"({reference_time / fast_time:,.0f}x)")
+
+
+def bench_analyze_many(symbols=200, n=5_000):
+    frames = {f"SYM{i}": make_ohlcv(n, seed=i) for i in range(symbols)}
+    serial_time = timed(lambda: [analyze_df(df.copy()) for df in frames.values()])[1]
+    results, pool_time = timed(lambda: list(analyze_many(frames, "max", "1m", download=lambda *args: frames)))
+    assert all(error is None for _, _, error in results)
+    print(f"analyze {symbols} symbols x {n:,} bars: serial {serial_time:.2f}s, analyze_many {pool_time:.2f}s "
+          f"({serial_time / pool_time:.1f}x)")
+
+
+def bench_sentiment(n=5_000):
+    texts = [f"{article['title']} {article['description']}" for article in make_articles(n)]
+
+    def per_article_analyzer():
+        from nltk.sentiment import SentimentIntensityAnalyzer
+        return [SentimentIntensityAnalyzer().polarity_scores(text) for text in texts]
+
+    reference_time = timed(per_article_analyzer)[1]
+    cold_time = timed(SentimentScorer().score_batch, texts)[1]
+    scorer = SentimentScorer()
+    scorer.score_batch(texts)
+    warm_time = timed(scorer.score_batch, texts)[1]
+    print(f"sentiment on {n:,} articles: new analyzer per article {n / reference_time:,.0f}/s, "
+          f"shared analyzer {n / cold_time:,.0f}/s, cached {n / warm_time:,.0f}/s")
+
+
+def bench_news_store(n=5_000, new=50):
+    # a refresh bringing `new` articles: the whole window scored from scratch vs. only the new ones into the store
+    articles = sorted(make_articles(n + new, duplicate_ratio=0), key=lambda article: article["publishedAt"])
+    # a loaded analyzer that caches nothing, so both sides pay for every article they score
+    scorer = SentimentScorer(maxsize=0)
+    scorer.analyzer
+
+    def refresh(batch, store):
+        news = {"status": "ok", "totalResults": len(batch), "articles": batch}
+        with patch("api.news_sentiment.fetch_news", return_value=news), \
+             patch("api.news_sentiment.scorer", scorer):
+            return get_news_sentiment("BENCH", days=31, store=store, now=ARTICLES_END)
+
+    full_time = timed(refresh, articles, ArticleStore(":memory:"))[1]
+    store = ArticleStore(":memory:")
+    refresh(articles[:n], store)
+    incremental_time = timed(refresh, articles[n - 1:], store)[1]
+    summary_time = timed(store.summary, "BENCH", "2025-01-01", "2025-01-31")[1]
+    print(f"news refresh over {n + new:,} articles with {new} new: scored from scratch {full_time * 1000:.0f}ms, "
+          f"incremental {incremental_time * 1000:.0f}ms (window summary {summary_time * 1000:.2f}ms)")
+
+
+def peak_memory(func, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_streaming(n=2_000_000, chunk_size=100_000):
+    df = make_ohlcv(n)
+    in_memory = peak_memory(lambda: calculate_indicators(df.copy()))
+    streaming = peak_memory(lambda: sum(len(chunk) for chunk in iter_indicators(df, chunk_size=chunk_size, dtype=np.float32)))
+    print(f"indicators on {n:,} bars: in-memory peak {in_memory / 1e6:,.0f}MB, "
+          f"streaming ({chunk_size:,}-bar chunks, float32) peak {streaming / 1e6:,.0f}MB")
+
+
+def bench_screener(symbols=2_000, n=500):
+    frames = {f"SYM{i}": make_ohlcv(n, seed=i, freq="D") for i in range(symbols)}
+    screener, build_time = timed(Screener.from_frames, frames)
+    query = lambda s: (s.RSI < 30) & s.crossed_above("Close", "MA50") & s.Hammer
+    matches, query_time = timed(screener.screen, query)
+    print(f"screener over {symbols:,} symbols x {n} bars: build {build_time:.2f}s, "
+          f"query {query_time * 1000:.2f}ms ({len(matches)} matches)")
+
+
+def bench_bar_store(n=2_000_000):
+    df = make_ohlcv(n, start="2015-01-02", freq="min")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BarStore(tmp)
+        store.append("BENCH", "1m", df)
+        start, end = df.index[n // 2], df.index[n // 2 + 389]
+        bars, open_time = timed(store.read, "BENCH", "1m", start=start, end=end)
+        frame_time = timed(bars.to_frame)[1]
+        parquet_path = f"{tmp}/bench.parquet"
+        df.to_parquet(parquet_path)
+        parquet_time = timed(lambda: pd.read_parquet(parquet_path).loc[start:end])[1]
+    print(f"one session out of {n:,} 1m bars: memmap slice {open_time * 1000:.2f}ms (+{frame_time * 1000:.2f}ms to frame), "
+          f"full Parquet read {parquet_time * 1000:.0f}ms")
+
+
+class RecordedProvider:
+    # hands out the same bars for every interval and counts the downloads
+    def __init__(self, bars):
+        self.bars = bars
+        self.downloads = 0
+
+    def fetch(self, symbol, interval, period=None, start=None):
+        self.downloads += 1
+        return self.bars if start is None else self.bars[self.bars.index >= start]
+
+
+def bench_resample(sessions=21, timeframe="1mo"):
+    # a user stepping through every intraday interval of one symbol and back again: one download per interval
+    # vs. one base download with the coarser bars derived and kept in memory
+    bars = make_session_bars(sessions)
+    intervals = [interval for interval in VALID_INTERVALS[timeframe] if interval.endswith(("m", "h"))]
+    clock = lambda: bars.index[-1].timestamp()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("get", "get_resampled"):
+            provider = RecordedProvider(bars)
+            cache = BarCache(Path(tmp) / name, provider=provider, clock=clock)
+            get = getattr(cache, name)
+            first_time = timed(lambda: [get("BENCH", timeframe, interval) for interval in intervals])[1]
+            switch_time = timed(lambda: [get("BENCH", timeframe, interval) for interval in intervals])[1]
+            results[name] = provider.downloads, first_time, switch_time / len(intervals)
+    for name, label in (("get", "downloaded per interval"), ("get_resampled", "derived from one download")):
+        downloads, first_time, switch_time = results[name]
+        print(f"{len(intervals)} intervals over {sessions} sessions of 1m bars, {label}: {downloads} downloads, "
+              f"first pass {first_time * 1000:.0f}ms + download time, switching back {switch_time * 1000:.2f}ms per interval")
+
+
+def bench_decimate(n=1_000_000, width_px=1600):
+    df = calculate_indicators(make_ohlcv(n))
+    max_bars, max_points = chart_budget(width_px)
+    lines = ["MA20", "MA50", "MA200", "BB_upper", "BB_lower"]
+    candles, candle_time = timed(ohlc_buckets, df, max_bars)
+    decimated, line_time = timed(lttb_frame, df[lines], max_points)
+    before = len(df) * (4 + len(lines))
+    after = len(candles) * 4 + decimated.notna().to_numpy().sum()
+    print(f"main chart for {n:,} bars at {width_px}px: {before:,} -> {after:,} values "
+          f"(buckets {candle_time * 1000:.1f}ms, LTTB {line_time * 1000:.1f}ms)")
+
+
+def bench_first_chart(n=100_000):
+    # work done before the price chart can be drawn: everything up front vs. only what the chart shows
+    df = make_ohlcv(n)
+    eager_time = timed(lambda: analyze_df(df.copy()))[1]
+
+    def lazy():
+        analysis = Analysis(df)
+        return analysis.with_indicators("MA20", "MA50", "MA200", "BB_upper", "BB_lower"), analysis.levels
+    lazy_time = timed(lazy)[1]
+    print(f"time to first chart on {n:,} bars: full analysis {eager_time * 1000:.0f}ms, "
+          f"price chart inputs only {lazy_time * 1000:.0f}ms")
+
+
+def bench_backtest(years=10, max_workers=None):
+    df = make_ohlcv(252 * years, freq="B")
+    grid = {"fast": list(range(5, 55)), "slow": list(range(60, 260, 10))}
+    results, seconds = timed(sweep, df, ma_crossover, grid, cost=0.0005, max_workers=max_workers)
+    best = results.loc[results["sharpe"].idxmax()]
+    print(f"backtest sweep of {len(results):,} MA crossover combinations over {years} years of daily bars: "
+          f"{seconds:.2f}s (best fast={int(best['fast'])}, slow={int(best['slow'])}, sharpe {best['sharpe']:.2f})")
+
+
+def bench_indicator_plan(n=1_000_000, count=30):
+    df = make_ohlcv(n)
+    windows = range(5, 5 + 10 * count, 10)
+    cumsum_time = timed(np.cumsum, df["Close"].to_numpy())[1]
+    one_time = timed(lambda: IndicatorPlan(df).evaluate(variants("sma", window=[20])))[1]
+    plan_time = timed(lambda: IndicatorPlan(df).evaluate(variants("sma", window=windows)))[1]
+    pandas_time = timed(lambda: [df["Close"].rolling(window).mean() for window in windows])[1]
+    print(f"{count} moving averages over {n:,} bars: planned {plan_time * 1000:.0f}ms (one: {one_time * 1000:.0f}ms, "
+          f"a cumsum: {cumsum_time * 1000:.0f}ms), pandas rolling {pandas_time * 1000:.0f}ms")
+
+
+def bench_live(history=2_000, bars=500):
+    # one trading day of 1m bars, then new bars one poll at a time: folded in vs. the whole analysis rerun
+    df = make_ohlcv(history + bars)
+    live = LiveSeries(df.iloc[:history])
+    polls = [df.iloc[i:i + 1] for i in range(history, history + bars)]
+    live_time = timed(lambda: [live.update(bar) for bar in polls])[1] / bars
+    rerun_time = timed(lambda: analyze_df(df.copy()))[1]
+    print(f"live update on {history:,} bars: {live_time * 1e6:.0f}us per new bar, full rerun {rerun_time * 1000:.0f}ms")
+
+
+async def load_test(url, requests=1_000, concurrency=32, headers=None):
+    # closed-loop load: `concurrency` clients each send their next request as soon as the last one returns
+    import aiohttp
+    latencies, statuses = [], Counter()
+    remaining = iter(range(requests))
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async def client():
+            for _ in remaining:
+                start = time.perf_counter()
+                async with session.get(url, headers=headers) as response:
+                    await response.read()
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        seconds = time.perf_counter() - start
+    ms = np.array(latencies) * 1000
+    return {"requests": requests, "concurrency": concurrency, "seconds": seconds, "rps": requests / seconds,
+            "p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99)), "statuses": dict(statuses)}
+
+
+def format_load_test(name, result):
+    return (f"{name}: {result['rps']:,.0f} req/s, p50 {result['p50_ms']:.1f}ms, p99 {result['p99_ms']:.1f}ms "
+            f"({result['requests']:,} requests, {result['concurrency']} clients, statuses {result['statuses']})")
+
+
+def bench_service(n=5_000, requests=2_000, concurrency=32):
+    # the API service in-process over a synthetic series, so the numbers are the service's own overhead
+    import aiohttp
+    from aiohttp.test_utils import TestServer
+    from api.service import ARROW_MIME, Service
+
+    analysis = Analysis(make_ohlcv(n))
+
+    async def run():
+        server = TestServer(Service(analysis=lambda symbol, timeframe, interval: analysis).application())
+        await server.start_server()
+        try:
+            url = str(server.make_url("/analyze/BENCH"))
+            json_result = await load_test(url, requests, concurrency)
+            arrow_result = await load_test(url, requests, concurrency, headers={"Accept": ARROW_MIME})
+            async with aiohttp.ClientSession() as session, session.get(url) as response:
+                etag = response.headers["ETag"]
+            conditional = await load_test(url, requests, concurrency, headers={"If-None-Match": etag})
+        finally:
+            await server.close()
+        return json_result, arrow_result, conditional
+
+    for name, result in zip(["JSON", "Arrow IPC", "If-None-Match"], asyncio.run(run())):
+        print(format_load_test(f"service /analyze on {n:,} bars, {name}", result))
+
+
+ROOT = Path(__file__).resolve().parent
+# imported only on first use, so none of them should show up at startup
+# (plotly is not listed: streamlit imports plotly.graph_objects itself)
+DEFERRED_IMPORTS = ["yfinance", "nltk", "aiohttp"]
+
+
+def app_imports(entry="app.py"):
+    # modules app.py depends on; local scripts such as ui_config are followed rather than imported,
+    # since they call Streamlit at import time
+    modules, pending, seen = [], [entry], set()
+    while pending:
+        path = pending.pop()
+        for name in re.findall(r"^(?:from|import)\s+([\w.]+)", (ROOT / path).read_text(), re.M):
+            if (ROOT / f"{name}.py").exists():
+                if f"{name}.py" not in seen:
+                    seen.add(f"{name}.py")
+                    pending.append(f"{name}.py")
+            elif name not in modules:
+                modules.append(name)
+    return modules
+
+
+def import_times(modules):
+    # cumulative microseconds per top-level import from a fresh interpreter's -X importtime report
+    code = "; ".join(f"import {name}" for name in modules) or "pass"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    top_level, loaded = {}, set()
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            loaded.add(match.group(3).split(".")[0])
+            if len(match.group(2)) == 1:
+                top_level[match.group(3)] = int(match.group(1))
+    return top_level, loaded
+
+
+def bench_startup(repeat=5):
+    modules = app_imports()
+    # what the interpreter imports for itself (site, encodings, ...) is not part of the app's startup
+    interpreter, _ = import_times([])
+    runs = [import_times(modules) for _ in range(repeat)]
+    top_level, loaded = min(runs, key=lambda run: sum(run[0].values()))
+    top_level = {name: us for name, us in top_level.items() if name not in interpreter}
+    heaviest = sorted(top_level.items(), key=lambda item: -item[1])[:5]
+    print(f"startup imports of app.py ({len(modules)} modules): {sum(top_level.values()) / 1000:.0f}ms; heaviest "
+          + ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in heaviest)
+          + f"; deferred modules loaded: {sorted(set(DEFERRED_IMPORTS) & loaded) or 'none'}")
+
+
+BAR_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+FULL_BAR_SIZES = BAR_SIZES + [10_000_000]
+ARTICLE_SIZES = [100, 1_000, 10_000]
+
+
+def _news_stage(articles):
+    news = {"status": "ok", "totalResults": len(articles), "articles": articles}
+
+    def run():
+        # a fresh scorer so every run pays for scoring, with the network call replaced by the corpus
+        with patch("api.news_sentiment.fetch_news", return_value=news), \
+             patch("api.news_sentiment.scorer", SentimentScorer()):
+            get_news_sentiment("BENCH", days=31, store=ArticleStore(":memory:"), now=ARTICLES_END)
+    return run
+
+
+# stage -> (input kind, setup returning a zero-argument callable)
+STAGES = {
+    "calculate_indicators": ("bars", lambda df: lambda: calculate_indicators(df.copy())),
+    "find_patterns": ("bars", lambda df: lambda: find_patterns(df.copy())),
+    "find_support_resistance": ("bars", lambda df: lambda: find_support_resistance(df)),
+    "get_news_sentiment": ("articles", _news_stage),
+}
+
+
+def measure(run, repeat=3):
+    seconds = min(timed(run)[1] for _ in range(repeat))
+    return {"seconds": seconds, "peak_bytes": peak_memory(run)}
+
+
+def run_suite(stages=None, bar_sizes=BAR_SIZES, article_sizes=ARTICLE_SIZES, repeat=3, log=print):
+    results = []
+    inputs = {"bars": (bar_sizes, make_ohlcv), "articles": (article_sizes, make_articles)}
+    for kind, (sizes, make) in inputs.items():
+        for size in sizes:
+            data = None
+            for stage, (stage_kind, setup) in STAGES.items():
+                if stage_kind != kind or (stages and stage not in stages):
+                    continue
+                data = make(size) if data is None else data
+                result = {"stage": stage, "size": size, **measure(setup(data), repeat=1 if size >= 1_000_000 else repeat)}
+                results.append(result)
+                log(f"{stage:<26}{size:>12,}{result['seconds'] * 1000:>12.1f}ms{result['peak_bytes'] / 1e6:>10.1f}MB")
+    return results
+
+
+def find_regressions(results, baseline, tolerance=0.25, min_seconds=0.005):
+    previous = {(entry["stage"], entry["size"]): entry for entry in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["stage"], result["size"]))
+        if before is None:
+            continue
+        # tiny absolute differences are timer noise, not regressions
+        if (result["seconds"] > before["seconds"] * (1 + tolerance)
+                and result["seconds"] - before["seconds"] > min_seconds):
+            regressions.append(f"{result['stage']} @ {result['size']:,}: {before['seconds']:.4f}s -> {result['seconds']:.4f}s")
+        if result["peak_bytes"] > before["peak_bytes"] * (1 + tolerance) + 1024 ** 2:
+            regressions.append(f"{result['stage']} @ {result['size']:,}: peak {before['peak_bytes'] / 1e6:.1f}MB "
+                               f"-> {result['peak_bytes'] / 1e6:.1f}MB")
+    return regressions
+
+
+def run_comparisons():
+    bench_patterns()
+    bench_support_resistance()
+    bench_analyze_many()
+    bench_sentiment()
+    bench_news_store()
+    bench_streaming()
+    bench_screener()
+    bench_bar_store()
+    bench_decimate()
+    bench_first_chart()
+    bench_startup()
+    bench_backtest()
+    bench_indicator_plan()
+    bench_live()
+    bench_service()
+    bench_resample()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the FortuneTeller analysis pipeline")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), help="only run these stages")
+    parser.add_argument("--sizes", nargs="+", type=int, help="bar counts to benchmark")
+    parser.add_argument("--article-sizes", nargs="+", type=int, default=ARTICLE_SIZES, help="article counts to benchmark")
+    parser.add_argument("--full", action="store_true", help="include the 10M-bar series")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing, 0.25 = 25%%")
+    parser.add_argument("--compare", action="store_true", help="run the before/after comparisons instead of the suite")
+    parser.add_argument("--load-test", metavar="URL", help="load-test a running API service endpoint instead")
+    parser.add_argument("--requests", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--header", action="append", default=[], help="extra request header, e.g. 'Accept: ...'")
+    args = parser.parse_args(argv)
+
+    if args.load_test:
+        headers = dict(header.split(":", 1) for header in args.header)
+        headers = {name.strip(): value.strip() for name, value in headers.items()}
+        result = asyncio.run(load_test(args.load_test, args.requests, args.concurrency, headers))
+        print(format_load_test(args.load_test, result))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=2)
+        return 0
+
+    if args.compare:
+        run_comparisons()
+        return 0
+
+    bar_sizes = args.sizes or (FULL_BAR_SIZES if args.full else BAR_SIZES)
+    results = run_suite(args.stages, bar_sizes, args.article_sizes, args.repeat)
+    report = {
+        "created": pd.Timestamp.now(tz="UTC").isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
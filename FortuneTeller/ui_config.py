@@ -1,11 +1,28 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-import yfinance as yf
-import plotly.graph_objects as go
 import pandas as pd
 
 from api.utils import load_css, initialize_session_state
-from api.stock_data import analyze
-from api.news_sentiment import get_news_sentiment
+from api.stock_data import get_bar_cache, get_ticker_infos
+from api.result_cache import cached_analysis, cached_ticker_info, cached_news_sentiment, result_cache
+from api import instrumentation
+from api.scheduler import SnapshotStore, default_snapshot_dir
+from api.analysis import Analysis
+from api.news_sentiment import prewarm, sentiment_history
+from api.decimate import chart_budget, lttb_frame, ohlc_buckets
+from api.live import LIVE_INTERVALS, LiveSeries, PollingFeed, ReplayFeed
+from api.resample import VALID_INTERVALS, VALID_TIMEFRAMES
+
+
+# charts never need more points than the screen can show; wider monitors can raise this
+CHART_WIDTH_PX = int(os.getenv("FORTUNETELLER_CHART_WIDTH", "1600"))
+# above this many points per line, plotly draws with WebGL instead of SVG
+WEBGL_THRESHOLD = 1000
+# seconds between live chart updates; FORTUNETELLER_LIVE_REPLAY replays a recorded bar file instead of polling
+LIVE_POLL_SECONDS = int(os.getenv("FORTUNETELLER_LIVE_POLL", "15"))
+TECH_VIEWS = ["Moving Averages", "RSI & Stochastic", "MACD", "Bollinger Bands", "Patterns"]
 
 
 def setup_ui():
@@ -23,6 +40,10 @@ def setup_ui():
     st.markdown("The Wealth Whisperer ✨")
     st.sidebar.title("The Profit Prophet")
 
+    prewarm_sentiment()
+    if instrumentation.enabled and os.getenv("FORTUNETELLER_TRACE_PORT"):
+        instrumentation.serve_metrics(int(os.getenv("FORTUNETELLER_TRACE_PORT")))
+
 
 def stock_search():
     input_col1, input_col2, input_col3 = st.columns([2, 1, 1])
@@ -41,38 +62,30 @@ def stock_search():
                 st.session_state.favorites.append(symbol)
 
     with input_col2:
-        valid_timeframes = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"]
-        timeframe = st.selectbox("Select Timeframe", valid_timeframes, index=valid_timeframes.index("3mo"))
+        timeframe = st.selectbox("Select Timeframe", VALID_TIMEFRAMES, index=VALID_TIMEFRAMES.index("3mo"))
 
     with input_col3:
-        valid_intervals = {
-            "1d": ["1m", "2m", "5m", "15m", "30m", "1h"],
-            "5d": ["1m", "2m", "5m", "15m", "30m", "1h", "1d"],
-            "1mo": ["2m", "5m", "15m", "30m", "1h", "1d", "5d", "1wk"],
-            "3mo": ["1h", "1d", "5d", "1wk", "1mo"],
-            "6mo": ["1h", "1d", "5d", "1wk", "1mo", "3mo"],
-            "1y": ["1h", "1d", "5d", "1wk", "1mo", "3mo"],
-            "2y": ["1h", "1d", "5d", "1wk", "1mo", "3mo"],
-            "5y": ["1d", "5d", "1wk", "1mo", "3mo"],
-            "10y": ["1d", "5d", "1wk", "1mo", "3mo"],
-            "ytd": ["1d", "5d", "1wk", "1mo", "3mo"],
-            "max": ["1d", "5d", "1wk", "1mo", "3mo"],
-        }
-
-        interval = st.selectbox("Select Interval", valid_intervals[timeframe], index=valid_intervals["3mo"].index("1d"))
+        interval = st.selectbox("Select Interval", VALID_INTERVALS[timeframe], index=VALID_INTERVALS["3mo"].index("1d"))
     
     return symbol, timeframe, interval
 
 
-def main_chart(df, levels):
-    fig = go.Figure(data=[go.Candlestick(x=df.index, open=df["Open"], high=df["High"], low=df["Low"], close=df["Close"], name="OHLC")])
+def main_chart(df, levels, width_px=CHART_WIDTH_PX):
+    import plotly.graph_objects as go
+
+    max_bars, max_points = chart_budget(width_px)
+    candles = ohlc_buckets(df, max_bars)
+    lines = lttb_frame(df[["MA20", "MA50", "MA200", "BB_upper", "BB_lower"]], max_points)
+    Line = go.Scattergl if len(lines) > WEBGL_THRESHOLD else go.Scatter
+
+    fig = go.Figure(data=[go.Candlestick(x=candles.index, open=candles["Open"], high=candles["High"], low=candles["Low"], close=candles["Close"], name="OHLC")])
     #Moving Averages
-    fig.add_trace(go.Scatter(x=df.index, y=df["MA20"], name="MA20", line=dict(color="blue", width=1)))
-    fig.add_trace(go.Scatter(x=df.index, y=df["MA50"], name="MA50", line=dict(color="orange", width=1)))
-    fig.add_trace(go.Scatter(x=df.index, y=df["MA200"], name="MA200", line=dict(color="red", width=1)))
+    fig.add_trace(Line(x=lines.index, y=lines["MA20"], name="MA20", line=dict(color="blue", width=1)))
+    fig.add_trace(Line(x=lines.index, y=lines["MA50"], name="MA50", line=dict(color="orange", width=1)))
+    fig.add_trace(Line(x=lines.index, y=lines["MA200"], name="MA200", line=dict(color="red", width=1)))
     # Bollinger Bands
-    fig.add_trace(go.Scatter(x=df.index, y=df["BB_upper"], name="BB Upper", line=dict(color="gray", dash="dash")))
-    fig.add_trace(go.Scatter(x=df.index, y=df["BB_lower"], name="BB Lower", line=dict(color="gray", dash="dash")))
+    fig.add_trace(Line(x=lines.index, y=lines["BB_upper"], name="BB Upper", line=dict(color="gray", dash="dash")))
+    fig.add_trace(Line(x=lines.index, y=lines["BB_lower"], name="BB Lower", line=dict(color="gray", dash="dash")))
     #Support and resistance levels
     for level in levels["support"]:
         fig.add_hline(y=level, line_color="green", line_dash="dash", annotation_text="Support")
@@ -81,37 +94,77 @@ def main_chart(df, levels):
     fig.update_layout(title="Stock Price and Technical Analysis", yaxis_title="Price", template="plotly_dark", height=600, xaxis_rangeslider_visible=False)
 
     st.plotly_chart(fig, use_container_width=True)
+    if len(candles) < len(df):
+        st.caption(f"Showing {len(candles):,} candles and {len(lines):,} indicator points for {len(df):,} bars")
 
 
-def tech_chart(df, patterns):
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Moving Averages", "RSI & Stochastic", "MACD", "Bollinger Bands", "Patterns"])
-
-    with tab1:
-        st.line_chart(df[["MA20", "MA50", "MA200"]])
-    with tab2:
+@st.fragment
+def price_chart(analysis, symbol, timeframe, interval):
+    # toggling live mode reruns only this fragment, so the rest of the analysis stays on the page
+    if interval in LIVE_INTERVALS and st.toggle("Live updates", key=f"live_{symbol}_{timeframe}_{interval}"):
+        live_chart(symbol, timeframe, interval)
+    else:
+        main_chart(analysis.with_indicators("MA20", "MA50", "MA200", "BB_upper", "BB_lower"), analysis.levels)
+
+
+def live_feed(symbol, timeframe, interval):
+    replay = os.getenv("FORTUNETELLER_LIVE_REPLAY")
+    if replay:
+        return ReplayFeed(replay)
+    cache = get_bar_cache()
+    return PollingFeed(symbol, interval, timeframe, provider=cache.provider, cache=cache, min_interval=LIVE_POLL_SECONDS)
+
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def live_chart(symbol, timeframe, interval):
+    # reruns by itself: only the bars since the last one are fetched and folded into the session's series
+    key = f"live_series_{symbol}_{timeframe}_{interval}"
+    if key not in st.session_state:
+        feed = live_feed(symbol, timeframe, interval)
+        history = feed.history()
+        if history is None or history.empty:
+            st.error(f"No price data found for {symbol}")
+            return
+        st.session_state[key] = (LiveSeries(history), feed)
+    series, feed = st.session_state[key]
+    series.poll(feed)
+    main_chart(series.frame(), series.levels)
+    st.caption(f"Live: {len(series):,} bars, last at {series.last_timestamp}")
+
+
+@st.fragment
+def tech_chart(analysis, width_px=CHART_WIDTH_PX):
+    _, max_points = chart_budget(width_px)
+    # only the selected view's indicators are computed; switching views reruns just this fragment
+    view = st.radio("Indicators", TECH_VIEWS, horizontal=True, label_visibility="collapsed", key="tech_view")
+
+    if view == "Moving Averages":
+        st.line_chart(lttb_frame(analysis.indicators("MA20", "MA50", "MA200"), max_points))
+    elif view == "RSI & Stochastic":
         col1, col2 = st.columns(2)
         with col1:
-            st.line_chart(df["RSI"])
+            st.line_chart(lttb_frame(analysis.indicators("RSI"), max_points))
         with col2:
-            st.line_chart(df[["%K", "%D"]])
-    with tab3:
-        st.line_chart(df[["MACD", "MACD_signal"]])
-        st.bar_chart(df["MACD_hist"])
-    with tab4:
-        st.line_chart(df[["BB_upper", "BB_middle", "BB_lower"]])
-    with tab5:
+            st.line_chart(lttb_frame(analysis.indicators("%K", "%D"), max_points))
+    elif view == "MACD":
+        st.line_chart(lttb_frame(analysis.indicators("MACD", "MACD_signal"), max_points))
+        st.bar_chart(lttb_frame(analysis.indicators("MACD_hist"), max_points))
+    elif view == "Bollinger Bands":
+        st.line_chart(lttb_frame(analysis.indicators("BB_upper", "BB_middle", "BB_lower"), max_points))
+    else:
         st.subheader("Detected Patterns")
-        for pattern, indices in patterns.items():
+        for pattern, indices in analysis.patterns.items():
             if indices:
-                dates = df.index[indices].strftime("%Y-%m-%d").tolist()
+                dates = analysis.df.index[indices].strftime("%Y-%m-%d").tolist()
                 st.write(f"**{pattern}** pattern detected on: {", ".join(dates[-5:])}")
 
 
-def news_sentiment(symbol):
+def news_sentiment(symbol, news):
+    # news is a future started before the charts were drawn
     st.markdown("---")
     st.header("News Sentiment Analysis")
     with st.spinner("Analyzing news sentiment..."):
-        news_data = get_news_sentiment(symbol)
+        news_data = news.result()
         if news_data and news_data["news_items"]:
             summary = news_data["sentiment_summary"]
 
@@ -130,7 +183,15 @@ def news_sentiment(symbol):
             if not dist_data.empty:
                 st.bar_chart(dist_data.set_index("Sentiment"))
 
+            # every article ever fetched stays in the article store, so months of history cost one query
+            history = sentiment_history(symbol)
+            if len(history) > 1:
+                st.subheader("Sentiment History")
+                st.line_chart(history["average_sentiment"])
+
             st.subheader("Latest News Articles")
+            if news_data.get("news_items_truncated"):
+                st.caption(f"The latest {len(news_data['news_items'])} of {summary['total_articles']} articles")
             for article in news_data["news_items"]:
                 with st.expander(article["title"]):
                     st.write(f"**Source:** {article["source"]}")
@@ -160,27 +221,62 @@ def news_sentiment(symbol):
                 st.warning(f"No articles found for {symbol}")
 
 
+@st.cache_resource
+def snapshot_store():
+    return SnapshotStore(default_snapshot_dir())
+
+
+@st.cache_resource
+def background_executor():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="fortuneteller")
+
+
+@st.cache_resource
+def prewarm_sentiment():
+    # NLTK and the VADER lexicon load in the background instead of on the first news request
+    return background_executor().submit(prewarm)
+
+
+def load_analysis(symbol, timeframe, interval):
+    # a fresh snapshot from the refresh scheduler is served without downloading or computing anything
+    snapshot = snapshot_store().read(symbol, timeframe, interval)
+    if snapshot is not None:
+        df, patterns, levels, _ = snapshot
+        return Analysis(df, patterns, levels)
+    return cached_analysis(symbol, timeframe, interval)
+
+
+def ticker_metrics(info):
+    info_col1, info_col2, info_col3, info_col4 = st.columns(4)
+    with info_col1:
+        st.metric("Current Price", f"${info.get("currentPrice", "N/A")}")
+    with info_col2:
+        st.metric("Market Cap", f"${info.get("marketCap", "N/A"):,}")
+    with info_col3:
+        st.metric("PE ratio", f"${info.get("trailingPE", "N/A"):,}")
+    with info_col4:
+        st.metric("Dividend Yield", f"${info.get("dividendYield", "N/A"):,}")
+
+
 def analyze_page(symbol, timeframe, interval):
     if st.button("Analyze Stock", type="primary", use_container_width=True):
-        with st.spinner("Analyzing data..."):
-            df, patterns, levels = analyze(symbol, timeframe, interval)
-
-            info_col1, info_col2, info_col3, info_col4 = st.columns(4)
-            stock = yf.Ticker(symbol)
-            info = stock.info
-
-            with info_col1:
-                st.metric("Current Price", f"${info.get("currentPrice", "N/A")}")
-            with info_col2:
-                st.metric("Market Cap", f"${info.get("marketCap", "N/A"):,}")
-            with info_col3:
-                st.metric("PE ratio", f"${info.get("trailingPE", "N/A"):,}")
-            with info_col4:
-                st.metric("Dividend Yield", f"${info.get("dividendYield", "N/A"):,}")
-                
-            main_chart(df, levels)
-            tech_chart(df, patterns)
-            news_sentiment(symbol)
+        with st.spinner("Loading price data..."):
+            analysis = load_analysis(symbol, timeframe, interval)
+        if analysis is None:
+            st.error(f"No price data found for {symbol}")
+            return
+
+        # ticker info and news are fetched in the background while the charts are drawn
+        executor = background_executor()
+        info = executor.submit(cached_ticker_info, symbol, timeframe, interval, analysis.df)
+        news = executor.submit(cached_news_sentiment, symbol, timeframe, interval, analysis.df)
+
+        metrics = st.empty()
+        price_chart(analysis, symbol, timeframe, interval)
+        tech_chart(analysis)
+        with metrics.container():
+            ticker_metrics(info.result())
+        news_sentiment(symbol, news)
 
 
 def favorites_page():
@@ -190,13 +286,26 @@ def favorites_page():
         st.info("No favorite stocks added yet")
     else:
         cols = st.columns(3)
+        infos = get_ticker_infos(st.session_state.favorites)
         for idx, symbol in enumerate(st.session_state.favorites):
             with cols[idx % 3]:
                 st.write(f"### {symbol}")
-                stock = yf.Ticker(symbol)
-                info = stock.info
+                info = infos[symbol]
                 st.metric("Price", f"${info.get("currentPrice", "N/A")}")
                 if st.button("Remove", key=f"remove_{symbol}", type="primary"):
                     st.session_state.favorites.remove(symbol)
 
-    
\ No newline at end of file
+
+def debug_panel():
+    if not instrumentation.enabled:
+        return
+
+    with st.sidebar.expander("Debug: stage timings"):
+        summary = instrumentation.recorder.summary()
+        if summary:
+            timings = pd.DataFrame(summary).T[["count", "cache_hits", "p50_ms", "p90_ms", "p99_ms", "max_ms"]]
+            st.dataframe(timings.astype(float).round(2))
+        st.write("**Result cache**")
+        st.json(result_cache.stats())
+        st.download_button("Download Chrome trace", json.dumps(instrumentation.recorder.chrome_trace(), default=str),
+                           file_name="fortuneteller-trace.json", mime="application/json")
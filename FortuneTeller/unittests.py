@@ -1,10 +1,39 @@
+import asyncio
+import json
+import tempfile
+import urllib.request
+import threading
+import time
+from pathlib import Path
 import unittest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from unittest.mock import patch, MagicMock
 import pandas as pd
 import numpy as np
-from api.technical_analysis import calculate_indicators, find_patterns, find_support_resistance
-from api.news_sentiment import get_sentiment_score, get_sentiment_label, validate_news_article, get_news_sentiment
-from api.stock_data import get_df
+from api.technical_analysis import calculate_indicators, find_patterns, find_support_resistance, register_pattern, PATTERNS
+from api.news_sentiment import get_sentiment_score, get_sentiment_label, validate_news_article, get_news_sentiment, SentimentScorer, \
+    sentiment_history, news_window
+from api.stock_data import get_df, analyze_df, analyze_many
+from api.bar_cache import BarCache
+from api.resample import base_interval, resample_bars
+from api.news_fetcher import BackgroundFetcher, NewsFetcher, NewsApiError, fetch_news, symbol_query
+from api.article_store import ArticleStore, format_published
+from api.service import ARROW_MIME, Service
+from api.result_cache import ResultCache, cached_analyze, cached_analysis
+from api import instrumentation
+from api.screener import Screener
+from api.scheduler import RefreshScheduler, SnapshotStore, next_refresh
+from api.bar_store import BarStore
+from api.analysis import Analysis
+from api.backtest import Signals, backtest, ma_crossover, positions, run_backtest, sweep
+from api.decimate import lttb, lttb_frame, ohlc_buckets
+from api.indicator_state import IndicatorState
+from api.live import BarBuffer, LiveSeries, PollingFeed, ReplayFeed
+from api.indicator_plan import IndicatorPlan, DEFAULT_SPEC, variants
+from api.technical_analysis import INDICATOR_COLUMNS, iter_indicators
+from benchmarks import make_ohlcv, make_session_bars, make_articles, find_patterns_reference, find_support_resistance_reference, run_suite, find_regressions, \
+    app_imports, import_times, DEFERRED_IMPORTS
 
 class TestTechnicalAnalysis(unittest.TestCase):
     def setUp(self):
@@ -73,12 +102,855 @@ class TestTechnicalAnalysis(unittest.TestCase):
         self.assertIn("Doji", result)
         # still figuring out how to test these
 
+    def test_find_patterns_matches_reference(self):
+        for df in (self.df, make_ohlcv(5_000, seed=1)):
+            expected = find_patterns_reference(df.copy())
+            result = find_patterns(df.copy())
+            self.assertEqual(result, expected)
+
+    def test_find_patterns_adds_candle_columns(self):
+        result = self.df.copy()
+        find_patterns(result)
+        expected = self.df.copy()
+        find_patterns_reference(expected)
+
+        for column in ["Body", "Upper_Shadow", "Lower_Shadow"]:
+            np.testing.assert_allclose(result[column], expected[column])
+
+    def test_register_pattern(self):
+        @register_pattern("Up Day")
+        def up_day(c):
+            return c.body > 0
+
+        try:
+            result = find_patterns(self.df.copy())
+            expected = [i for i in range(1, len(self.df)) if self.df["Close"].iloc[i] > self.df["Open"].iloc[i]]
+            self.assertEqual(result["Up Day"], expected)
+        finally:
+            del PATTERNS["Up Day"]
+
     def test_find_support_resistance(self):
         levels = find_support_resistance(self.df)
 
         self.assertIn(max(self.df["Close"]), levels["resistance"]) 
+
+    def test_find_support_resistance_matches_reference(self):
+        for df in (self.df, make_ohlcv(3_000, seed=2)):
+            for window, threshold in [(20, 0.02), (5, 0.001), (3, 0.0)]:
+                expected = find_support_resistance_reference(df, window=window, threshold=threshold)
+                self.assertEqual(find_support_resistance(df, window=window, threshold=threshold), expected)
+
+    def test_find_support_resistance_short_history(self):
+        levels = find_support_resistance(self.df.iloc[:30])
+        self.assertEqual(levels, {"support": [], "resistance": []})
     
 
+class TestIterIndicators(unittest.TestCase):
+    def setUp(self):
+        self.df = make_ohlcv(2_345, seed=8)
+        self.expected = calculate_indicators(self.df.copy())
+
+    def test_chunks_match_in_memory_path(self):
+        for chunk_size in (50, 199, 1_000, 5_000):
+            chunks = list(iter_indicators(self.df, chunk_size=chunk_size))
+            self.assertTrue(all(len(chunk) <= chunk_size for chunk in chunks))
+            pd.testing.assert_frame_equal(pd.concat(chunks), self.expected, rtol=1e-9)
+
+    def test_macd_is_exact_across_chunks(self):
+        result = pd.concat(iter_indicators(self.df, chunk_size=100))
+        for column in ["MACD", "MACD_signal", "MACD_hist"]:
+            np.testing.assert_array_equal(result[column], self.expected[column])
+
+    def test_float32_output_from_chunk_iterable(self):
+        chunks = (self.df.iloc[start:start + 700] for start in range(0, len(self.df), 700))
+        result = pd.concat(iter_indicators(chunks, dtype=np.float32))
+
+        self.assertTrue((result[INDICATOR_COLUMNS].dtypes == np.float32).all())
+        pd.testing.assert_frame_equal(result, self.expected, check_dtype=False, rtol=1e-5)
+
+
+class TestScreener(unittest.TestCase):
+    def setUp(self):
+        self.frames = {f"SYM{i}": make_ohlcv(600, seed=i, freq="D") for i in range(12)}
+        self.screener = Screener.from_frames(self.frames)
+
+    def test_indicators_match_single_symbol_view(self):
+        for symbol, df in self.frames.items():
+            expected = calculate_indicators(df.copy())
+            result = self.screener.symbol_frame(symbol)
+            pd.testing.assert_frame_equal(result[INDICATOR_COLUMNS], expected[INDICATOR_COLUMNS], check_freq=False)
+
+    def test_patterns_match_find_patterns(self):
+        for column, (symbol, df) in enumerate(self.frames.items()):
+            expected = find_patterns(df.copy())
+            for name, indices in expected.items():
+                self.assertEqual(np.flatnonzero(self.screener.patterns[name][:, column]).tolist(), indices)
+
+    def test_screen(self):
+        frames = {symbol: calculate_indicators(df.copy()) for symbol, df in self.frames.items()}
+        row = 400
+        expected = [
+            symbol for symbol, df in frames.items()
+            if df["RSI"].iloc[row] < 50 and df["Close"].iloc[row - 1] <= df["MA20"].iloc[row - 1]
+            and df["Close"].iloc[row] > df["MA20"].iloc[row]
+        ]
+
+        result = self.screener.screen(lambda s: (s.RSI < 50) & s.crossed_above("Close", "MA20"), row=row)
+        self.assertEqual(result, expected)
+
+        doji = self.screener.screen(lambda s: s["Doji"])
+        self.assertEqual(doji, [symbol for symbol, df in self.frames.items() if len(df) - 1 in find_patterns(df.copy())["Doji"]])
+
+    def test_misaligned_symbols_match_single_symbol_view(self):
+        # BBB starts later and misses a bar the others have, CCC has a bar nobody else has
+        bbb = self.frames["SYM1"].iloc[10:].drop(self.frames["SYM1"].index[300])
+        ccc = self.frames["SYM2"].iloc[:-1]
+        ccc = pd.concat([ccc, make_ohlcv(1, seed=3, start=ccc.index[-1] + pd.Timedelta(hours=12))])
+        frames = {"AAA": self.frames["SYM0"], "BBB": bbb, "CCC": ccc}
+        screener = Screener.from_frames(frames)
+
+        self.assertEqual(len(screener.index), 601)
+        self.assertTrue(np.isnan(screener.values("Close")[:10, 1]).all())
+        for column, (symbol, df) in enumerate(frames.items()):
+            expected = calculate_indicators(df.copy())
+            result = screener.symbol_frame(symbol).loc[df.index]
+            pd.testing.assert_frame_equal(result[INDICATOR_COLUMNS], expected[INDICATOR_COLUMNS], check_freq=False)
+            self.assertTrue(np.isnan(screener.values("RSI")[~screener.index.isin(df.index), column]).all())
+            rows = screener.index.get_indexer(df.index)
+            for name, indices in find_patterns(df.copy()).items():
+                self.assertEqual(rows[indices].tolist(), np.flatnonzero(screener.patterns[name][:, column]).tolist())
+
+
+class TestIndicatorPlan(unittest.TestCase):
+    def setUp(self):
+        self.df = make_ohlcv(2_000, seed=4)
+        self.df.iloc[300:305, self.df.columns.get_loc("Close")] = np.nan
+
+    def test_default_spec_matches_pandas(self):
+        close, high, low = self.df["Close"], self.df["High"], self.df["Low"]
+        delta = close.diff()
+        true_range = pd.concat([high - low, (high - close.shift()).abs(), (low - close.shift()).abs()], axis=1).max(axis=1)
+        k = (close - low.rolling(14).min()) / (high.rolling(14).max() - low.rolling(14).min()) * 100
+        expected = {
+            "MA50": close.rolling(50).mean(),
+            "RSI": 100 - 100 / (1 + delta.where(delta > 0, 0).rolling(14).mean() / (-delta.where(delta < 0, 0)).rolling(14).mean()),
+            "BB_upper": close.rolling(20).mean() + 2 * close.rolling(20).std(),
+            "%D": k.rolling(3).mean(),
+            "ATR": true_range.rolling(14).mean(),
+        }
+        columns = IndicatorPlan(self.df).evaluate(DEFAULT_SPEC)
+        for name, values in expected.items():
+            np.testing.assert_allclose(columns[name], values, rtol=1e-9, err_msg=name)
+
+    def test_flat_windows_match_pandas(self):
+        # prices on a cent grid that often do not move: windows without gains or losses must be exactly empty
+        rng = np.random.default_rng(1)
+        close = np.round(100 + np.cumsum(rng.choice([-0.01, 0, 0, 0, 0.01], 5_000)), 2)
+        df = pd.DataFrame({"Open": close, "High": close + 0.01, "Low": close - 0.01, "Close": close})
+        delta = df["Close"].diff()
+        expected = 100 - 100 / (1 + delta.where(delta > 0, 0).rolling(14).mean() / (-delta.where(delta < 0, 0)).rolling(14).mean())
+
+        rsi = calculate_indicators(df.copy())["RSI"]
+
+        self.assertGreater(expected.isna().sum(), 14)
+        np.testing.assert_array_equal(rsi.isna(), expected.isna())
+        np.testing.assert_allclose(rsi, expected, rtol=1e-9)
+        self.assertTrue(rsi.dropna().between(0, 100).all())
+
+    def test_shared_intermediates_are_computed_once(self):
+        plan = IndicatorPlan(self.df)
+        columns = plan.evaluate({**DEFAULT_SPEC, **variants("sma", window=range(5, 305, 10))})
+
+        self.assertEqual(len(columns), len(DEFAULT_SPEC) + 30)
+        self.assertEqual(sum(1 for key in plan.nodes if key[0] == "prefix_sums" and key[1] == "Close"), 1)
+        self.assertTrue(np.shares_memory(columns["MA20"].to_numpy(), columns["BB_middle"].to_numpy()))
+        np.testing.assert_allclose(columns["sma_105"], self.df["Close"].rolling(105).mean(), rtol=1e-9)
+
+    def test_one_shot_evaluation_frees_intermediates(self):
+        plan = IndicatorPlan(self.df)
+        columns = plan.evaluate(DEFAULT_SPEC, keep=False)
+        self.assertEqual(plan.nodes, {})
+        for name, values in IndicatorPlan(self.df).evaluate(DEFAULT_SPEC).items():
+            pd.testing.assert_series_equal(columns[name], values)
+
+    def test_custom_spec_in_calculate_indicators_and_screener(self):
+        spec = {"EMA10": ("ema", {"span": 10}), **variants("rsi", period=[7, 21])}
+        result = calculate_indicators(self.df.copy(), spec=spec)
+        self.assertEqual(list(result.columns[-3:]), ["EMA10", "rsi_7", "rsi_21"])
+        np.testing.assert_allclose(result["EMA10"], self.df["Close"].ewm(span=10, adjust=False).mean())
+
+        frames = {"AAA": self.df, "BBB": make_ohlcv(2_000, seed=5)}
+        screener = Screener.from_frames(frames, spec=spec)
+        np.testing.assert_allclose(screener.values("rsi_7")[:, 0], result["rsi_7"])
+        np.testing.assert_allclose(screener.values("EMA10")[:, 0], result["EMA10"])
+
+
+class TestIndicatorState(unittest.TestCase):
+    def setUp(self):
+        self.df = make_ohlcv(1_500, seed=3)
+        self.expected = calculate_indicators(self.df.copy())
+
+    def test_update_matches_calculate_indicators(self):
+        state = IndicatorState.from_history(self.df.iloc[:250])
+        rows = [state.update(bar) for _, bar in self.df.iloc[250:].iterrows()]
+        result = pd.DataFrame(rows, index=self.df.index[250:])
+
+        pd.testing.assert_frame_equal(result[INDICATOR_COLUMNS], self.expected[INDICATOR_COLUMNS].iloc[250:], rtol=1e-7)
+
+    def test_warm_up_matches_calculate_indicators(self):
+        state = IndicatorState()
+        rows = [state.update(bar) for _, bar in self.df.iloc[:250].iterrows()]
+        result = pd.DataFrame(rows, index=self.df.index[:250])
+
+        pd.testing.assert_frame_equal(result[INDICATOR_COLUMNS], self.expected[INDICATOR_COLUMNS].iloc[:250], rtol=1e-7)
+
+    def test_flat_bars(self):
+        flat = pd.DataFrame({"Open": 10.0, "High": 10.0, "Low": 10.0, "Close": 10.0}, index=range(30))
+        expected = calculate_indicators(flat.copy())
+        state = IndicatorState()
+        result = pd.DataFrame([state.update(bar) for _, bar in flat.iterrows()])
+
+        pd.testing.assert_frame_equal(result[INDICATOR_COLUMNS], expected[INDICATOR_COLUMNS])
+
+
+class TestLiveSeries(unittest.TestCase):
+    def setUp(self):
+        self.df = make_ohlcv(1_200, seed=6)
+        self.df.index = self.df.index.tz_localize("America/New_York")
+
+    def assert_matches_full_analysis(self, live, df):
+        expected = calculate_indicators(df.copy())
+        pd.testing.assert_frame_equal(live.frame()[INDICATOR_COLUMNS], expected[INDICATOR_COLUMNS], rtol=1e-7, check_freq=False)
+        self.assertEqual(live.patterns, find_patterns(df.copy()))
+        self.assertEqual(live.levels, find_support_resistance(df))
+
+    def test_replay_with_forming_bars_matches_full_analysis(self):
+        # every bar arrives first half-formed, then complete
+        forming = self.df.copy()
+        forming["Close"] = forming["Open"]
+        forming["High"] = forming[["Open", "High"]].min(axis=1)
+        recording = pd.concat([forming, self.df]).sort_index(kind="stable")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "AAA__1m.parquet"
+            recording.to_parquet(path)
+            feed = ReplayFeed(path, start=800, batch=3)
+            live = LiveSeries(feed.history())
+            while not feed.finished:
+                live.poll(feed)
+
+        self.assertEqual(len(live), len(self.df))
+        self.assertEqual(live.last_timestamp, self.df.index[-1])
+        self.assert_matches_full_analysis(live, self.df)
+
+    def test_appends_and_ignores_stale_bars(self):
+        live = LiveSeries(self.df.iloc[:600])
+        self.assertEqual(live.update(self.df.iloc[600:]), 600)
+        self.assertEqual(live.update(self.df.iloc[500:510]), 0)
+        self.assert_matches_full_analysis(live, self.df)
+
+    def test_bar_buffer_grows(self):
+        buffer = BarBuffer(["Close"], capacity=2)
+        for i in range(100):
+            buffer.append(i, [float(i)])
+        self.assertEqual(len(buffer), 100)
+        self.assertLess(len(buffer.ts), 200)
+        np.testing.assert_array_equal(buffer.column("Close"), np.arange(100.0))
+
+    def test_polling_feed_fetches_only_new_bars(self):
+        provider = FakeProvider(self.df)
+        clock = MagicMock(side_effect=[0, 5, 20])
+        feed = PollingFeed("AAA", "1m", provider=provider, min_interval=15, clock=clock)
+        live = LiveSeries(self.df.iloc[:1000])
+
+        live.poll(feed)
+        live.poll(feed)
+        live.poll(feed)
+        self.assertEqual([call[3] for call in provider.calls], [self.df.index[999], self.df.index[-1]])
+        self.assert_matches_full_analysis(live, self.df)
+
+
+class FakeProvider:
+    def __init__(self, bars):
+        self.bars = bars
+        self.now = bars.index[-1]
+        self.calls = []
+
+    def fetch(self, symbol, interval, period=None, start=None):
+        self.calls.append((symbol, interval, period, start))
+        available = self.bars[self.bars.index <= self.now]
+        if start is not None:
+            return available[available.index >= start]
+        return available
+
+
+class TestBarCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        bars = make_ohlcv(400, start="2024-01-02", freq="D")
+        bars.index = bars.index.tz_localize("America/New_York")
+        self.provider = FakeProvider(bars)
+        self.clock_time = bars.index[300].timestamp()
+        self.provider.now = bars.index[300]
+        self.cache = BarCache(self.tmp.name, provider=self.provider, clock=lambda: self.clock_time)
+
+    def test_hit_after_first_fetch(self):
+        first = self.cache.get("AAPL", "3mo", "1d")
+        second = self.cache.get("AAPL", "3mo", "1d")
+
+        pd.testing.assert_frame_equal(first, second, check_freq=False)
+        self.assertEqual(len(self.provider.calls), 1)
+        self.assertEqual(self.cache.stats["misses"], 1)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_stale_entry_fetches_only_new_bars(self):
+        self.cache.get("AAPL", "3mo", "1d")
+        last_cached = self.provider.now
+        self.provider.now = self.provider.bars.index[305]
+        self.clock_time += 5 * 24 * 3600
+
+        df = self.cache.get("AAPL", "3mo", "1d")
+
+        self.assertEqual(self.provider.calls[-1][3], last_cached)
+        self.assertEqual(df.index[-1], self.provider.bars.index[305])
+        self.assertEqual(self.cache.stats["topups"], 1)
+        self.assertFalse(df.index.duplicated().any())
+
+    def test_longer_period_is_a_miss(self):
+        self.cache.get("AAPL", "1mo", "1d")
+        df = self.cache.get("AAPL", "6mo", "1d")
+
+        self.assertEqual(self.cache.stats["misses"], 2)
+        self.assertGreater(len(df), 100)
+        self.cache.get("AAPL", "3mo", "1d")
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_eviction_keeps_size_bounded(self):
+        self.cache.get("AAPL", "1y", "1d")
+        self.cache.max_bytes = self.cache.size() + 1
+        self.cache.get("MSFT", "1y", "1d")
+
+        self.assertEqual(self.cache.stats["evictions"], 1)
+        self.assertLessEqual(self.cache.size(), self.cache.max_bytes)
+        self.cache.get("MSFT", "1y", "1d")
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_downloads_of_different_symbols_run_in_parallel(self):
+        fetch = self.provider.fetch
+
+        def slow_fetch(*args, **kwargs):
+            time.sleep(0.2)
+            return fetch(*args, **kwargs)
+
+        symbols = ["AAPL", "MSFT", "GOOG", "AMZN", "AAPL", "AAPL"]
+        with patch.object(self.provider, "fetch", side_effect=slow_fetch):
+            threads = [threading.Thread(target=self.cache.get, args=(symbol, "3mo", "1d")) for symbol in symbols]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.6)
+        # the same series is downloaded once, the other requests for it wait and hit
+        self.assertEqual(sorted(call[0] for call in self.provider.calls), ["AAPL", "AMZN", "GOOG", "MSFT"])
+        self.assertEqual(self.cache.stats["hits"], 2)
+
+    def test_get_df_uses_cache(self):
+        with patch("api.stock_data.get_bar_cache", return_value=self.cache):
+            df = get_df("AAPL", "3mo", "1d")
+            self.assertIsNotNone(df)
+            self.provider.bars = self.provider.bars.iloc[:0]
+            self.assertIsNone(get_df("MSFT", "3mo", "1d"))
+
+
+AGGREGATION = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+class TestResample(unittest.TestCase):
+    def setUp(self):
+        # three weeks of minute bars, across the switch to daylight saving time on March 10th
+        self.minutes = make_session_bars(15)
+        self.daily = make_ohlcv(150, start="2024-01-10", freq="B")
+        self.daily.index = self.daily.index.tz_localize("America/New_York")
+
+    def test_hourly_bars_start_at_session_open(self):
+        hourly = resample_bars(self.minutes, "1h")
+        expected = self.minutes.resample("60min", offset="30min").agg(AGGREGATION).dropna(subset=["Close"])
+
+        pd.testing.assert_frame_equal(hourly, expected, check_freq=False, check_dtype=False)
+        self.assertEqual(hourly.index[0].strftime("%H:%M"), "09:30")
+        self.assertTrue((hourly.index.minute == 30).all())
+        self.assertEqual(len(hourly), 15 * 7)
+
+    def test_90m_bars_restart_every_session(self):
+        bars = resample_bars(self.minutes, "90m")
+        expected = pd.concat([day.resample("90min", origin=day.index[0]).agg(AGGREGATION)
+                              for _, day in self.minutes.groupby(self.minutes.index.date)])
+
+        pd.testing.assert_frame_equal(bars, expected, check_freq=False, check_dtype=False)
+
+    def test_calendar_bars_keep_partial_first_bar(self):
+        weekly = resample_bars(self.daily, "1wk")
+        monthly = resample_bars(self.daily, "1mo")
+        quarterly = resample_bars(self.daily, "3mo")
+
+        # the data starts on a Wednesday in January: the first week, month and quarter are incomplete but kept,
+        # as in yahoo's own bars for the same period
+        expected = self.daily.resample("W-MON", label="left", closed="left").agg(AGGREGATION)
+        pd.testing.assert_frame_equal(weekly, expected, check_freq=False, check_dtype=False)
+        self.assertEqual(weekly.index[0], pd.Timestamp("2024-01-08", tz="America/New_York"))
+        self.assertEqual(monthly.index[0], pd.Timestamp("2024-01-01", tz="America/New_York"))
+        self.assertEqual(monthly["Open"].iloc[0], self.daily["Open"].iloc[0])
+        self.assertEqual(monthly["Open"].iloc[1], self.daily.loc["2024-02-01", "Open"])
+        self.assertEqual(monthly["Volume"].iloc[1], self.daily.loc["2024-02", "Volume"].sum())
+        self.assertEqual(quarterly.index[0], pd.Timestamp("2024-01-01", tz="America/New_York"))
+        self.assertEqual(len(quarterly), 3)
+
+    def test_splits_compound_and_dividends_add_up(self):
+        daily = self.daily.assign(Dividends=0.0, **{"Stock Splits": 0.0})
+        daily.loc["2024-02-06", "Stock Splits"] = 2.0
+        daily.loc["2024-02-08", "Stock Splits"] = 3.0
+        daily.loc["2024-02-07", "Dividends"] = 0.25
+        daily.loc["2024-02-09", "Dividends"] = 0.5
+
+        weekly = resample_bars(daily, "1wk")
+
+        self.assertEqual(weekly.loc["2024-02-05", "Stock Splits"], 6.0)
+        self.assertEqual(weekly.loc["2024-02-05", "Dividends"], 0.75)
+        self.assertEqual(weekly.loc["2024-02-12", "Stock Splits"], 0.0)
+
+    def test_base_interval(self):
+        self.assertEqual(base_interval("1d", "1h"), "1m")
+        self.assertEqual(base_interval("1mo", "1h"), "2m")
+        self.assertEqual(base_interval("3mo", "1h"), "1h")
+        self.assertEqual(base_interval("1y", "1wk"), "1d")
+        self.assertEqual(base_interval("max", "3mo"), "1d")
+        # yahoo's 5-day bars do not follow calendar weeks, so they are downloaded as they are
+        self.assertEqual(base_interval("1mo", "5d"), "5d")
+
+
+class TestResampledBarCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        bars = make_ohlcv(400, start="2024-01-02", freq="B")
+        bars.index = bars.index.tz_localize("America/New_York")
+        self.provider = FakeProvider(bars)
+        self.provider.now = bars.index[300]
+        self.clock_time = bars.index[300].timestamp()
+        self.cache = BarCache(self.tmp.name, provider=self.provider, clock=lambda: self.clock_time)
+
+    def test_switching_intervals_downloads_once(self):
+        daily = self.cache.get_resampled("AAPL", "1y", "1d")
+        weekly = self.cache.get_resampled("AAPL", "1y", "1wk")
+        monthly = self.cache.get_resampled("AAPL", "1y", "1mo")
+
+        self.assertEqual([call[1] for call in self.provider.calls], ["1d"])
+        pd.testing.assert_frame_equal(weekly, resample_bars(daily, "1wk"))
+        pd.testing.assert_frame_equal(monthly, resample_bars(daily, "1mo"))
+
+    def test_derived_hit_costs_no_io(self):
+        first = self.cache.get_resampled("AAPL", "1y", "1wk")
+        first["SMA_20"] = 0.0
+        with patch("api.bar_cache.pd.read_parquet") as read, patch.object(self.cache, "_write") as write:
+            second = self.cache.get_resampled("AAPL", "1y", "1wk")
+
+        read.assert_not_called()
+        write.assert_not_called()
+        self.assertEqual(self.cache.stats["derived_hits"], 1)
+        # a caller's columns stay out of the cached frame
+        self.assertNotIn("SMA_20", second)
+
+    def test_topup_rebuilds_derived_bars(self):
+        self.cache.get_resampled("AAPL", "1y", "1wk")
+        self.provider.now = self.provider.bars.index[310]
+        self.clock_time += 7 * 3600
+
+        weekly = self.cache.get_resampled("AAPL", "1y", "1wk")
+
+        self.assertEqual(self.cache.stats["topups"], 1)
+        self.assertEqual(weekly["Close"].iloc[-1], self.provider.bars["Close"].iloc[310])
+
+    def test_intraday_bars_come_from_minutes(self):
+        minutes = make_session_bars(5)
+        provider = FakeProvider(minutes)
+        cache = BarCache(Path(self.tmp.name) / "intraday", provider=provider, clock=lambda: minutes.index[-1].timestamp())
+
+        with patch("api.stock_data.get_bar_cache", return_value=cache):
+            hourly = get_df("AAPL", "5d", "1h")
+            fifteen = get_df("AAPL", "5d", "15m")
+
+        self.assertEqual([call[1] for call in provider.calls], ["1m"])
+        self.assertEqual(len(hourly), 5 * 7)
+        self.assertEqual(len(fifteen), 5 * 26)
+
+
+class TestAnalyzeMany(unittest.TestCase):
+    def test_streams_results_and_isolates_errors(self):
+        frames = {"AAA": make_ohlcv(500, seed=4), "BBB": make_ohlcv(500, seed=5), "BAD": make_ohlcv(500).drop(columns="Close")}
+        download = MagicMock(return_value=frames)
+
+        results = {symbol: (result, error) for symbol, result, error in
+                   analyze_many(["AAA", "BBB", "BAD", "NONE", "AAA"], "1y", "1d", max_workers=2, download=download)}
+
+        download.assert_called_once_with(["AAA", "BBB", "BAD", "NONE"], "1y", "1d")
+        self.assertEqual(set(results), {"AAA", "BBB", "BAD", "NONE"})
+        self.assertIsInstance(results["BAD"][1], KeyError)
+        self.assertIsInstance(results["NONE"][1], ValueError)
+
+        df, patterns, levels = results["AAA"][0]
+        expected_df, expected_patterns, expected_levels = analyze_df(frames["AAA"].copy())
+        pd.testing.assert_frame_equal(df, expected_df)
+        self.assertEqual(patterns, expected_patterns)
+        self.assertEqual(levels, expected_levels)
+
+
+class TestResultCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = ResultCache()
+        compute = MagicMock(return_value=[1, 2, 3])
+
+        self.assertEqual(cache.get_or_compute("key", compute), [1, 2, 3])
+        self.assertEqual(cache.get_or_compute("key", compute), [1, 2, 3])
+
+        compute.assert_called_once()
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (1, 1, 0.5))
+        self.assertGreater(stats["bytes"], 0)
+
+    def test_lru_eviction_by_memory(self):
+        cache = ResultCache(max_bytes=25_000)
+        for key in ["a", "b", "c"]:
+            cache.get_or_compute(key, lambda: np.zeros(1_000))
+        cache.get_or_compute("a", lambda: None)
+        cache.get_or_compute("d", lambda: np.zeros(1_000))
+
+        self.assertEqual(list(cache._entries), ["c", "a", "d"])
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertLessEqual(cache.bytes, cache.max_bytes)
+
+    def test_concurrent_callers_share_one_computation(self):
+        cache = ResultCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return "result"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["result"] * 8)
+
+    def test_errors_are_not_cached(self):
+        cache = ResultCache()
+        with self.assertRaises(ValueError):
+            cache.get_or_compute("key", MagicMock(side_effect=ValueError))
+        self.assertEqual(cache.get_or_compute("key", lambda: 1), 1)
+
+    @patch("api.result_cache.analyze_df")
+    @patch("api.result_cache.get_df")
+    def test_cached_analyze_keys_on_last_bar(self, mock_get_df, mock_analyze_df):
+        df = make_ohlcv(300)
+        mock_get_df.return_value = df
+        mock_analyze_df.side_effect = lambda frame: (frame, {}, {})
+
+        with patch("api.result_cache.result_cache", ResultCache()):
+            cached_analyze("AAPL", "1y", "1d")
+            cached_analyze("AAPL", "1y", "1d")
+            self.assertEqual(mock_analyze_df.call_count, 1)
+
+            mock_get_df.return_value = make_ohlcv(301)
+            cached_analyze("AAPL", "1y", "1d")
+            self.assertEqual(mock_analyze_df.call_count, 2)
+
+
+class TestRefreshScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = SnapshotStore(self.tmp.name)
+        self.now = pd.Timestamp("2025-02-14 15:00:30", tz="America/New_York").timestamp()
+
+    def analyze(self, symbol, timeframe, interval):
+        if symbol == "BAD":
+            raise ValueError("no data")
+        return analyze_df(make_ohlcv(300, seed=len(symbol), freq="D"))
+
+    def test_next_refresh(self):
+        self.assertEqual(next_refresh("1m", self.now), pd.Timestamp("2025-02-14 15:01:05", tz="America/New_York").timestamp())
+        self.assertEqual(next_refresh("1d", self.now), pd.Timestamp("2025-02-14 16:15", tz="America/New_York").timestamp())
+        # after Friday's close the next daily refresh is on Monday
+        friday_evening = pd.Timestamp("2025-02-14 18:00", tz="America/New_York").timestamp()
+        self.assertEqual(next_refresh("1wk", friday_evening), pd.Timestamp("2025-02-17 16:15", tz="America/New_York").timestamp())
+
+    def test_refresh_writes_snapshots(self):
+        jobs = [("AAPL", "3mo", "1d"), ("MSFT", "1d", "1m"), ("BAD", "3mo", "1d")]
+        scheduler = RefreshScheduler(jobs, self.store, max_concurrent_fetches=2, jitter=0, analyze=self.analyze,
+                                     clock=lambda: self.now)
+        scheduler.start()
+        self.addCleanup(scheduler.stop)
+        scheduler.run_once()
+
+        self.assertEqual(scheduler.stats["refreshed"], 2)
+        self.assertEqual(scheduler.stats["failed"], 1)
+        self.assertIn(("BAD", "3mo", "1d"), scheduler.errors)
+
+        df, patterns, levels, meta = self.store.read("AAPL", "3mo", "1d", now=self.now)
+        expected_df, expected_patterns, expected_levels = self.analyze("AAPL", "3mo", "1d")
+        pd.testing.assert_frame_equal(df, expected_df, check_freq=False)
+        self.assertEqual(patterns, expected_patterns)
+        self.assertEqual(levels, expected_levels)
+
+        self.assertIsNone(self.store.read("MSFT", "1d", "1m", now=self.now + 3600))
+        self.assertIsNotNone(self.store.read("MSFT", "1d", "1m", now=self.now + 3600, allow_stale=True))
+        # nothing is due again until the next bar
+        self.assertGreater(scheduler.dispatch(), self.now)
+
+    def test_backpressure_defers_jobs(self):
+        jobs = [(f"SYM{i}", "3mo", "1d") for i in range(5)]
+        scheduler = RefreshScheduler(jobs, self.store, queue_size=2, analyze=self.analyze, clock=lambda: self.now)
+
+        scheduler.dispatch()
+        self.assertEqual(scheduler._queue.qsize(), 2)
+        self.assertEqual(scheduler.stats["deferred"], 1)
+
+        scheduler.start()
+        self.addCleanup(scheduler.stop)
+        for _ in range(3):
+            scheduler.run_once()
+        self.assertEqual(scheduler.stats["refreshed"], 5)
+
+
+class TestBarStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = BarStore(self.tmp.name)
+        self.df = make_ohlcv(3_000, start="2025-01-02 09:30", freq="min")
+        self.df.index = self.df.index.tz_localize("America/New_York")
+
+    def test_append_and_read_round_trip(self):
+        self.assertEqual(self.store.append("AAPL", "1m", self.df.iloc[:2_000]), 2_000)
+        self.assertEqual(self.store.append("AAPL", "1m", self.df.iloc[1_500:]), 1_000)
+
+        bars = self.store.read("AAPL", "1m")
+        self.assertEqual(len(bars), 3_000)
+        frame = bars.to_frame()
+        pd.testing.assert_index_equal(frame.index, self.df.index.as_unit("ns"))
+        np.testing.assert_allclose(frame["Close"], self.df["Close"], rtol=1e-6)
+        np.testing.assert_array_equal(frame["Volume"], self.df["Volume"])
+
+    def test_missing_volume_is_stored_as_zero(self):
+        df = self.df.iloc[:5].astype({"Volume": float})
+        df.loc[df.index[2], "Volume"] = np.nan
+
+        self.store.append("AAPL", "1m", df)
+        np.testing.assert_array_equal(self.store.read("AAPL", "1m")["Volume"], [*df["Volume"].iloc[:2], 0, *df["Volume"].iloc[3:]])
+
+    def test_unsorted_bars_are_stored_in_order(self):
+        shuffled = self.df.iloc[:100].iloc[::-1]
+        repeated = pd.concat([self.df.iloc[100:110], self.df.iloc[[105]].assign(Close=1.5)])
+
+        self.assertEqual(self.store.append("AAPL", "1m", shuffled), 100)
+        self.assertEqual(self.store.append("AAPL", "1m", repeated), 10)
+        bars = self.store.read("AAPL", "1m", start=self.df.index[50], end=self.df.index[109])
+        pd.testing.assert_index_equal(bars.index, self.df.index[50:110].as_unit("ns"))
+        self.assertEqual(bars["Close"].iloc[55], 1.5)
+
+    def test_interrupted_append_is_not_read(self):
+        self.store.append("AAPL", "1m", self.df.iloc[:10])
+        contiguous = np.ascontiguousarray
+        writes = []
+
+        def fail_third_column(column, dtype):
+            # the timestamps and two price columns get written, then the disk fills up
+            writes.append(dtype)
+            if len(writes) == 4:
+                raise OSError("disk full")
+            return contiguous(column, dtype=dtype)
+
+        with patch("api.bar_store.np.ascontiguousarray", side_effect=fail_third_column):
+            with self.assertRaises(OSError):
+                self.store.append("AAPL", "1m", self.df.iloc[10:20])
+
+        self.assertEqual(len(self.store.read("AAPL", "1m")), 10)
+        self.assertEqual(self.store.append("AAPL", "1m", self.df.iloc[10:20]), 10)
+        frame = self.store.read("AAPL", "1m").to_frame()
+        np.testing.assert_allclose(frame["Close"], self.df["Close"].iloc[:20], rtol=1e-6)
+        np.testing.assert_array_equal(frame["Volume"], self.df["Volume"].iloc[:20])
+
+    def test_partial_last_bar_is_replaced(self):
+        self.store.append("AAPL", "1m", self.df.iloc[:10])
+        update = self.df.iloc[9:11].copy()
+        update.loc[update.index[0], "Close"] = 123.5
+
+        self.assertEqual(self.store.append("AAPL", "1m", update), 1)
+        bars = self.store.read("AAPL", "1m")
+        self.assertEqual(len(bars), 11)
+        self.assertEqual(bars["Close"].iloc[9], 123.5)
+
+    def test_time_range_slices_are_views(self):
+        self.store.append("AAPL", "1m", self.df)
+        start, end = self.df.index[100], self.df.index[199]
+
+        bars = self.store.read("AAPL", "1m", start=start, end=end)
+        self.assertEqual(len(bars), 100)
+        self.assertEqual(bars.index[0], start)
+        self.assertEqual(bars.index[-1], end)
+        self.assertIsInstance(bars.columns["Close"], np.memmap)
+        self.assertTrue(np.shares_memory(bars["Close"].to_numpy(), bars.columns["Close"]))
+        self.assertEqual(bars["Close"].dtype, np.float32)
+
+    def test_indicators_from_mapped_bars(self):
+        self.store.append("AAPL", "1m", self.df)
+        expected = calculate_indicators(self.store.read("AAPL", "1m").to_frame().astype(float))
+
+        result = self.store.indicators("AAPL", "1m")
+        pd.testing.assert_frame_equal(result, expected[INDICATOR_COLUMNS], check_freq=False, rtol=1e-5)
+
+        with self.assertRaises(TypeError):
+            calculate_indicators(self.store.read("AAPL", "1m"))
+
+        window = self.store.indicators("AAPL", "1m", start=self.df.index[1_000], end=self.df.index[1_999])
+        self.assertEqual(len(window), 1_000)
+        columns = [column for column in INDICATOR_COLUMNS if not column.startswith("MACD")]
+        pd.testing.assert_frame_equal(window[columns], expected[columns].iloc[1_000:2_000], check_freq=False, rtol=1e-5)
+
+
+class TestAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.df = make_ohlcv(1_000, freq="D")
+        self.expected = calculate_indicators(self.df.copy())
+
+    def test_families_are_computed_on_demand(self):
+        analysis = Analysis(self.df)
+        self.assertEqual(analysis.computed(), [])
+
+        result = analysis.indicators("MA20", "BB_upper")
+        self.assertEqual(analysis.computed(), ["moving_averages", "bollinger_bands"])
+        pd.testing.assert_frame_equal(result, self.expected[["MA20", "BB_upper"]])
+        pd.testing.assert_frame_equal(analysis.indicators(), self.expected[INDICATOR_COLUMNS])
+        self.assertEqual(list(self.df.columns), ["Open", "High", "Low", "Close", "Volume"])
+
+    def test_patterns_and_levels_match_eager_analysis(self):
+        analysis = Analysis(self.df)
+        self.assertEqual(analysis.patterns, find_patterns(self.df.copy()))
+        self.assertEqual(analysis.levels, find_support_resistance(self.df))
+        self.assertEqual(analysis.computed(), [])
+
+    def test_precomputed_columns_are_reused(self):
+        analysis = Analysis(self.expected, patterns={}, levels={"support": [], "resistance": []})
+        self.assertEqual(len(analysis.computed()), 6)
+        with patch.object(analysis.plan, "evaluate", side_effect=AssertionError):
+            pd.testing.assert_frame_equal(analysis.indicators("RSI"), self.expected[["RSI"]])
+        self.assertEqual(analysis.patterns, {})
+
+    def test_with_indicators_on_precomputed_columns(self):
+        snapshot = self.expected[["Open", "High", "Low", "Close", "Volume", "MA20", "MA50", "MA200", "BB_upper", "BB_lower"]]
+        analysis = Analysis(snapshot)
+
+        frame = analysis.with_indicators()
+        self.assertFalse(frame.columns.duplicated().any())
+        pd.testing.assert_frame_equal(frame[INDICATOR_COLUMNS], self.expected[INDICATOR_COLUMNS])
+        self.assertListEqual(list(analysis.with_indicators("MA20", "BB_upper").columns), list(snapshot.columns))
+
+    @patch("api.result_cache.get_df")
+    def test_cached_analysis_is_shared(self, mock_get_df):
+        mock_get_df.return_value = self.df
+        with patch("api.result_cache.result_cache", ResultCache()) as cache:
+            first = cached_analysis("AAPL", "1y", "1d")
+            first.indicators("MA20")
+            second = cached_analysis("AAPL", "1y", "1d")
+            self.assertIs(first, second)
+            self.assertEqual(second.computed(), ["moving_averages"])
+            self.assertGreater(cache.bytes, self.df.memory_usage().sum())
+
+
+class TestBacktest(unittest.TestCase):
+    def test_positions_match_reference_loop(self):
+        rng = np.random.default_rng(0)
+        entry, exit = rng.random(500) < 0.05, rng.random(500) < 0.05
+        for short in (False, True):
+            expected, state = [], 0.0
+            for enter, leave in zip(entry, exit):
+                if leave:
+                    state = -1.0 if short else 0.0
+                elif enter:
+                    state = 1.0
+                expected.append(state)
+            np.testing.assert_array_equal(positions(entry, exit, short=short), expected)
+
+    def test_metrics(self):
+        result = run_backtest([100, 110, 99, 99, 120], [1, 1, 0, 1, 0])
+        np.testing.assert_allclose(result["equity"], [1, 1.1, 0.99, 0.99, 1.2])
+        self.assertAlmostEqual(result["total_return"], 0.2)
+        self.assertAlmostEqual(result["max_drawdown"], -0.1)
+        self.assertEqual((result["trades"], result["hit_rate"], result["exposure"]), (2, 0.5, 0.6))
+
+    def test_signals(self):
+        df = make_ohlcv(1_000, freq="D")
+        signals = Signals(df)
+        self.assertEqual(np.flatnonzero(signals.Hammer).tolist(), find_patterns(df.copy())["Hammer"])
+        np.testing.assert_allclose(signals.ma(20), calculate_indicators(df.copy())["MA20"])
+        crossed = signals.crossed_above(signals.ma(10), "MA50")
+        fast, slow = signals.ma(10), signals.MA50
+        self.assertTrue(all(fast[i - 1] <= slow[i - 1] and fast[i] > slow[i] for i in np.flatnonzero(crossed)))
+
+    def test_sweep_matches_single_runs(self):
+        df = make_ohlcv(1_000, freq="D")
+        grid = {"fast": [5, 10], "slow": [30, 60]}
+        results = sweep(df, ma_crossover, grid, cost=0.001, max_workers=2)
+
+        self.assertEqual(len(results), 4)
+        pd.testing.assert_frame_equal(results, sweep(df, ma_crossover, grid, cost=0.001, max_workers=1))
+        single = backtest(df, ma_crossover, cost=0.001, fast=10, slow=60)
+        row = results[(results["fast"] == 10) & (results["slow"] == 60)].iloc[0]
+        self.assertAlmostEqual(row["total_return"], single["total_return"])
+        self.assertEqual(row["trades"], single["trades"])
+
+
+class TestDecimate(unittest.TestCase):
+    def setUp(self):
+        self.df = make_ohlcv(10_000)
+
+    def test_ohlc_buckets_preserve_extremes(self):
+        candles = ohlc_buckets(self.df, 300)
+        self.assertEqual(len(candles), 300)
+        self.assertEqual(candles["High"].max(), self.df["High"].max())
+        self.assertEqual(candles["Low"].min(), self.df["Low"].min())
+        self.assertEqual(candles["Open"].iloc[0], self.df["Open"].iloc[0])
+        self.assertEqual(candles["Close"].iloc[-1], self.df["Close"].iloc[-1])
+        self.assertEqual(candles["Volume"].sum(), self.df["Volume"].sum())
+        small = self.df.iloc[:100]
+        self.assertIs(ohlc_buckets(small, 300), small)
+
+    def test_lttb_keeps_endpoints_and_spikes(self):
+        y = np.zeros(5_000)
+        y[1_234] = 10.0
+        selected = lttb(np.arange(5_000), y, 100)
+        self.assertEqual(len(selected), 100)
+        self.assertEqual(selected[0], 0)
+        self.assertEqual(selected[-1], 4_999)
+        self.assertIn(1_234, selected)
+        self.assertTrue(np.all(np.diff(selected) > 0))
+
+    def test_lttb_frame_skips_warmup_nans(self):
+        df = calculate_indicators(self.df.copy())[["MA20", "MA200"]]
+        decimated = lttb_frame(df, 500)
+        self.assertLess(len(decimated), 1_000)
+        self.assertEqual(decimated["MA200"].first_valid_index(), df["MA200"].first_valid_index())
+        self.assertEqual(decimated.index[-1], df.index[-1])
+
+
 class TestNewsSentiment(unittest.TestCase):
     def test_sentiment_score_positive(self):
         text = "The AAPL stock has potential for growth."
@@ -104,6 +976,29 @@ class TestNewsSentiment(unittest.TestCase):
         self.assertLessEqual(sentiment["negative"], 0)
         self.assertLessEqual(sentiment["compound"], 0)
 
+    def test_scorer_caches_repeated_texts(self):
+        scorer = SentimentScorer(maxsize=2)
+        first = scorer.score("Shares soar after record earnings")
+        first["compound"] = 99
+        second = scorer.score("Shares soar after record earnings")
+
+        self.assertEqual(second, get_sentiment_score("Shares soar after record earnings"))
+        self.assertEqual((scorer.hits, scorer.misses), (1, 1))
+
+        scorer.score("Second headline")
+        scorer.score("Third headline")
+        self.assertEqual(len(scorer._cache), 2)
+        scorer.score("Shares soar after record earnings")
+        self.assertEqual(scorer.misses, 4)
+
+    def test_score_batch_matches_single_scores(self):
+        texts = [f"{article['title']} {article['description']}" for article in make_articles(300, seed=6)]
+        scorer = SentimentScorer()
+        batch = scorer.score_batch(texts, max_workers=2, parallel_threshold=50)
+
+        self.assertEqual(batch, [SentimentScorer().score(text) for text in texts])
+        self.assertEqual(scorer.score_batch(texts[:10]), batch[:10])
+
     def test_sentiment_label(self):
         self.assertEqual(get_sentiment_label(0.6), "Very Positive")
         self.assertEqual(get_sentiment_label(0.3), "Positive")
@@ -119,6 +1014,35 @@ class TestNewsSentiment(unittest.TestCase):
         invalid_article = {"title": "SHOCK", "description": "Shocking news.", "source": "reliable"}
         self.assertFalse(validate_news_article(invalid_article))
 
+    @patch("api.news_sentiment.fetch_news")
+    def test_get_news_sentiment_summary(self, mock_fetch_news):
+        articles = make_articles(20, seed=7, duplicate_ratio=0)
+        mock_fetch_news.return_value = {"status": "ok", "totalResults": len(articles), "articles": articles}
+
+        result = get_news_sentiment("AAPL", days=31, store=ArticleStore(":memory:"), now=NEWS_NOW)
+
+        mock_fetch_news.assert_called_once_with("AAPL", 31, now=NEWS_NOW)
+        self.assertEqual(result["sentiment_summary"]["total_articles"], 20)
+        self.assertEqual(sum(result["sentiment_summary"]["sentiment_distribution"].values()), 20)
+        self.assertEqual({item["title"] for item in result["news_items"]}, {article["title"] for article in articles})
+        self.assertFalse(result["news_items_truncated"])
+
+    def test_fetch_window_is_the_summary_window(self):
+        # late in the evening west of UTC the local date is a day behind; both windows are UTC days of `now`
+        now = pd.Timestamp("2025-02-15 23:30", tz="UTC").to_pydatetime()
+        fetcher = MagicMock()
+        with patch("api.news_fetcher._background", fetcher):
+            fetch_news("AAPL", 7, now=now)
+
+        fetcher.fetch.assert_called_once_with(symbol_query("AAPL"), "2025-02-08", "2025-02-15")
+        self.assertEqual(news_window(7, now), ("2025-02-08", "2025-02-15"))
+
+    @patch("api.news_sentiment.fetch_news", return_value={"status": "ok", "totalResults": 0, "articles": []})
+    def test_get_news_sentiment_no_articles(self, mock_fetch_news):
+        result = get_news_sentiment("AAPL", store=ArticleStore(":memory:"))
+        self.assertEqual(result["news_items"], [])
+        self.assertEqual(result["sentiment_summary"]["total_articles"], 0)
+
     """
     @patch("api.news_sentiment.NewsApiClient")
     @patch("api.news_sentiment.validate_news_article", return_value=True)
@@ -137,5 +1061,320 @@ class TestNewsSentiment(unittest.TestCase):
     """
   
 
+NEWS_NOW = pd.Timestamp("2025-02-01", tz="UTC").to_pydatetime()
+
+
+class TestArticleStore(unittest.TestCase):
+    def setUp(self):
+        self.store = ArticleStore(":memory:")
+        self.scored = []
+
+    def score_batch(self, texts):
+        self.scored.extend(texts)
+        return SentimentScorer().score_batch(texts)
+
+    def test_deduplicates_by_url_and_content(self):
+        articles = make_articles(300, seed=8, duplicate_ratio=0.3)
+        unique = {(article["title"], article["description"]) for article in articles}
+
+        self.assertEqual(self.store.add("AAPL", articles, self.score_batch, get_sentiment_label), len(unique))
+        self.assertEqual(len(self.scored), len(unique))
+        self.assertEqual(self.store.add("AAPL", articles[:50], self.score_batch, get_sentiment_label), 0)
+        self.assertEqual(len(self.scored), len(unique))
+        # the same story is stored again for another symbol
+        self.assertEqual(self.store.add("MSFT", articles[:1], self.score_batch, get_sentiment_label), 1)
+
+    def test_malformed_articles_are_skipped(self):
+        articles = make_articles(20, seed=11, duplicate_ratio=0)
+        articles[3] = {**articles[3], "source": {"id": None}}
+        articles[7] = {**articles[7], "publishedAt": "yesterday-ish"}
+        articles[9] = {**articles[9], "source": "Reuters"}
+
+        self.assertEqual(self.store.add("AAPL", articles, self.score_batch, get_sentiment_label), 17)
+        self.assertEqual(len(self.scored), 17)
+        with patch("api.news_sentiment.fetch_news", return_value={"status": "ok", "totalResults": 20, "articles": articles}):
+            news = get_news_sentiment("MSFT", days=31, store=self.store, now=NEWS_NOW)
+        self.assertEqual(news["sentiment_summary"]["total_articles"], 17)
+
+    def test_summary_matches_recomputation(self):
+        articles = make_articles(500, seed=9, duplicate_ratio=0)
+        self.store.add("AAPL", articles[:300], self.score_batch, get_sentiment_label)
+        self.store.add("AAPL", articles[200:], self.score_batch, get_sentiment_label)
+
+        window = [article for article in articles if "2025-01-08" <= article["publishedAt"][:10] <= "2025-01-14"]
+        sentiments = SentimentScorer().score_batch([f"{article['title']} {article['description']}" for article in window])
+        summary = self.store.summary("AAPL", "2025-01-08", "2025-01-14")
+
+        self.assertEqual(summary["articles"], len(window))
+        self.assertAlmostEqual(summary["compound_sum"], sum(sentiment["compound"] for sentiment in sentiments))
+        for label, count in summary["distribution"].items():
+            self.assertEqual(count, sum(get_sentiment_label(sentiment["compound"]) == label for sentiment in sentiments))
+        items = self.store.articles("AAPL", "2025-01-08", "2025-01-14", limit=1_000)
+        self.assertEqual(len(items), len(window))
+        self.assertEqual([item["date"] for item in items], sorted((item["date"] for item in items), reverse=True))
+
+    def test_concurrent_writer_keeps_aggregates_exact(self):
+        articles = make_articles(100, seed=10, duplicate_ratio=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = ArticleStore(Path(tmp) / "news.sqlite"), ArticleStore(Path(tmp) / "news.sqlite")
+            first.add("AAPL", articles[:60], self.score_batch, get_sentiment_label)
+            # the second process checked for known articles before the first one wrote them
+            with patch.object(second, "_known", return_value=set()):
+                self.assertEqual(second.add("AAPL", articles, self.score_batch, get_sentiment_label), 40)
+            self.assertEqual(second.summary("AAPL", "2025-01-01", "2025-12-31")["articles"], 100)
+            first.close()
+            second.close()
+
+    def test_format_published(self):
+        for published in ["2025-02-15T12:30:00Z", "2025-02-15T12:30:00.123Z", "2025-02-15T12:30:00+02:00", "2025-02-15 12:30"]:
+            self.assertEqual(format_published(published), pd.Timestamp(published).strftime("%Y-%m-%d %H:%M:%S"))
+
+    @patch("api.news_sentiment.fetch_news")
+    def test_only_new_articles_are_fetched_and_scored(self, mock_fetch_news):
+        articles = sorted(make_articles(200, seed=11, duplicate_ratio=0), key=lambda article: article["publishedAt"])
+        mock_fetch_news.return_value = {"status": "ok", "totalResults": 150, "articles": articles[:150]}
+        get_news_sentiment("AAPL", days=31, store=self.store, now=NEWS_NOW)
+        latest = format_published(articles[149]["publishedAt"])
+
+        mock_fetch_news.return_value = {"status": "ok", "totalResults": 51, "articles": articles[149:]}
+        with patch("api.news_sentiment.scorer", SentimentScorer()) as scorer:
+            result = get_news_sentiment("AAPL", days=31, store=self.store, now=NEWS_NOW)
+
+        mock_fetch_news.assert_called_with("AAPL", 31, since=latest, now=NEWS_NOW)
+        self.assertEqual(scorer.misses, 50)
+        self.assertEqual(result["sentiment_summary"]["total_articles"], 200)
+        # the list is capped, and says so
+        self.assertEqual(len(result["news_items"]), 100)
+        self.assertTrue(result["news_items_truncated"])
+        everything = get_news_sentiment("AAPL", days=31, store=self.store, now=NEWS_NOW, limit=500)
+        self.assertEqual(len(everything["news_items"]), 200)
+        self.assertFalse(everything["news_items_truncated"])
+        history = sentiment_history("AAPL", days=90, store=self.store, now=NEWS_NOW)
+        self.assertEqual(history["articles"].sum(), 200)
+        self.assertEqual(history.index[0], articles[0]["publishedAt"][:10])
+
+
+class TestService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.frames = {"AAA": make_ohlcv(600, seed=12, freq="D")}
+        self.delay = 0
+        news = {"news_items": [{"title": "t", "summary": "s", "source": "src", "date": "2025-02-15 12:00:00",
+                                "sentiment": "Neutral", "sentiment_scores": {"compound": 0.0, "positive": 0.1, "negative": 0.1,
+                                                                             "neutral": 0.8}}],
+                "sentiment_summary": {"average_sentiment": 0.0, "total_articles": 1}}
+
+        def analysis(symbol, timeframe, interval):
+            time.sleep(self.delay)
+            return Analysis(self.frames[symbol]) if symbol in self.frames else None
+
+        self.service = Service(analysis=analysis, news=lambda symbol, days: news, info=lambda symbol: {"symbol": symbol},
+                               max_concurrency=2, max_queue=1)
+        self.server = TestServer(self.service.application())
+        await self.server.start_server()
+        self.addAsyncCleanup(self.server.close)
+        import aiohttp
+        self.session = aiohttp.ClientSession()
+        self.addAsyncCleanup(self.session.close)
+
+    async def get(self, path, **headers):
+        async with self.session.get(self.server.make_url(path), headers=headers) as response:
+            return response.status, response.headers, await response.read()
+
+    async def test_analyze_json_and_arrow(self):
+        import pyarrow as pa
+        expected = Analysis(self.frames["AAA"]).with_indicators("MA20", "RSI")
+
+        status, headers, body = await self.get("/analyze/aaa?indicators=MA20,RSI")
+        self.assertEqual(status, 200)
+        payload = json.loads(body)
+        self.assertEqual(payload["columns"], list(expected.columns))
+        self.assertIsNone(payload["data"][0][-2])
+        self.assertAlmostEqual(payload["data"][-1][-1], expected["RSI"].iloc[-1])
+
+        status, headers, body = await self.get("/analyze/AAA?indicators=MA20,RSI", Accept=ARROW_MIME)
+        self.assertEqual(headers["Content-Type"], ARROW_MIME)
+        table = pa.ipc.open_stream(body).read_all().to_pandas()
+        pd.testing.assert_frame_equal(table, expected, check_freq=False)
+
+    async def test_conditional_requests(self):
+        status, headers, _ = await self.get("/analyze/AAA")
+        etag = headers["ETag"]
+        self.assertEqual((await self.get("/analyze/AAA", **{"If-None-Match": etag}))[0], 304)
+        self.assertEqual((await self.get("/analyze/AAA", **{"If-None-Match": etag, "Accept": ARROW_MIME}))[0], 200)
+
+        # a new bar changes the tag
+        self.frames["AAA"] = make_ohlcv(601, seed=12, freq="D")
+        status, headers, _ = await self.get("/analyze/AAA", **{"If-None-Match": etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers["ETag"], etag)
+        self.assertEqual(self.service.not_modified, 1)
+
+    async def test_patterns_levels_news_info(self):
+        df = self.frames["AAA"]
+        patterns = json.loads((await self.get("/patterns/AAA"))[2])
+        self.assertEqual(patterns["Hammer"], [df.index[i].isoformat() for i in find_patterns(df.copy())["Hammer"]])
+        self.assertEqual(json.loads((await self.get("/levels/AAA"))[2]), find_support_resistance(df))
+        self.assertEqual(json.loads((await self.get("/news/AAA"))[2])["sentiment_summary"]["total_articles"], 1)
+        self.assertEqual(json.loads((await self.get("/info/AAA"))[2]), {"symbol": "AAA"})
+        self.assertEqual((await self.get("/news/AAA?format=arrow"))[1]["Content-Type"], ARROW_MIME)
+
+    async def test_errors(self):
+        status, _, body = await self.get("/analyze/ZZZ")
+        self.assertEqual((status, json.loads(body)["error"]), (404, "No price data found for ZZZ"))
+        self.assertEqual((await self.get("/analyze/AAA?indicators=MA21"))[0], 400)
+        self.assertEqual((await self.get("/nothing"))[0], 404)
+
+    async def test_concurrency_limit(self):
+        self.delay = 0.2
+        statuses = [result[0] for result in await asyncio.gather(*(self.get("/levels/AAA") for _ in range(5)))]
+        self.assertEqual(sorted(statuses), [200, 200, 200, 503, 503])
+        debug = json.loads((await self.get("/debug"))[2])
+        self.assertEqual((debug["rejected"], debug["requests"], debug["in_flight"], debug["queued"]), (2, 0, 0, 0))
+
+
+class TestNewsFetcher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        async def everything(request):
+            self.requests.append(dict(request.query))
+            await asyncio.sleep(0.05)
+            if request.headers.get("X-Api-Key") != "test-key":
+                return web.json_response({"status": "error", "code": "apiKeyInvalid", "message": "bad key"}, status=401)
+            articles = [{"title": f"News for {request.query['q']}", "description": "d", "source": {"name": "s"},
+                         "publishedAt": "2025-02-15T12:00:00Z"}]
+            return web.json_response({"status": "ok", "totalResults": 1, "articles": articles})
+
+        app = web.Application()
+        app.router.add_get("/v2/everything", everything)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.addAsyncCleanup(self.server.close)
+        self.url = str(self.server.make_url("/v2/everything"))
+
+    async def test_coalesces_identical_queries(self):
+        async with NewsFetcher("test-key", url=self.url) as fetcher:
+            results = await asyncio.gather(*(fetcher.fetch("AAPL", "2025-02-08", "2025-02-15") for _ in range(5)))
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertTrue(all(result == results[0] for result in results))
+        self.assertEqual(self.requests[0]["from"], "2025-02-08")
+
+    async def test_fetch_symbols_and_disk_cache(self):
+        async with NewsFetcher("test-key", url=self.url, cache_dir=self.tmp.name) as fetcher:
+            results = await fetcher.fetch_symbols(["AAPL", "MSFT", "AAPL"])
+        self.assertEqual(set(results), {"AAPL", "MSFT"})
+        self.assertEqual(len(self.requests), 2)
+
+        async with NewsFetcher("test-key", url=self.url, cache_dir=self.tmp.name) as fetcher:
+            again = await fetcher.fetch_symbols(["AAPL", "MSFT"])
+            self.assertEqual(fetcher.cache_hits, 2)
+        self.assertEqual(again, results)
+        self.assertEqual(len(self.requests), 2)
+
+        async with NewsFetcher("test-key", url=self.url, cache_dir=self.tmp.name, ttl=0) as fetcher:
+            await fetcher.fetch_symbols(["AAPL"])
+        self.assertEqual(len(self.requests), 3)
+
+    async def test_fetch_news_shares_one_fetcher_across_threads(self):
+        shared = BackgroundFetcher(NewsFetcher("test-key", url=self.url))
+        self.addCleanup(shared.close)
+        barrier = threading.Barrier(4)
+
+        def fetch():
+            barrier.wait()
+            return fetch_news("AAPL")
+
+        with patch("api.news_fetcher._background", shared):
+            results = await asyncio.gather(*(asyncio.to_thread(fetch) for _ in range(4)))
+            session = shared.fetcher._session
+            await asyncio.to_thread(fetch_news, "MSFT")
+
+        # the four identical queries share one request, and the next one reuses the connection pool
+        self.assertEqual(len(self.requests), 2)
+        self.assertTrue(all(result == results[0] for result in results))
+        self.assertIs(shared.fetcher._session, session)
+
+    async def test_api_error(self):
+        async with NewsFetcher("wrong-key", url=self.url, cache_dir=self.tmp.name) as fetcher:
+            with self.assertRaises(NewsApiError):
+                await fetcher.fetch("AAPL", "2025-02-08", "2025-02-15")
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.enabled = instrumentation.enabled
+        self.addCleanup(instrumentation.enable, self.enabled)
+        instrumentation.recorder.reset()
+
+    def test_disabled_spans_record_nothing(self):
+        instrumentation.enable(False)
+        with instrumentation.span("stage", rows=1) as s:
+            s.set(cache="hit")
+
+        self.assertIs(instrumentation.span("stage"), instrumentation.NULL_SPAN)
+        self.assertEqual(instrumentation.recorder.summary(), {})
+
+    def test_analyze_stages_are_recorded(self):
+        instrumentation.enable(True)
+        analyze_df(make_ohlcv(1_000))
+        with instrumentation.span("bar_cache", symbol="AAPL") as s:
+            s.set(cache="hit")
+
+        summary = instrumentation.recorder.summary()
+        for stage in ["calculate_indicators", "find_patterns", "find_support_resistance"]:
+            self.assertEqual(summary[stage]["count"], 1)
+            self.assertEqual(summary[stage]["last"]["rows"], 1_000)
+            self.assertEqual(sum(summary[stage]["histogram"].values()), 1)
+        self.assertEqual(summary["bar_cache"]["cache_hits"], 1)
+
+    def test_chrome_trace_and_metrics_endpoint(self):
+        instrumentation.enable(True)
+        with self.assertRaises(ValueError):
+            with instrumentation.span("get_df"):
+                raise ValueError
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "trace.json"
+            instrumentation.recorder.dump_chrome_trace(path)
+            events = json.loads(path.read_text())["traceEvents"]
+        self.assertEqual(events[0]["name"], "get_df")
+        self.assertEqual(events[0]["ph"], "X")
+        self.assertEqual(events[0]["args"]["error"], "ValueError")
+
+        server = instrumentation.serve_metrics(0)
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            self.assertEqual(json.load(response)["get_df"]["count"], 1)
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_run_suite_records_every_stage(self):
+        results = run_suite(bar_sizes=[500], article_sizes=[20], repeat=1, log=lambda line: None)
+
+        self.assertEqual({result["stage"] for result in results},
+                         {"calculate_indicators", "find_patterns", "find_support_resistance", "get_news_sentiment"})
+        self.assertTrue(all(result["seconds"] > 0 and result["peak_bytes"] > 0 for result in results))
+
+    def test_find_regressions(self):
+        baseline = {"results": [{"stage": "find_patterns", "size": 1000, "seconds": 0.1, "peak_bytes": 10_000_000}]}
+        ok = [{"stage": "find_patterns", "size": 1000, "seconds": 0.11, "peak_bytes": 10_500_000}]
+        slow = [{"stage": "find_patterns", "size": 1000, "seconds": 0.2, "peak_bytes": 10_000_000}]
+        noisy = [{"stage": "find_patterns", "size": 1000, "seconds": 0.104, "peak_bytes": 10_000_000}]
+
+        self.assertEqual(find_regressions(ok, baseline), [])
+        self.assertEqual(len(find_regressions(slow, baseline)), 1)
+        self.assertEqual(find_regressions(noisy, baseline, tolerance=0), [])
+
+    def test_startup_defers_heavy_imports(self):
+        modules = [name for name in app_imports() if name != "streamlit"]
+        self.assertIn("api.result_cache", modules)
+        top_level, loaded = import_times(modules)
+        self.assertIn("api.stock_data", top_level)
+        self.assertEqual(set(DEFERRED_IMPORTS) & loaded, set())
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file